@@ -11,14 +11,57 @@ Usage:
 When --job is provided, the existing job file is read first and BIDS-resolved
 keys are merged on top, preserving all pre-configured scalar parameters.
 
+With --shards K the resolved File arrays are split into K jobs balanced by total
+input bytes, plus a JSON submission manifest, so one bundle can run on K nodes:
+    python3 resolve_bids.py ... --output job.yml --shards 8 --shard-by subject
+
+--bids-dir may also be an S3-compatible URI (s3://bucket/prefix). The dataset is
+then listed in bulk with concurrent paginated ListObjectsV2 requests, one listing
+per subject prefix, instead of one request per file. The endpoint comes from
+--s3-endpoint or $AWS_ENDPOINT_URL and credentials from $AWS_ACCESS_KEY_ID /
+$AWS_SECRET_ACCESS_KEY (/ $AWS_SESSION_TOKEN); without credentials requests are
+anonymous. Resolved paths are s3:// URIs, or paths under --mount-point when the
+bucket is mounted where the workflow runs.
+
+--serve PORT keeps the dataset index in memory (refreshed by polling directory
+mtimes every --poll-interval seconds) and answers POST /resolve requests with
+the bids_query.json as body; --server URL resolves through such a service:
+    python3 resolve_bids.py --bids-dir /data/bids --serve 8765 &
+    python3 resolve_bids.py --server http://127.0.0.1:8765 --query bids_query.json --output job.yml
+
+--catalog FILE exports the scanned inventory to an indexed SQLite catalog
+(files, entities as columns, sizes, selected sidecar fields) for ad-hoc SQL;
+passing that file as --bids-dir resolves queries from the catalog alone:
+    python3 resolve_bids.py --bids-dir /data/bids --catalog bids.sqlite
+    python3 resolve_bids.py --bids-dir bids.sqlite --query bids_query.json --output job.yml
+
+--stage DIR links the selected files into DIR (hardlinks, or symlinks across
+filesystems) with the dataset layout kept, and the job references the staged
+paths, so inputs are exposed by one bind mount without copying any bytes.
+
 Dependencies: Python 3.6+ standard library only.
 """
 
 import argparse
+import errno
+import hashlib
+import heapq
+import hmac
 import json
 import os
 import re
+import socketserver
+import sqlite3
 import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, HTTPServer
 from pathlib import Path
 
 # BIDS entity keys in specification order
@@ -33,6 +76,7 @@ ENTITY_PATTERN = re.compile(
 )
 
 NIFTI_PATTERN = re.compile(r'\.(nii\.gz|nii)$')
+SUBJECT_PATTERN = re.compile(r'(?:^|_)sub-([a-zA-Z0-9]+)')
 DATATYPE_NAMES = {'anat', 'func', 'dwi', 'fmap', 'perf'}
 
 
@@ -46,8 +90,11 @@ def parse_bids_filename(filename):
         return None
 
     extension = '.' + m.group(1)
-    stem = filename[:m.start()]
+    return _parse_bids_stem(filename[:m.start()], extension)
+
 
+def _parse_bids_stem(stem, extension):
+    """Entities and suffix of a filename stem (the name without its extension)."""
     entities = {}
     last_end = 0
     for match in ENTITY_PATTERN.finditer(stem):
@@ -63,23 +110,31 @@ def parse_bids_filename(filename):
     return {'entities': entities, 'suffix': suffix, 'extension': extension}
 
 
-def find_sidecar(nifti_path):
+def find_sidecar(nifti_path, exists=os.path.isfile):
     """Find the JSON sidecar for a NIfTI file."""
     json_path = NIFTI_PATTERN.sub('.json', str(nifti_path))
-    if os.path.isfile(json_path):
+    if exists(json_path):
         return json_path
     return None
 
 
-def extract_sidecar_params(sidecar_path, param_names):
-    """Read specified parameters from a BIDS sidecar JSON file."""
-    if not sidecar_path or not os.path.isfile(sidecar_path):
+def extract_sidecar_params(sidecar_path, param_names, storage=None):
+    """Read specified parameters from a BIDS sidecar JSON file.
+
+    With a storage backend, sidecar_path is a dataset-relative key.
+    """
+    if not sidecar_path:
+        return {}
+    if storage is None and not os.path.isfile(sidecar_path):
         return {}
     try:
-        with open(sidecar_path) as f:
-            data = json.load(f)
+        if storage is not None:
+            data = json.loads(storage.read_text(sidecar_path))
+        else:
+            with open(sidecar_path) as f:
+                data = json.load(f)
         return {k: data[k] for k in param_names if k in data}
-    except (json.JSONDecodeError, IOError):
+    except (json.JSONDecodeError, IOError, StorageError):
         return {}
 
 
@@ -112,31 +167,892 @@ def matches_selection(parsed, selection):
     return True
 
 
-def find_matching_files(bids_dir, selection):
+PARTICIPANT_CONDITION = re.compile(r'^\s*(>=|<=|!=|>|<|=)?\s*(.*?)\s*$')
+
+
+def _as_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _matches_condition(value, condition):
+    """Test one participants.tsv cell against a cohort condition.
+
+    Conditions are values compared for equality (numerically when both sides
+    are numbers), or strings starting with >, >=, <, <=, != or =. Ordering
+    comparisons are numeric when both sides are numbers and never match
+    missing values ('n/a' or empty); a list matches if any condition does.
+    """
+    if isinstance(condition, list):
+        return any(_matches_condition(value, c) for c in condition)
+    if value is None or value in ('', 'n/a'):
+        return False
+    op, operand = '=', condition
+    if isinstance(condition, str):
+        m = PARTICIPANT_CONDITION.match(condition)
+        op, operand = m.group(1) or '=', m.group(2)
+    a, b = _as_number(value), _as_number(operand)
+    if a is None or b is None:
+        a, b = str(value), str(operand)
+    if op == '=':
+        return a == b
+    if op == '!=':
+        return a != b
+    if isinstance(a, str) and op in ('>', '>=', '<', '<='):
+        return False
+    return {'>': a > b, '>=': a >= b, '<': a < b, '<=': a <= b}[op]
+
+
+def load_participants(storage):
+    """Read participants.tsv into {participant_id: row}, or None if it is absent."""
+    if not storage.is_file('participants.tsv'):
+        return None
+    lines = [l for l in storage.read_text('participants.tsv').splitlines() if l.strip()]
+    if not lines:
+        return {}
+    header = lines[0].split('\t')
+    rows = {}
+    for line in lines[1:]:
+        row = dict(zip(header, line.split('\t')))
+        pid = row.get('participant_id', '').strip()
+        if pid:
+            rows[pid if pid.startswith('sub-') else f'sub-{pid}'] = row
+    return rows
+
+
+def select_cohort(storage, criteria):
+    """Subjects in participants.tsv whose columns satisfy every criterion.
+
+    criteria maps column names to conditions (see _matches_condition), e.g.
+    {"group": "patient", "age": ">60"}. Returns (sorted subject ids, errors),
+    or (None, []) when there are no criteria.
+    """
+    if not criteria:
+        return None, []
+    participants = load_participants(storage)
+    if participants is None:
+        return None, ['Participant filters given but participants.tsv not found.']
+    columns = set()
+    for row in participants.values():
+        columns.update(row)
+    missing = [c for c in criteria if c not in columns]
+    if missing:
+        return None, [f'participants.tsv has no column(s): {", ".join(missing)}']
+    cohort = [
+        pid for pid, row in participants.items()
+        if all(_matches_condition(row.get(col), cond) for col, cond in criteria.items())
+    ]
+    return sorted(cohort), []
+
+
+def _bidsignore_regex(pattern):
+    """Translate a gitignore-style glob into a regex over '/'-separated keys."""
+    anchored = '/' in pattern
+    pattern = pattern.lstrip('/')
+    out = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            out.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('**', i):
+            out.append('.*')
+            i += 2
+        elif pattern[i] == '*':
+            out.append('[^/]*')
+            i += 1
+        elif pattern[i] == '?':
+            out.append('[^/]')
+            i += 1
+        elif pattern[i] == '[' and ']' in pattern[i + 2:]:
+            end = pattern.index(']', i + 2)
+            chars = pattern[i + 1:end]
+            if chars.startswith('!'):
+                chars = '^' + chars[1:]
+            out.append('[' + chars.replace('\\', '\\\\') + ']')
+            i = end + 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return re.compile(('^' if anchored else '^(?:.*/)?') + ''.join(out) + '$')
+
+
+def load_bidsignore(storage):
+    """Rules from the dataset's .bidsignore as (regex, negate, dir_only) tuples."""
+    if not storage.is_file('.bidsignore'):
+        return []
+    rules = []
+    for line in storage.read_text('.bidsignore').splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        negate = line.startswith('!')
+        line = line[1:] if negate else line
+        dir_only = line.endswith('/')
+        line = line.rstrip('/')
+        if line:
+            rules.append((_bidsignore_regex(line), negate, dir_only))
+    return rules
+
+
+def is_ignored(key, rules, is_dir=False):
+    """True if key, or any directory above it, is excluded by .bidsignore rules.
+
+    As in gitignore, the last matching rule wins and nothing below an
+    ignored directory can be re-included.
+    """
+    if not rules:
+        return False
+    parts = key.split('/')
+    for depth in range(1, len(parts) + 1):
+        sub_key = '/'.join(parts[:depth])
+        sub_is_dir = is_dir or depth < len(parts)
+        ignored = False
+        for regex, negate, dir_only in rules:
+            if dir_only and not sub_is_dir:
+                continue
+            if regex.match(sub_key):
+                ignored = not negate
+        if ignored:
+            return True
+    return False
+
+
+class StorageError(Exception):
+    """A dataset location could not be listed or read."""
+
+
+class Storage:
+    """Directory-tree view of a BIDS dataset addressed by '/'-separated keys.
+
+    Keys are relative to the dataset root ('' is the root itself). Listings
+    are cached in an inventory mapping each directory key to its
+    subdirectory names and {file name: size}, so repeated selections over
+    the same dataset do not list anything twice. LocalStorage fills the
+    inventory lazily through _scan(); S3Storage fills it in bulk up front.
+    Subclasses also map keys to the paths written to the job file.
+    """
+
+    is_remote = False
+
+    def __init__(self):
+        self._inventory = {}
+
+    def _scan(self, dir_key):
+        """Return (subdir names, {file name: size or None}), or None if missing."""
+        raise NotImplementedError
+
+    def _listing(self, dir_key):
+        if dir_key not in self._inventory:
+            self._inventory[dir_key] = self._scan(dir_key)
+        return self._inventory[dir_key]
+
+    def list_dir(self, dir_key):
+        """Sorted (subdir names, file names) of a directory; empty if missing."""
+        listing = self._listing(dir_key)
+        if listing is None:
+            return [], []
+        dirs, files = listing
+        return sorted(dirs), sorted(files)
+
+    def is_dir(self, key):
+        return self._listing(key) is not None
+
+    def is_file(self, key):
+        parent, _, name = key.rpartition('/')
+        listing = self._listing(parent)
+        return listing is not None and name in listing[1]
+
+    def read_text(self, key):
+        raise NotImplementedError
+
+    def path(self, key):
+        """Path or URI to write into the job file for a key."""
+        raise NotImplementedError
+
+    def size_of(self, path):
+        """Size in bytes of a path returned by path() (0 if unknown)."""
+        raise NotImplementedError
+
+    def warm(self):
+        """List the root and every sub-* tree so later lookups hit the inventory.
+
+        Returns (directories, files) known afterwards.
+        """
+        pending = [''] + [d for d in self.list_dir('')[0] if d.startswith('sub-')]
+        while pending:
+            dir_key = pending.pop()
+            dirs = self.list_dir(dir_key)[0]
+            if dir_key:
+                pending.extend(f'{dir_key}/{d}' for d in dirs)
+        return self.stats()
+
+    def known_dirs(self):
+        """Keys of all directories listed so far."""
+        return [k for k, v in self._inventory.items() if v is not None]
+
+    def stats(self):
+        """(directories, files) currently in the inventory."""
+        listings = [v for v in self._inventory.values() if v is not None]
+        return len(listings), sum(len(files) for _, files in listings)
+
+    def refresh(self):
+        """Bring the inventory up to date; returns the number of directories relisted."""
+        stale = len(self._inventory)
+        self._inventory = {}
+        return stale
+
+    def select(self, selection, cohort=None, ignore=()):
+        """Backend-native evaluation of a selection, or None to walk the tree.
+
+        cohort is the list of subjects allowed by participant filters (None
+        for no filter) and ignore the .bidsignore rules. Same return value as
+        find_matching_files.
+        """
+        return None
+
+
+class LocalStorage(Storage):
+    """Dataset on a local (or mounted) filesystem, listed lazily with os.scandir."""
+
+    def __init__(self, root):
+        Storage.__init__(self)
+        self.root = Path(root)
+        self._mtimes = {}
+
+    def __str__(self):
+        return str(self.root)
+
+    def _scan(self, dir_key):
+        dirs, files = set(), {}
+        try:
+            # Taken before listing so a change during the scan is seen next refresh
+            self._mtimes[dir_key] = os.stat(str(self.root / dir_key)).st_mtime_ns
+            with os.scandir(str(self.root / dir_key)) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        dirs.add(entry.name)
+                    elif entry.is_file():
+                        files[entry.name] = None
+        except (FileNotFoundError, NotADirectoryError):
+            self._mtimes.pop(dir_key, None)
+            return None
+        return dirs, files
+
+    def refresh(self):
+        """Relist only directories whose mtime changed (entries added, removed or renamed).
+
+        Costs one stat per known directory. New subdirectories of a relisted
+        directory are listed too, so a warmed tree stays warm; directories that
+        disappeared are dropped with everything below them.
+        """
+        changed = []
+        for dir_key, mtime in list(self._mtimes.items()):
+            try:
+                current = os.stat(str(self.root / dir_key)).st_mtime_ns
+            except OSError:
+                current = None
+            if current != mtime:
+                changed.append(dir_key)
+        relisted = 0
+        for dir_key in sorted(changed, key=lambda k: k.count('/')):
+            if dir_key not in self._mtimes:
+                continue  # below a directory already dropped or relisted
+            old = self._inventory.get(dir_key)
+            new = self._scan(dir_key)
+            relisted += 1
+            if new is None:
+                self._forget(dir_key)
+                continue
+            self._inventory[dir_key] = new
+            old_dirs = old[0] if old else set()
+            new_dirs = new[0]
+            for name in old_dirs - new_dirs:
+                self._forget(f'{dir_key}/{name}' if dir_key else name)
+            for name in new_dirs - old_dirs:
+                sub_key = f'{dir_key}/{name}' if dir_key else name
+                if dir_key or name.startswith('sub-'):
+                    self._warm_subtree(sub_key)
+        return relisted
+
+    def _forget(self, dir_key):
+        if not dir_key:
+            self._inventory.clear()
+            self._mtimes.clear()
+            return
+        prefix = dir_key + '/'
+        for key in [k for k in self._inventory if k == dir_key or k.startswith(prefix)]:
+            del self._inventory[key]
+            self._mtimes.pop(key, None)
+
+    def _warm_subtree(self, dir_key):
+        pending = [dir_key]
+        while pending:
+            key = pending.pop()
+            pending.extend(f'{key}/{d}' for d in self.list_dir(key)[0])
+
+    def read_text(self, key):
+        try:
+            with open(str(self.root / key)) as f:
+                return f.read()
+        except IOError as e:
+            raise StorageError(str(e))
+
+    def path(self, key):
+        return str(self.root / key)
+
+    def size_of(self, path):
+        try:
+            return os.stat(path).st_size
+        except OSError:
+            return 0
+
+
+S3_NAMESPACE = '{http://s3.amazonaws.com/doc/2006-03-01/}'
+EMPTY_SHA256 = hashlib.sha256(b'').hexdigest()
+
+
+def _s3_quote(value):
+    """URI-encode a query component the way SigV4 canonicalizes it."""
+    return urllib.parse.quote(str(value), safe='-_.~')
+
+
+class S3Storage(Storage):
+    """Dataset under s3://bucket/prefix on an S3-compatible object store.
+
+    The whole dataset is inventoried up front: one delimited listing of the
+    root finds the sub-* prefixes, then each subject prefix is listed
+    (following continuation tokens) in a thread pool. Lookups afterwards are
+    served from memory; only sidecars whose parameters are extracted are
+    fetched. Requests use path-style addressing and AWS Signature V4.
+    """
+
+    is_remote = True
+
+    def __init__(self, uri, endpoint=None, region=None, workers=16, mount_point=None):
+        Storage.__init__(self)
+        parsed = urllib.parse.urlparse(uri)
+        self.bucket = parsed.netloc
+        self.prefix = parsed.path.strip('/')
+        self.region = region or os.environ.get('AWS_REGION') or \
+            os.environ.get('AWS_DEFAULT_REGION') or 'us-east-1'
+        self.endpoint = (
+            endpoint or os.environ.get('AWS_ENDPOINT_URL') or
+            f'https://s3.{self.region}.amazonaws.com'
+        ).rstrip('/')
+        self.access_key = os.environ.get('AWS_ACCESS_KEY_ID')
+        self.secret_key = os.environ.get('AWS_SECRET_ACCESS_KEY')
+        self.session_token = os.environ.get('AWS_SESSION_TOKEN')
+        self.mount_point = mount_point
+        self.workers = max(1, workers)
+        self.sizes = {}
+        self._complete = set()
+        if not self.bucket:
+            raise StorageError(f'Invalid S3 URI (no bucket): {uri}')
+        self._build_inventory(self.workers)
+
+    def __str__(self):
+        return f's3://{self.bucket}/{self.prefix}'
+
+    # -- HTTP -----------------------------------------------------------
+
+    def _signed_headers(self, method, url):
+        """SigV4 request headers for a bodiless request (anonymous without credentials)."""
+        if not (self.access_key and self.secret_key):
+            return {}
+        parts = urllib.parse.urlsplit(url)
+        now = datetime.now(timezone.utc)
+        amz_date = now.strftime('%Y%m%dT%H%M%SZ')
+        date = now.strftime('%Y%m%d')
+        headers = {
+            'host': parts.netloc,
+            'x-amz-content-sha256': EMPTY_SHA256,
+            'x-amz-date': amz_date,
+        }
+        if self.session_token:
+            headers['x-amz-security-token'] = self.session_token
+        signed = ';'.join(sorted(headers))
+        canonical = '\n'.join([
+            method,
+            parts.path or '/',
+            parts.query,  # _get() already emits it sorted and SigV4-encoded
+            ''.join(f'{k}:{headers[k]}\n' for k in sorted(headers)),
+            signed,
+            EMPTY_SHA256,
+        ])
+        scope = f'{date}/{self.region}/s3/aws4_request'
+        to_sign = '\n'.join([
+            'AWS4-HMAC-SHA256', amz_date, scope,
+            hashlib.sha256(canonical.encode()).hexdigest(),
+        ])
+        key = ('AWS4' + self.secret_key).encode()
+        for part in (date, self.region, 's3', 'aws4_request'):
+            key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+        signature = hmac.new(key, to_sign.encode(), hashlib.sha256).hexdigest()
+        headers['Authorization'] = (
+            f'AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, '
+            f'SignedHeaders={signed}, Signature={signature}'
+        )
+        del headers['host']  # urllib sets it from the URL
+        return headers
+
+    def _get(self, path, params=None):
+        url = self.endpoint + urllib.parse.quote(path, safe='/-_.~')
+        if params:
+            url += '?' + '&'.join(
+                f'{_s3_quote(k)}={_s3_quote(v)}' for k, v in sorted(params.items())
+            )
+        request = urllib.request.Request(url, headers=self._signed_headers('GET', url))
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                return response.read()
+        except urllib.error.HTTPError as e:
+            raise StorageError(f'GET {url} failed: HTTP {e.code} {e.reason}')
+        except urllib.error.URLError as e:
+            raise StorageError(f'GET {url} failed: {e.reason}')
+
+    def _list(self, prefix, delimiter=None):
+        """All (key, size) objects and common prefixes under prefix, following pagination."""
+        objects, prefixes = [], []
+        params = {'list-type': '2', 'prefix': prefix, 'max-keys': '1000'}
+        if delimiter:
+            params['delimiter'] = delimiter
+        while True:
+            root = ET.fromstring(self._get(f'/{self.bucket}', params))
+            for item in root.iter(S3_NAMESPACE + 'Contents'):
+                objects.append((
+                    item.findtext(S3_NAMESPACE + 'Key'),
+                    int(item.findtext(S3_NAMESPACE + 'Size') or 0),
+                ))
+            for item in root.iter(S3_NAMESPACE + 'CommonPrefixes'):
+                prefixes.append(item.findtext(S3_NAMESPACE + 'Prefix'))
+            token = root.findtext(S3_NAMESPACE + 'NextContinuationToken')
+            if root.findtext(S3_NAMESPACE + 'IsTruncated') != 'true' or not token:
+                return objects, prefixes
+            params['continuation-token'] = token
+
+    # -- inventory ------------------------------------------------------
+
+    def _add_object(self, key, size):
+        rel = key[len(self.root_prefix):]
+        if not rel or rel.endswith('/'):
+            return
+        parts = rel.split('/')
+        for depth in range(len(parts) - 1):
+            parent = '/'.join(parts[:depth])
+            self._inventory.setdefault(parent, (set(), {}))[0].add(parts[depth])
+            self._inventory.setdefault('/'.join(parts[:depth + 1]), (set(), {}))
+        parent = '/'.join(parts[:-1])
+        self._inventory.setdefault(parent, (set(), {}))[1][parts[-1]] = size
+        self.sizes[rel] = size
+
+    def _build_inventory(self, workers):
+        self.root_prefix = self.prefix + '/' if self.prefix else ''
+        objects, prefixes = self._list(self.root_prefix, delimiter='/')
+        if not objects and not prefixes:
+            raise StorageError(f's3://{self.bucket}/{self.prefix} is empty or does not exist')
+        self._inventory[''] = (set(), {})
+        for key, size in objects:
+            self._add_object(key, size)
+        names = [p[len(self.root_prefix):].rstrip('/') for p in prefixes]
+        self._inventory[''][0].update(names)
+        self._list_tops([n for n in names if n.startswith('sub-')], workers)
+
+    def refresh(self):
+        """Relist the whole dataset (object stores have no cheap change signal).
+
+        The previous inventory is kept if the new listing fails.
+        """
+        saved = self._inventory, self._complete, self.sizes
+        self._inventory, self._complete, self.sizes = {}, set(), {}
+        try:
+            self._build_inventory(self.workers)
+        except StorageError:
+            self._inventory, self._complete, self.sizes = saved
+            raise
+        return len(self._inventory)
+
+    def _list_tops(self, names, workers=1):
+        """Fully list top-level prefixes (concurrently) into the inventory."""
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            prefixes = [f'{self.root_prefix}{n}/' for n in names]
+            for name, (objects, _) in zip(names, pool.map(self._list, prefixes)):
+                for key, size in objects:
+                    self._add_object(key, size)
+                self._inventory.setdefault(name, (set(), {}))
+                self._complete.add(name)
+
+    def _listing(self, dir_key):
+        # Subject prefixes are inventoried up front; other top-level prefixes
+        # (derivatives/, sourcedata/, ...) are listed the first time they're needed.
+        top = dir_key.split('/', 1)[0]
+        if dir_key and top not in self._complete and top in self._inventory[''][0]:
+            self._list_tops([top])
+        return self._inventory.get(dir_key)
+
+    def read_text(self, key):
+        return self._get(f'/{self.bucket}/{self.root_prefix}{key}').decode('utf-8')
+
+    def path(self, key):
+        if self.mount_point:
+            return os.path.join(self.mount_point, key)
+        return f's3://{self.bucket}/{self.root_prefix}{key}'
+
+    def size_of(self, path):
+        if self.mount_point and not path.startswith('s3://'):
+            key = os.path.relpath(path, self.mount_point).replace('\\', '/')
+        else:
+            key = path[len(f's3://{self.bucket}/{self.root_prefix}'):]
+        return self.sizes.get(key, 0)
+
+
+CATALOG_SIDECAR_FIELDS = [
+    'RepetitionTime', 'EchoTime', 'FlipAngle', 'InversionTime',
+    'PhaseEncodingDirection', 'TotalReadoutTime', 'EffectiveEchoSpacing',
+    'MagneticFieldStrength', 'Manufacturer', 'ManufacturersModelName',
+]
+
+CATALOG_INDEXES = [
+    ('files_selection', 'datatype, suffix, subject, session'),
+    ('files_subject', 'subject, session'),
+    ('files_parent', 'parent'),
+    ('files_task', 'task, run'),
+    ('files_sidecar', 'sidecar_key'),
+]
+
+
+def _catalog_value(value):
+    """Sidecar value as stored in SQLite: scalars as-is, lists/objects as JSON text."""
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+
+def build_catalog(storage, catalog_path, sidecar_fields=None):
+    """Export the dataset inventory to an indexed SQLite catalog.
+
+    Tables:
+        dataset      key/value metadata (location, path prefix, build time)
+        directories  every directory key with its parent and name
+        files        one row per file: key, parent, name, path, size, subject,
+                     session, datatype, suffix, extension, one column per BIDS
+                     entity (sub, ses, task, run, ...), sidecar_key for NIfTI
+                     files with a JSON sidecar, one column per selected
+                     sidecar field (copied onto the NIfTI row), and the full
+                     text of every .json file and root-level file in 'content'
+
+    The catalog can be queried directly with SQL (sidecar contents also via
+    json_extract) or used as --bids-dir, in which case selections are
+    answered from the catalog without touching the dataset. The file is
+    written beside catalog_path and renamed into place.
+    Returns the number of files catalogued.
+    """
+    fields = list(dict.fromkeys(sidecar_fields or CATALOG_SIDECAR_FIELDS))
+    storage.warm()
+    # Root-level metadata files are in the inventory after warm(); other
+    # top-level directories (derivatives/, sourcedata/, ...) are not catalogued.
+    dir_keys = sorted(
+        k for k in storage.known_dirs()
+        if k == '' or k.split('/', 1)[0].startswith('sub-')
+    )
+    prefix = storage.path('')
+    if not storage.is_remote:
+        prefix = os.path.abspath(prefix)
+    prefix = prefix.rstrip('/') + '/'
+
+    tmp_path = f'{catalog_path}.{os.getpid()}.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    entity_cols = ', '.join(f'"{k}" TEXT' for k in ENTITY_KEYS)
+    field_cols = ''.join(f', "{f}"' for f in fields)
+    conn.executescript(f'''
+        CREATE TABLE dataset (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE directories (key TEXT PRIMARY KEY, parent TEXT, name TEXT);
+        CREATE TABLE files (
+            id INTEGER PRIMARY KEY, key TEXT UNIQUE, parent TEXT, name TEXT,
+            path TEXT, size INTEGER, subject TEXT, session TEXT,
+            has_sessions INTEGER, datatype TEXT, suffix TEXT, extension TEXT,
+            {entity_cols}, sidecar_key TEXT, content TEXT{field_cols}
+        );
+    ''')
+
+    has_sessions = {}
+    for dir_key in dir_keys:
+        parts = dir_key.split('/')
+        if len(parts) == 2 and parts[1].startswith('ses-'):
+            has_sessions[parts[0]] = 1
+
+    directories = []
+    rows = []
+    for dir_key in dir_keys:
+        dirs, files = storage.list_dir(dir_key)
+        for name in dirs:
+            directories.append((f'{dir_key}/{name}' if dir_key else name, dir_key, name))
+        parts = dir_key.split('/') if dir_key else []
+        subject = parts[0] if parts else None
+        session = parts[1] if len(parts) > 1 and parts[1].startswith('ses-') else None
+        depth = 3 if session else 2
+        datatype = parts[-1] if len(parts) == depth and parts[-1] in DATATYPE_NAMES else None
+        for name in files:
+            key = f'{dir_key}/{name}' if dir_key else name
+            stem, dot, ext = name.partition('.')
+            m = NIFTI_PATTERN.search(name)
+            extension = '.' + m.group(1) if m else dot + ext
+            parsed = _parse_bids_stem(name[:m.start()] if m else stem, extension)
+            entities = parsed['entities'] if parsed else {}
+            sidecar_key = find_sidecar(key, storage.is_file) if m else None
+            # JSON sidecars and root-level metadata (participants.tsv, .bidsignore, ...)
+            content = storage.read_text(key) if extension == '.json' or not dir_key else None
+            rows.append({
+                'key': key, 'parent': dir_key, 'name': name,
+                'path': prefix + key, 'size': storage.size_of(storage.path(key)),
+                'subject': subject, 'session': session,
+                'has_sessions': has_sessions.get(subject, 0) if subject else None,
+                'datatype': datatype,
+                'suffix': parsed['suffix'] if parsed else None,
+                'extension': extension,
+                'entities': entities, 'sidecar_key': sidecar_key, 'content': content,
+            })
+
+    # Copy selected sidecar fields onto the NIfTI rows
+    contents = {r['key']: r['content'] for r in rows if r['content'] is not None}
+    columns = (
+        ['key', 'parent', 'name', 'path', 'size', 'subject', 'session', 'has_sessions',
+         'datatype', 'suffix', 'extension'] + ENTITY_KEYS + ['sidecar_key', 'content'] + fields
+    )
+    records = []
+    for r in rows:
+        sidecar = {}
+        if r['sidecar_key'] in contents:
+            try:
+                sidecar = json.loads(contents[r['sidecar_key']])
+            except ValueError:
+                sidecar = {}
+        records.append(
+            [r[c] for c in columns[:11]] +
+            [r['entities'].get(k) for k in ENTITY_KEYS] +
+            [r['sidecar_key'], r['content']] +
+            [_catalog_value(sidecar.get(f)) for f in fields]
+        )
+    quoted = ', '.join(f'"{c}"' for c in columns)
+    placeholders = ', '.join('?' for _ in columns)
+    with conn:
+        conn.executemany('INSERT INTO directories VALUES (?, ?, ?)', directories)
+        conn.executemany(f'INSERT INTO files ({quoted}) VALUES ({placeholders})', records)
+        for name, cols in CATALOG_INDEXES:
+            conn.execute(f'CREATE INDEX {name} ON files ({cols})')
+        conn.executemany('INSERT INTO dataset VALUES (?, ?)', [
+            ('location', str(storage)),
+            ('pathPrefix', prefix),
+            ('sidecarFields', json.dumps(fields)),
+            ('builtAt', datetime.now(timezone.utc).isoformat()),
+        ])
+        conn.execute('ANALYZE')
+    conn.close()
+    os.replace(tmp_path, catalog_path)
+    return len(records)
+
+
+def _position_order(column, values, params):
+    """SQL ORDER BY term sorting column by its position in values (params are appended)."""
+    positions = {}
+    for value in values:
+        positions.setdefault(value, len(positions))
+    params.extend(item for pair in positions.items() for item in pair)
+    whens = ' '.join('WHEN ? THEN ?' for _ in positions)
+    return f'CASE {column} {whens} END'
+
+
+class CatalogStorage(Storage):
+    """A dataset as recorded in a build_catalog() SQLite file.
+
+    Directory listings, file tests and sidecar reads are answered from the
+    catalog, and select() turns a selection into an indexed query, so
+    resolving never touches the original dataset.
+    """
+
+    def __init__(self, catalog_path):
+        Storage.__init__(self)
+        self.catalog_path = catalog_path
+        self.conn = sqlite3.connect(catalog_path, check_same_thread=False)
+        try:
+            meta = dict(self.conn.execute('SELECT key, value FROM dataset'))
+        except sqlite3.DatabaseError as e:
+            raise StorageError(f'Not a BIDS catalog: {catalog_path} ({e})')
+        self.location = meta.get('location', '')
+        self.prefix = meta.get('pathPrefix', '')
+        self.is_remote = self.prefix.startswith('s3://')
+        self.mount_point = None
+
+    def __str__(self):
+        return f'{self.location} (catalog {self.catalog_path})'
+
+    def _scan(self, dir_key):
+        dirs = {name for (name,) in self.conn.execute(
+            'SELECT name FROM directories WHERE parent = ?', (dir_key,)
+        )}
+        files = dict(self.conn.execute(
+            'SELECT name, size FROM files WHERE parent = ?', (dir_key,)
+        ))
+        if not dirs and not files and dir_key and not self.conn.execute(
+            'SELECT 1 FROM directories WHERE key = ?', (dir_key,)
+        ).fetchone():
+            return None
+        return dirs, files
+
+    def read_text(self, key):
+        row = self.conn.execute('SELECT content FROM files WHERE key = ?', (key,)).fetchone()
+        if row is None or row[0] is None:
+            raise StorageError(f'{key} is not in the catalog')
+        return row[0]
+
+    def path(self, key):
+        return self.prefix + key
+
+    def size_of(self, path):
+        if not self.is_remote:
+            path = os.path.abspath(path)  # the prefix is absolute and normalized
+        if not path.startswith(self.prefix):
+            return 0
+        row = self.conn.execute(
+            'SELECT size FROM files WHERE key = ?', (path[len(self.prefix):],)
+        ).fetchone()
+        return row[0] if row and row[0] is not None else 0
+
+    def refresh(self):
+        return 0  # a catalog is a snapshot; rebuild it with --catalog
+
+    def select(self, selection, cohort=None, ignore=()):
+        datatype = selection['datatype']
+        where = ['datatype = ?', "extension IN ('.nii', '.nii.gz')"]
+        params = [datatype]
+        if 'suffix' in selection:
+            where.append('suffix = ?')
+            params.append(selection['suffix'])
+
+        # Rows come back in traversal order: explicit subject/session lists in
+        # the order given, everything else by name
+        order, order_params = [], []
+        subjects_spec = selection.get('subjects', 'all')
+        if subjects_spec != 'all':
+            order.append(_position_order('subject', subjects_spec, order_params))
+            for sub_id in subjects_spec:
+                if not self.is_dir(sub_id):
+                    return [], [f'Subject directory not found: {sub_id}']
+            where.append(f'subject IN ({", ".join("?" for _ in subjects_spec)})')
+            params.extend(subjects_spec)
+        if cohort is not None:
+            where.append(f'subject IN ({", ".join("?" for _ in cohort)})')
+            params.extend(cohort)
+
+        sessions_spec = selection.get('sessions', 'all')
+        if sessions_spec == 'all':
+            # Mirrors traversal: datatype directly under a subject only without sessions
+            where.append('(session IS NOT NULL OR has_sessions = 0)')
+        else:
+            where.append(f'session IN ({", ".join("?" for _ in sessions_spec)})')
+            params.extend(sessions_spec)
+        order.append('subject')
+        if sessions_spec != 'all':
+            order.append(_position_order('session', sessions_spec, order_params))
+        order.extend(['session', 'name'])
+
+        entity_cols = ', '.join(f'"{k}"' for k in ENTITY_KEYS)
+        rows = self.conn.execute(
+            f'SELECT key, suffix, extension, sidecar_key, {entity_cols} FROM files '
+            f'WHERE {" AND ".join(where)} ORDER BY {", ".join(order)}',
+            params + order_params,
+        )
+        matched = []
+        for row in rows:
+            key, suffix, extension, sidecar_key = row[:4]
+            entities = {k: v for k, v in zip(ENTITY_KEYS, row[4:]) if v is not None}
+            parsed = {'entities': entities, 'suffix': suffix, 'extension': extension}
+            # Remaining filters share matches_selection's exact semantics
+            if not matches_selection(parsed, selection) or is_ignored(key, ignore):
+                continue
+            entry = {
+                'path': self.path(key),
+                'key': key,
+                'entities': entities,
+                'suffix': suffix,
+            }
+            if sidecar_key:
+                entry['sidecar_path'] = self.path(sidecar_key)
+                entry['sidecar_key'] = sidecar_key
+            matched.append(entry)
+        return matched, []
+
+
+def open_storage(location, s3_endpoint=None, list_workers=16, mount_point=None):
+    """Return a Storage for a local directory, an s3:// URI or a catalog file."""
+    if isinstance(location, Storage):
+        return location
+    if str(location).startswith('s3://'):
+        return S3Storage(location, endpoint=s3_endpoint, workers=list_workers,
+                         mount_point=mount_point)
+    if os.path.isfile(str(location)):
+        return CatalogStorage(str(location))
+    return LocalStorage(location)
+
+
+def find_matching_files(bids_dir, selection, ignore=None):
     """Walk bids_dir and return files matching a single selection query.
 
-    Returns list of dicts with 'path', 'entities', 'suffix', 'sidecar_path'.
+    bids_dir is a local path, an s3:// URI or a Storage instance.
+    Participant filters (selection['participants'], see select_cohort) and
+    .bidsignore rules (loaded from the dataset unless passed as ignore) are
+    applied before descending, so excluded subjects and ignored directories
+    are never listed. Only sub-* directories are walked, so sourcedata/ and
+    derivatives/ are never visited.
+    Returns list of dicts with 'path', 'key', 'entities', 'suffix' and, when a
+    sidecar exists, 'sidecar_path' / 'sidecar_key' ('key's are relative to the
+    dataset root; 'path's are what the job file references).
     """
-    bids_dir = Path(bids_dir)
+    storage = open_storage(bids_dir)
     datatype = selection.get('datatype')
     if not datatype:
         return [], ['Selection missing required "datatype" field.']
+    if ignore is None:
+        ignore = load_bidsignore(storage)
+    cohort, errors = select_cohort(storage, selection.get('participants'))
+    if errors:
+        return [], errors
+
+    selected = storage.select(selection, cohort, ignore)
+    if selected is not None:
+        return selected
 
     # Determine which subjects to scan
     subjects_spec = selection.get('subjects', 'all')
-    if subjects_spec == 'all':
-        subject_dirs = sorted([
-            d for d in bids_dir.iterdir()
-            if d.is_dir() and d.name.startswith('sub-')
-        ])
+    if subjects_spec == 'all' and cohort is not None:
+        # Only cohort members are looked up; others cost no filesystem calls
+        subject_keys = [
+            sub_id for sub_id in cohort
+            if not is_ignored(sub_id, ignore, is_dir=True) and storage.is_dir(sub_id)
+        ]
+    elif subjects_spec == 'all':
+        subject_keys = [
+            d for d in storage.list_dir('')[0]
+            if d.startswith('sub-') and not is_ignored(d, ignore, is_dir=True)
+        ]
     else:
-        subject_dirs = []
+        subject_keys = []
         for sub_id in subjects_spec:
-            sub_dir = bids_dir / sub_id
-            if sub_dir.is_dir():
-                subject_dirs.append(sub_dir)
+            if storage.is_dir(sub_id):
+                subject_keys.append(sub_id)
             else:
                 return [], [f'Subject directory not found: {sub_id}']
+        allowed = set(cohort) if cohort is not None else None
+        subject_keys = [
+            k for k in subject_keys
+            if (allowed is None or k in allowed) and not is_ignored(k, ignore, is_dir=True)
+        ]
 
     # Determine sessions
     sessions_spec = selection.get('sessions', 'all')
@@ -144,47 +1060,47 @@ def find_matching_files(bids_dir, selection):
     matched = []
     errors = []
 
-    for sub_dir in subject_dirs:
+    for sub_key in subject_keys:
         # Find session directories or use root
         if sessions_spec == 'all':
-            ses_dirs = sorted([
-                d for d in sub_dir.iterdir()
-                if d.is_dir() and d.name.startswith('ses-')
-            ])
-            if not ses_dirs:
-                ses_dirs = [sub_dir]  # No sessions — datatype is directly under subject
+            ses_keys = [
+                f'{sub_key}/{d}' for d in storage.list_dir(sub_key)[0]
+                if d.startswith('ses-')
+            ]
+            if not ses_keys:
+                ses_keys = [sub_key]  # No sessions — datatype is directly under subject
         else:
-            ses_dirs = []
-            for ses_id in sessions_spec:
-                ses_dir = sub_dir / ses_id
-                if ses_dir.is_dir():
-                    ses_dirs.append(ses_dir)
-
-        for ses_dir in ses_dirs:
-            dt_dir = ses_dir / datatype if ses_dir != sub_dir else sub_dir / datatype
-            if ses_dir != sub_dir:
-                dt_dir = ses_dir / datatype
-            if not dt_dir.is_dir():
+            ses_keys = [
+                f'{sub_key}/{ses_id}' for ses_id in sessions_spec
+                if storage.is_dir(f'{sub_key}/{ses_id}')
+            ]
+
+        for ses_key in ses_keys:
+            dt_key = f'{ses_key}/{datatype}'
+            if is_ignored(dt_key, ignore, is_dir=True) or not storage.is_dir(dt_key):
                 continue
 
-            for fpath in sorted(dt_dir.iterdir()):
-                if not fpath.is_file():
-                    continue
-                parsed = parse_bids_filename(fpath.name)
+            for name in storage.list_dir(dt_key)[1]:
+                parsed = parse_bids_filename(name)
                 if not parsed:
                     continue
                 if not matches_selection(parsed, selection):
                     continue
 
+                key = f'{dt_key}/{name}'
+                if is_ignored(key, ignore):
+                    continue
                 entry = {
-                    'path': str(fpath),
+                    'path': storage.path(key),
+                    'key': key,
                     'entities': parsed['entities'],
                     'suffix': parsed['suffix'],
                 }
 
-                sidecar = find_sidecar(fpath)
+                sidecar = find_sidecar(key, storage.is_file)
                 if sidecar:
-                    entry['sidecar_path'] = sidecar
+                    entry['sidecar_path'] = storage.path(sidecar)
+                    entry['sidecar_key'] = sidecar
 
                 matched.append(entry)
 
@@ -204,10 +1120,10 @@ def make_relative_path(filepath, relative_to):
         return filepath
 
 
-def find_events_file(nifti_path):
+def find_events_file(nifti_path, exists=os.path.isfile):
     """Find the events TSV paired with a BOLD NIfTI file."""
     events_path = re.sub(r'_bold\.(nii\.gz|nii)$', '_events.tsv', str(nifti_path))
-    if os.path.isfile(events_path):
+    if exists(events_path):
         return events_path
     return None
 
@@ -215,16 +1131,30 @@ def find_events_file(nifti_path):
 def resolve_queries(bids_dir, query, relative_to=None):
     """Resolve all selection queries against a BIDS directory.
 
-    When relative_to is provided, file paths are made relative to that directory.
+    bids_dir is a local path, an s3:// URI or a Storage instance; one storage
+    (and its listing inventory) is shared by all selections.
+    A top-level "participants" object in the query is a cohort filter applied
+    to every selection (merged with each selection's own "participants").
+    When relative_to is provided, file paths are made relative to that directory
+    (except s3:// URIs, which are always absolute).
     Returns (resolved_dict, errors, warnings).
     """
+    storage = open_storage(bids_dir)
     selections = query.get('selections', {})
     resolved = {}
     all_errors = []
     all_warnings = []
+    if storage.is_remote and not storage.mount_point:
+        relative_to = None
+    ignore = load_bidsignore(storage)
 
     for key, selection in selections.items():
-        matched, errors = find_matching_files(bids_dir, selection)
+        # Query-level participant filters apply to every selection
+        if query.get('participants'):
+            criteria = dict(query['participants'])
+            criteria.update(selection.get('participants') or {})
+            selection = dict(selection, participants=criteria)
+        matched, errors = find_matching_files(storage, selection, ignore)
         all_errors.extend(errors)
 
         if not matched and not errors:
@@ -247,8 +1177,9 @@ def resolve_queries(bids_dir, query, relative_to=None):
         if selection.get('include_events'):
             events_entries = []
             for m in matched:
-                events_path = find_events_file(m['path'])
-                if events_path:
+                events_key = find_events_file(m['key'], storage.is_file)
+                if events_key:
+                    events_path = storage.path(events_key)
                     evt_path = make_relative_path(events_path, relative_to) if relative_to else events_path
                     events_entries.append({'class': 'File', 'path': evt_path})
                 else:
@@ -262,8 +1193,8 @@ def resolve_queries(bids_dir, query, relative_to=None):
         extract_params = selection.get('extract_sidecar_params', [])
         if extract_params and matched:
             # Use the first file's sidecar as representative
-            first_sidecar = matched[0].get('sidecar_path')
-            params = extract_sidecar_params(first_sidecar, extract_params)
+            first_sidecar = matched[0].get('sidecar_key')
+            params = extract_sidecar_params(first_sidecar, extract_params, storage)
             for param_name, param_value in params.items():
                 # Convert camelCase to snake_case for CWL
                 snake_name = re.sub(r'(?<!^)(?=[A-Z])', '_', param_name).lower()
@@ -438,17 +1369,417 @@ def _yaml_scalar(value):
     return s
 
 
+def _is_file_list(value):
+    """True for a non-empty list of {class: File} entries (a scatter array)."""
+    return (
+        isinstance(value, list) and len(value) > 0 and
+        all(isinstance(v, dict) and v.get('class') == 'File' for v in value)
+    )
+
+
+def _entry_size(entry, relative_to=None, storage=None):
+    """Size in bytes of a File entry's path (0 if it cannot be stat'ed)."""
+    path = entry['path']
+    if relative_to and not os.path.isabs(path) and not path.startswith('s3://'):
+        path = os.path.normpath(os.path.join(relative_to, path))
+    if storage is not None:
+        return storage.size_of(path)
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return 0
+
+
+def partition_balanced(weights, n_shards):
+    """Greedy longest-processing-time partition of weights into n_shards bins.
+
+    Units are placed largest first onto the currently lightest bin, which keeps
+    the heaviest bin within 4/3 of the optimum. Ties (notably all-zero weights
+    when sizes are unknown) go to the bin with the fewest units, so units are
+    spread by count and no bin stays empty while n_shards <= len(weights).
+    Returns a list of index lists, one per bin, each in ascending unit order.
+    """
+    heap = [(0, 0, i) for i in range(n_shards)]
+    bins = [[] for _ in range(n_shards)]
+    for unit in sorted(range(len(weights)), key=lambda u: (-weights[u], u)):
+        total, count, b = heapq.heappop(heap)
+        bins[b].append(unit)
+        heapq.heappush(heap, (total + weights[unit], count + 1, b))
+    return [sorted(b) for b in bins]
+
+
+def shard_resolved(resolved, n_shards, shard_by='size', relative_to=None, storage=None):
+    """Split the File arrays of a resolved job into n_shards balanced jobs.
+
+    shard_by='size' splits at the level of individual scatter positions: every
+    File array must have the same length (as required for dotproduct scatter,
+    e.g. bold with bold_events), and position i of each array moves together.
+    shard_by='subject' keeps all files of a subject in one shard, across all
+    arrays. Either way shards are balanced by total input bytes from os.stat.
+    Non-array values (scalars, sidecar parameters) are copied into every shard.
+    Sizes come from the storage inventory when a storage backend is given.
+
+    Returns (shards, errors) where each shard is a dict with 'job' (an ordered
+    mapping for write_job_yml), 'files', 'bytes' and 'subjects'.
+    """
+    from collections import OrderedDict
+
+    array_keys = [k for k, v in resolved.items() if _is_file_list(v)]
+    if not array_keys:
+        return [], ['No File arrays to shard.']
+
+    # Each unit is a list of (key, entry) pairs that must stay together
+    if shard_by == 'size':
+        lengths = {len(resolved[k]) for k in array_keys}
+        if len(lengths) > 1:
+            detail = ', '.join(f'{k}={len(resolved[k])}' for k in array_keys)
+            return [], [
+                f'Cannot shard by size: File arrays have different lengths ({detail}). '
+                f'Use --shard-by subject instead.'
+            ]
+        units = [
+            [(k, resolved[k][i]) for k in array_keys]
+            for i in range(lengths.pop())
+        ]
+    elif shard_by == 'subject':
+        by_subject = OrderedDict()
+        for k in array_keys:
+            for entry in resolved[k]:
+                m = SUBJECT_PATTERN.search(os.path.basename(entry['path']))
+                sub = m.group(1) if m else ''
+                by_subject.setdefault(sub, []).append((k, entry))
+        units = [by_subject[sub] for sub in sorted(by_subject)]
+    else:
+        return [], [f'Unknown shard mode: {shard_by}']
+
+    sizes = {}
+    weights = []
+    for unit in units:
+        total = 0
+        for _, entry in unit:
+            if entry['path'] not in sizes:
+                sizes[entry['path']] = _entry_size(entry, relative_to, storage)
+            total += sizes[entry['path']]
+        weights.append(total)
+
+    shards = []
+    for members in partition_balanced(weights, min(n_shards, len(units))):
+        if not members:
+            continue  # never write a job whose File arrays are all empty
+        job = OrderedDict()
+        subjects = set()
+        files = 0
+        for key, value in resolved.items():
+            job[key] = [] if key in array_keys else value
+        for u in members:
+            for key, entry in units[u]:
+                job[key].append(entry)
+                files += 1
+                m = SUBJECT_PATTERN.search(os.path.basename(entry['path']))
+                if m:
+                    subjects.add('sub-' + m.group(1))
+        shards.append({
+            'job': job,
+            'files': files,
+            'bytes': sum(weights[u] for u in members),
+            'subjects': sorted(subjects),
+        })
+    return shards, []
+
+
+def write_shards(shards, output_path, shard_by):
+    """Write one job file per shard and a JSON submission manifest next to output_path.
+
+    Job files are named <stem>_shard-NN.yml and the manifest <stem>_shards.json.
+    Returns the manifest path.
+    """
+    out_dir = os.path.dirname(output_path)
+    stem = os.path.splitext(os.path.basename(output_path))[0]
+    width = max(2, len(str(len(shards))))
+
+    entries = []
+    for i, shard in enumerate(shards, start=1):
+        job_name = f'{stem}_shard-{i:0{width}d}.yml'
+        write_job_yml(shard['job'], os.path.join(out_dir, job_name))
+        entries.append({
+            'shard': i,
+            'job': job_name,
+            'files': shard['files'],
+            'bytes': shard['bytes'],
+            'subjects': shard['subjects'],
+        })
+
+    totals = [s['bytes'] for s in shards]
+    mean = sum(totals) / len(totals) if totals else 0
+    manifest = {
+        'generatedAt': datetime.now(timezone.utc).isoformat(),
+        'shardBy': shard_by,
+        'shardCount': len(shards),
+        'totalFiles': sum(s['files'] for s in shards),
+        'totalBytes': sum(totals),
+        # Slowest shard relative to the average; 1.0 is a perfect split
+        'imbalance': round(max(totals) / mean, 4) if mean else 1.0,
+        'shards': entries,
+    }
+    manifest_path = os.path.join(out_dir, f'{stem}_shards.json')
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.write('\n')
+    return manifest_path
+
+
+def stage_inputs(resolved, storage, stage_dir, mode='auto'):
+    """Mirror the resolved dataset files into stage_dir as links, in place.
+
+    Every File entry whose path lies in the dataset is linked at the same
+    relative location under stage_dir (sub-01/anat/..., so BIDS names and
+    layout are kept) and its path is rewritten to the staged copy. mode is
+    'hardlink', 'symlink' or 'auto' (hardlink, falling back to an absolute
+    symlink when the stage is on another filesystem). Hardlinks need no
+    access to the dataset at run time, so a single bind mount of stage_dir
+    exposes all inputs; symlinks require the dataset at the same path.
+    Existing links to the same file are kept, so restaging is cheap.
+    Returns ({'hardlink': n, 'symlink': n, 'kept': n}, errors).
+    """
+    if storage.is_remote and not storage.mount_point:
+        return {}, ['Staging needs local files; use --mount-point for object-store datasets.']
+    root = os.path.abspath(storage.path(''))
+    stage_dir = os.path.abspath(stage_dir)
+    counts = {'hardlink': 0, 'symlink': 0, 'kept': 0}
+    errors = []
+    staged = {}
+
+    for value in resolved.values():
+        if not _is_file_list(value):
+            continue
+        for entry in value:
+            src = os.path.abspath(entry['path'])
+            rel = os.path.relpath(src, root)
+            if rel.startswith(os.pardir):
+                continue  # not part of the dataset
+            dst = os.path.join(stage_dir, rel)
+            if src not in staged:
+                try:
+                    counts[_link_file(src, dst, mode)] += 1
+                except OSError as e:
+                    errors.append(f'Cannot stage {rel}: {e}')
+                    continue
+                staged[src] = dst
+            entry['path'] = staged[src]
+    return counts, errors
+
+
+def _link_file(src, dst, mode):
+    """Link src at dst; returns 'hardlink', 'symlink' or 'kept'."""
+    if os.path.lexists(dst):
+        if os.path.islink(dst):
+            if os.readlink(dst) == src and mode != 'hardlink':
+                return 'kept'
+        elif os.path.samefile(src, dst) and mode != 'symlink':
+            return 'kept'
+        os.remove(dst)
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    if mode != 'symlink':
+        try:
+            os.link(src, dst)
+            return 'hardlink'
+        except OSError as e:
+            if mode == 'hardlink' or e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                raise
+    os.symlink(src, dst)
+    return 'symlink'
+
+
+# Seconds between --serve index refreshes. An s3:// refresh relists the whole
+# prefix (one request per 1000 keys), so remote datasets poll far less often.
+POLL_INTERVAL = 2.0
+REMOTE_POLL_INTERVAL = 600.0
+
+
+class ResolverService:
+    """In-memory dataset index answering resolve_queries requests.
+
+    The storage inventory is warmed once, then kept current by a polling
+    thread that calls storage.refresh() every poll_interval seconds. Requests
+    and refreshes are serialized by a lock; both only touch memory (plus the
+    sidecars a query extracts parameters from), so warm queries take
+    milliseconds.
+    """
+
+    def __init__(self, storage, poll_interval=POLL_INTERVAL):
+        self.storage = storage
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.last_refresh = None
+        self.refreshes = 0
+        self.requests = 0
+        self._stop = threading.Event()
+
+    def warm(self):
+        with self.lock:
+            return self.storage.warm()
+
+    def resolve(self, query, relative_to=None):
+        with self.lock:
+            self.requests += 1
+            return resolve_queries(self.storage, query, relative_to)
+
+    def refresh(self):
+        with self.lock:
+            relisted = self.storage.refresh()
+            self.refreshes += 1
+            self.last_refresh = time.time()
+            return relisted
+
+    def status(self):
+        with self.lock:
+            directories, files = self.storage.stats()
+            return {
+                'dataset': str(self.storage),
+                'directories': directories,
+                'files': files,
+                'requests': self.requests,
+                'refreshes': self.refreshes,
+                'uptimeSeconds': round(time.time() - self.started, 3),
+                'lastRefresh': (
+                    datetime.fromtimestamp(self.last_refresh, timezone.utc).isoformat()
+                    if self.last_refresh else None
+                ),
+            }
+
+    def poll(self):
+        """Refresh loop for a background thread; returns when stop() is called."""
+        while not self._stop.wait(self.poll_interval):
+            try:
+                relisted = self.refresh()
+            except StorageError as e:
+                print(f'Warning: refresh failed: {e}', file=sys.stderr)
+                continue
+            if relisted and not self.storage.is_remote:
+                print(f'Index updated: {relisted} directories relisted', file=sys.stderr)
+
+    def stop(self):
+        self._stop.set()
+
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    """HTTPServer handling each request in a thread (http.server has one only from 3.7)."""
+    daemon_threads = True
+
+
+def make_request_handler(service):
+    """HTTP handler class bound to a ResolverService.
+
+    GET  /status           index statistics
+    POST /resolve          body: bids_query.json; optional ?relative_to=DIR
+                           -> {"resolved": {...}, "errors": [...], "warnings": [...]}
+    POST /refresh          poll for changes now
+    """
+
+    class ResolverRequestHandler(BaseHTTPRequestHandler):
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if urllib.parse.urlsplit(self.path).path == '/status':
+                self._send_json(200, service.status())
+            else:
+                self._send_json(404, {'error': f'Unknown endpoint: {self.path}'})
+
+        def do_POST(self):
+            url = urllib.parse.urlsplit(self.path)
+            try:
+                if url.path == '/refresh':
+                    self._send_json(200, {'relisted': service.refresh()})
+                elif url.path == '/resolve':
+                    length = int(self.headers.get('Content-Length') or 0)
+                    query = json.loads(self.rfile.read(length).decode('utf-8'))
+                    params = urllib.parse.parse_qs(url.query)
+                    relative_to = params.get('relative_to', [None])[0]
+                    resolved, errors, warnings = service.resolve(query, relative_to)
+                    self._send_json(200, {
+                        'resolved': resolved, 'errors': errors, 'warnings': warnings,
+                    })
+                else:
+                    self._send_json(404, {'error': f'Unknown endpoint: {self.path}'})
+            except (ValueError, AttributeError) as e:
+                self._send_json(400, {'error': f'Invalid request: {e}'})
+            except StorageError as e:
+                self._send_json(502, {'error': str(e)})
+
+    return ResolverRequestHandler
+
+
+def serve(storage, host='127.0.0.1', port=8765, poll_interval=None):
+    """Warm the index, start the polling thread and serve requests until interrupted.
+
+    poll_interval defaults to POLL_INTERVAL, or REMOTE_POLL_INTERVAL for
+    remote storage; 0 disables polling.
+    """
+    if poll_interval is None:
+        poll_interval = REMOTE_POLL_INTERVAL if storage.is_remote else POLL_INTERVAL
+    service = ResolverService(storage, poll_interval)
+    started = time.time()
+    directories, files = service.warm()
+    print(
+        f'Indexed {files} files in {directories} directories of {storage} '
+        f'in {time.time() - started:.2f}s',
+        file=sys.stderr
+    )
+    if poll_interval > 0:
+        threading.Thread(target=service.poll, daemon=True).start()
+        print(f'Refreshing the index every {poll_interval:g}s', file=sys.stderr)
+    server = ThreadingHTTPServer((host, port), make_request_handler(service))
+    print(f'Serving on http://{host}:{server.server_address[1]}', file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        server.server_close()
+
+
+def resolve_via_server(server_url, query, relative_to=None):
+    """Send a query to a running resolver service; same return as resolve_queries."""
+    from collections import OrderedDict
+
+    url = server_url.rstrip('/') + '/resolve'
+    if relative_to:
+        url += '?' + urllib.parse.urlencode({'relative_to': relative_to})
+    request = urllib.request.Request(
+        url, data=json.dumps(query).encode('utf-8'),
+        headers={'Content-Type': 'application/json'},
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=300) as response:
+            payload = json.loads(response.read().decode('utf-8'), object_pairs_hook=OrderedDict)
+    except urllib.error.HTTPError as e:
+        raise StorageError(f'Resolver service returned HTTP {e.code}: {e.read().decode("utf-8", "replace")}')
+    except urllib.error.URLError as e:
+        raise StorageError(f'Cannot reach resolver service at {server_url}: {e.reason}')
+    return payload['resolved'], payload['errors'], payload['warnings']
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Resolve BIDS queries to CWL job inputs'
     )
     parser.add_argument(
-        '--bids-dir', required=True,
-        help='Path to BIDS dataset root directory'
+        '--bids-dir', default=None, dest='bids_dir',
+        help='Path to BIDS dataset root directory, or s3://bucket/prefix on an '
+             'S3-compatible object store'
     )
     parser.add_argument(
-        '--query', required=True,
-        help='Path to bids_query.json file'
+        '--query', default=None,
+        help='Path to bids_query.json file (required unless --serve)'
     )
     parser.add_argument(
         '--job', default=None,
@@ -463,39 +1794,166 @@ def main():
         help='Make file paths relative to this directory (typically the output file directory). '
              'If not provided, absolute paths are used.'
     )
+    parser.add_argument(
+        '--shards', type=int, default=0,
+        help='Split the resolved File arrays into this many job files balanced by '
+             'total input bytes, plus a <output>_shards.json submission manifest'
+    )
+    parser.add_argument(
+        '--shard-by', choices=['size', 'subject'], default='size', dest='shard_by',
+        help='Shard unit: individual scatter positions (size) or whole subjects (subject)'
+    )
+    parser.add_argument(
+        '--s3-endpoint', default=None, dest='s3_endpoint',
+        help='Object store endpoint URL for s3:// datasets (default: $AWS_ENDPOINT_URL, '
+             'else AWS S3)'
+    )
+    parser.add_argument(
+        '--list-workers', type=int, default=16, dest='list_workers',
+        help='Concurrent listing requests for s3:// datasets (default: 16)'
+    )
+    parser.add_argument(
+        '--mount-point', default=None, dest='mount_point',
+        help='Write s3:// dataset files as paths under this directory (where the bucket '
+             'prefix is mounted at run time) instead of s3:// URIs'
+    )
+    parser.add_argument(
+        '--serve', type=int, default=None, metavar='PORT',
+        help='Run as a resolver service: index --bids-dir once, keep it current by '
+             'polling, and answer POST /resolve requests on this port (0 picks a free port)'
+    )
+    parser.add_argument(
+        '--host', default='127.0.0.1',
+        help='Address for --serve to bind (default: 127.0.0.1)'
+    )
+    parser.add_argument(
+        '--poll-interval', type=float, default=None, dest='poll_interval',
+        help=f'Seconds between index refreshes in --serve mode; 0 disables polling '
+             f'(default: {POLL_INTERVAL:g}, or {REMOTE_POLL_INTERVAL:g} for s3:// datasets, '
+             f'where every refresh relists the whole prefix)'
+    )
+    parser.add_argument(
+        '--server', default=None,
+        help='Resolve through a running --serve instance at this URL '
+             '(e.g. http://127.0.0.1:8765) instead of scanning --bids-dir'
+    )
+    parser.add_argument(
+        '--catalog', default=None,
+        help='Export the dataset inventory to this indexed SQLite catalog (files, '
+             'entities, sizes, sidecar fields). A catalog can be passed as --bids-dir '
+             'to resolve queries without touching the dataset.'
+    )
+    parser.add_argument(
+        '--catalog-fields', default=None, dest='catalog_fields',
+        help='Comma-separated sidecar fields stored as catalog columns '
+             f'(default: {",".join(CATALOG_SIDECAR_FIELDS)}, plus any the query extracts)'
+    )
+    parser.add_argument(
+        '--stage', default=None, metavar='DIR',
+        help='Link the selected files into DIR, mirroring the dataset layout, and point '
+             'the job at the staged paths (one bind mount exposes all inputs)'
+    )
+    parser.add_argument(
+        '--stage-mode', choices=['auto', 'hardlink', 'symlink'], default='auto',
+        dest='stage_mode',
+        help='Link type for --stage: hardlink, symlink, or auto (hardlink, symlink '
+             'across filesystems; default)'
+    )
     args = parser.parse_args()
 
+    if args.shards < 0:
+        print('Error: --shards must be a positive integer', file=sys.stderr)
+        sys.exit(1)
+    if args.poll_interval is not None and args.poll_interval < 0:
+        print('Error: --poll-interval must not be negative', file=sys.stderr)
+        sys.exit(1)
+
+    if not args.bids_dir and not args.server:
+        print('Error: --bids-dir is required (or --server)', file=sys.stderr)
+        sys.exit(1)
+    if args.serve is None and not args.query and not args.catalog:
+        print('Error: --query is required', file=sys.stderr)
+        sys.exit(1)
+
     # Determine output path
     output_path = args.output or args.job
-    if not output_path:
+    if not output_path and args.serve is None and args.query:
         print('Error: --output or --job is required', file=sys.stderr)
         sys.exit(1)
 
-    # Validate BIDS directory
-    if not os.path.isdir(args.bids_dir):
-        print(f'Error: BIDS directory not found: {args.bids_dir}', file=sys.stderr)
-        sys.exit(1)
-
-    # Validate dataset_description.json
-    desc_path = os.path.join(args.bids_dir, 'dataset_description.json')
-    if not os.path.isfile(desc_path):
-        print(
-            f'Warning: No dataset_description.json found at {args.bids_dir}. '
-            f'This may not be a valid BIDS dataset.',
-            file=sys.stderr
-        )
+    storage = None
+    if not args.server:
+        # Validate BIDS directory (for s3:// this lists the whole dataset inventory)
+        try:
+            storage = open_storage(
+                args.bids_dir, s3_endpoint=args.s3_endpoint,
+                list_workers=args.list_workers, mount_point=args.mount_point,
+            )
+        except StorageError as e:
+            print(f'Error: {e}', file=sys.stderr)
+            sys.exit(1)
+        if not storage.is_dir(''):
+            print(f'Error: BIDS directory not found: {args.bids_dir}', file=sys.stderr)
+            sys.exit(1)
+
+        # Validate dataset_description.json
+        if not storage.is_file('dataset_description.json'):
+            print(
+                f'Warning: No dataset_description.json found at {args.bids_dir}. '
+                f'This may not be a valid BIDS dataset.',
+                file=sys.stderr
+            )
 
     # Read query
-    try:
-        with open(args.query) as f:
-            query = json.load(f)
-    except (json.JSONDecodeError, IOError) as e:
-        print(f'Error reading query file: {e}', file=sys.stderr)
+    query = None
+    if args.query:
+        try:
+            with open(args.query) as f:
+                query = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f'Error reading query file: {e}', file=sys.stderr)
+            sys.exit(1)
+
+    if args.catalog:
+        if storage is None:
+            print('Error: --catalog needs --bids-dir', file=sys.stderr)
+            sys.exit(1)
+        fields = (
+            args.catalog_fields.split(',') if args.catalog_fields
+            else list(CATALOG_SIDECAR_FIELDS)
+        )
+        for selection in (query or {}).get('selections', {}).values():
+            fields.extend(selection.get('extract_sidecar_params', []))
+        try:
+            count = build_catalog(storage, args.catalog, fields)
+        except (StorageError, sqlite3.Error, OSError) as e:
+            print(f'Error writing catalog: {e}', file=sys.stderr)
+            sys.exit(1)
+        print(f'Catalogued {count} files to {args.catalog}')
+        if query is None:
+            return
+
+    if args.serve is not None:
+        serve(storage, args.host, args.serve, args.poll_interval)
+        return
+
+    if args.stage and storage is None:
+        print('Error: --stage needs --bids-dir', file=sys.stderr)
         sys.exit(1)
 
-    # Resolve (relative_to makes paths relative to a base directory for portability)
+    # Resolve (relative_to makes paths relative to a base directory for portability;
+    # when staging, paths are made relative after they are rewritten to the stage)
     relative_to = os.path.abspath(args.relative_to) if args.relative_to else None
-    resolved, errors, warnings = resolve_queries(args.bids_dir, query, relative_to)
+    try:
+        if args.server:
+            resolved, errors, warnings = resolve_via_server(args.server, query, relative_to)
+        else:
+            resolved, errors, warnings = resolve_queries(
+                storage, query, None if args.stage else relative_to
+            )
+    except StorageError as e:
+        print(f'Error: {e}', file=sys.stderr)
+        sys.exit(1)
 
     for w in warnings:
         print(f'Warning: {w}', file=sys.stderr)
@@ -505,12 +1963,62 @@ def main():
             print(f'Error: {e}', file=sys.stderr)
         sys.exit(1)
 
+    if args.stage:
+        counts, errors = stage_inputs(resolved, storage, args.stage, args.stage_mode)
+        if errors:
+            for e in errors:
+                print(f'Error: {e}', file=sys.stderr)
+            sys.exit(1)
+        if relative_to:
+            for value in resolved.values():
+                if _is_file_list(value):
+                    for entry in value:
+                        entry['path'] = make_relative_path(entry['path'], relative_to)
+        print(
+            f'Staged inputs in {args.stage}: {counts["hardlink"]} hardlinks, '
+            f'{counts["symlink"]} symlinks, {counts["kept"]} already staged'
+        )
+        if counts['symlink']:
+            print(
+                'Warning: symlinked inputs point into the dataset, which must be mounted '
+                'at the same path where the workflow runs',
+                file=sys.stderr
+            )
+
     # Merge with existing job file if provided
     if args.job:
         existing = parse_existing_job(args.job)
         existing.update(resolved)
         resolved = existing
 
+    if args.shards:
+        shards, errors = shard_resolved(
+            resolved, args.shards, args.shard_by, relative_to,
+            None if args.stage else storage
+        )
+        if errors:
+            for e in errors:
+                print(f'Error: {e}', file=sys.stderr)
+            sys.exit(1)
+        if not any(shard['bytes'] for shard in shards):
+            print(
+                'Warning: input sizes could not be determined; shards are balanced by '
+                'file count',
+                file=sys.stderr
+            )
+        if len(shards) < args.shards:
+            print(
+                f'Warning: only {len(shards)} shard units available; '
+                f'writing {len(shards)} shards instead of {args.shards}',
+                file=sys.stderr
+            )
+        manifest_path = write_shards(shards, output_path, args.shard_by)
+        for shard in shards:
+            print(f'  {shard["files"]} files, {shard["bytes"]} bytes, '
+                  f'{len(shard["subjects"])} subjects')
+        print(f'Wrote {len(shards)} shard jobs; manifest: {manifest_path}')
+        return
+
     # Write output
     write_job_yml(resolved, output_path)
 
@@ -511,6 +511,48 @@ cwltool workflows/${safeWorkflowName}.cwl job.yml
 The \`--job\` flag tells the resolver to read the existing job file first, preserving all
 scalar parameters. The \`--output\` flag specifies where to write the merged result.
 
+### Cohort Filters and .bidsignore
+Add a \`participants\` object to \`bids_query.json\` (top level, or inside one selection) to
+keep only subjects whose \`participants.tsv\` columns match, e.g.
+\`"participants": {"group": "patient", "age": ">60"}\`. Values are matched exactly;
+\`>\`, \`>=\`, \`<\`, \`<=\` and \`!=\` prefixes compare numerically, and a list matches any
+of its values. Paths listed in the dataset's \`.bidsignore\` are skipped, and only \`sub-*\`
+directories are read (never \`sourcedata/\` or \`derivatives/\`). Excluded subjects are
+never listed.
+
+### Staging Inputs
+Add \`--stage staged\` to hardlink the selected files into \`staged/\` (same layout as the
+dataset) and write the job against those paths, so one bind mount of the bundle exposes
+every input without copying data. Across filesystems the resolver falls back to symlinks,
+which need the dataset mounted at the same path; \`--stage-mode hardlink\` or
+\`symlink\` forces one link type.
+
+### Sharding Across Nodes
+Add \`--shards K\` to split the resolved inputs into K job files (\`job_shard-01.yml\`, ...)
+balanced by total input size, plus a \`job_shards.json\` manifest listing each shard's
+files, bytes and subjects. Use \`--shard-by subject\` to keep every subject in one shard
+(required when the workflow mixes per-subject and per-run inputs). Each node then runs
+\`cwltool workflows/${safeWorkflowName}.cwl job_shard-NN.yml\`.
+
+### Datasets in Object Storage
+\`--bids-dir\` also accepts \`s3://bucket/prefix\` on S3 or any S3-compatible store
+(set \`--s3-endpoint\` or \`AWS_ENDPOINT_URL\`, and \`AWS_ACCESS_KEY_ID\` /
+\`AWS_SECRET_ACCESS_KEY\`). The dataset is listed in bulk with concurrent requests instead
+of one request per file. Add \`--mount-point /path\` to write paths under a mount of the
+same prefix instead of \`s3://\` URIs.
+
+### Resolver Service
+For repeated submissions against one dataset, keep its index in memory:
+\`python3 resolve_bids.py --bids-dir /data/bids --serve 8765\` scans once, picks up
+added or removed files by polling, and answers queries in milliseconds. Point the normal
+command at it with \`--server http://127.0.0.1:8765\` in place of \`--bids-dir\`.
+
+### Dataset Catalog
+\`python3 resolve_bids.py --bids-dir /data/bids --catalog bids.sqlite\` exports the scanned
+dataset to an indexed SQLite file (one row per file with BIDS entities, sizes and common
+sidecar fields as columns) for ad-hoc SQL queries. Pass the catalog as \`--bids-dir\` to
+resolve \`bids_query.json\` from it without reading the dataset again.
+
 ### Manual Override
 You can edit \`workflows/${safeWorkflowName}_job.yml\` directly to specify custom file paths
 without using the BIDS resolver.
@@ -14,7 +14,7 @@ OUT_DIR="${SCRIPT_DIR}/out"
 LOG_DIR="${SCRIPT_DIR}/logs"
 DATA_DIR="${SCRIPT_DIR}/data"
 DERIVED_DIR="${SCRIPT_DIR}/derived"
-SUMMARY_FILE="${SCRIPT_DIR}/summary.tsv"
+SUMMARY_FILE="${CWL_TEST_SUMMARY_FILE:-${SCRIPT_DIR}/summary.tsv}"
 
 # Docker images
 FSL_IMAGE="${FSL_DOCKER_IMAGE:-brainlife/fsl:latest}"
@@ -23,6 +23,13 @@ DOCKER_PLATFORM="${DOCKER_PLATFORM:-}"
 
 CWLTOOL_BIN="${CWLTOOL_BIN:-cwltool}"
 CWLTOOL_ARGS=()
+
+# Route cwltool runs through the resource profiler when CWL_TEST_PROFILE=1
+CWL_PROFILE_CMD=()
+if [[ "${CWL_TEST_PROFILE:-0}" == "1" ]]; then
+  CWL_PROFILE_CMD=(python3 "${ROOT_DIR}/utils/test_harness/profile_tool.py" run --)
+fi
+
 RERUN_PASSED=0
 
 for arg in "$@"; do
@@ -193,38 +200,8 @@ PY
 verify_nifti_headers() {
   local out_dir="$1"
   shift
-  local patterns=("$@")
-  python3 - "$out_dir" "${patterns[@]}" <<'PY'
-import sys, os, glob
-
-out_dir = sys.argv[1]
-patterns = sys.argv[2:]
-
-try:
-    import nibabel as nib
-except ImportError:
-    print("WARNING: nibabel not installed, skipping header check")
-    sys.exit(0)
-
-ok = True
-for pattern in patterns:
-    full_pattern = os.path.join(out_dir, pattern)
-    matches = glob.glob(full_pattern, recursive=True)
-    if not matches:
-        print(f"WARN: no files match {pattern}")
-        continue
-    for path in matches:
-        try:
-            img = nib.load(path)
-            hdr = img.header
-            dims = img.shape
-            print(f"OK: {os.path.basename(path)} shape={dims} dtype={hdr.get_data_dtype()}")
-        except Exception as e:
-            print(f"FAIL: {os.path.basename(path)}: {e}")
-            ok = False
-
-sys.exit(0 if ok else 1)
-PY
+  # Header-only check of every match in one process (no nibabel import).
+  python3 "${ROOT_DIR}/utils/test_harness/nifti_check.py" --root "$out_dir" "$@"
 }
 
 RUN_TOOL_STATUS=0
@@ -242,8 +219,9 @@ run_tool() {
   echo "  CWL:  ${cwl_file}"
   echo "  Job:  ${job_file}"
 
-  # Validate (run from /tmp to avoid Docker+WSL os.getcwd() breakage)
-  if ! (cd /tmp && "$CWLTOOL_BIN" --validate "$cwl_file") >>"$log_file" 2>&1; then
+  # Validate (run from /tmp to avoid Docker+WSL os.getcwd() breakage); unchanged
+  # CWL files are skipped via the validate_cwl.py content-hash cache
+  if ! (cd /tmp && python3 "${ROOT_DIR}/utils/test_harness/validate_cwl.py" --cwltool "$CWLTOOL_BIN" "$cwl_file") >>"$log_file" 2>&1; then
     echo "  Result: FAIL (CWL validation failed)"
     RUN_TOOL_STATUS=1
     echo -e "${name}\tFAIL" >>"$SUMMARY_FILE"
@@ -251,7 +229,7 @@ run_tool() {
   fi
 
   # Execute (run from /tmp to avoid Docker+WSL os.getcwd() breakage)
-  if (cd /tmp && "$CWLTOOL_BIN" "${CWLTOOL_ARGS[@]}" --outdir "$tool_out_dir" "$cwl_file" "$job_file") \
+  if (cd /tmp && "${CWL_PROFILE_CMD[@]}" "$CWLTOOL_BIN" "${CWLTOOL_ARGS[@]}" --outdir "$tool_out_dir" "$cwl_file" "$job_file") \
       >"$out_json" 2>"$log_file"; then
     if verify_outputs "$out_json" >>"$log_file" 2>&1; then
       status="PASS"
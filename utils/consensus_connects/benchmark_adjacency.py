@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""Benchmark and scale-test the tool adjacency builders on synthetic data.
+
+For every (tool count, mean out-degree) combination this generates, in a
+scratch directory:
+- a tool-level Mermaid graph (.mmd), including chained and fan-out edges
+- one adjacency CSV and one tool_to_subsection_map.json per synthetic modality
+- a cross-modality rules JSON linking subsections across modalities
+
+and then times each stage of the real scripts (parse_tool_graph, build_matrix,
+write_csv_matrix, load_edges_from_csv, consensus merge, expand_cross_modality_edges,
+write_matrix_csv). Wall time is the best of --repeat runs; peak memory comes from
+a separate tracemalloc pass so it does not skew the timings.
+
+Results are emitted as JSON, including per-stage scaling exponents between
+consecutive tool counts: against the tool count N (log t2/t1 over log n2/n1)
+and against the stage's own work size (STAGE_SIZES): tools + edges for the
+Mermaid parser, N^2 cells for the stages that build, write or read a dense
+matrix CSV, and tools + expanded edges for the cross-modality rules. A stage
+that is linear in its work size has a size exponent near 1.
+
+--degree sweeps hold the mean out-degree fixed, so edges grow as degree * N
+and an N x N pass over the sparse graph shows up near 2 (and an extra factor
+of N on a dense stage near 1.5). --max-exponent gates on these fixed-degree
+size exponents only. --density sweeps (out-degree as a fraction of N) are
+reported for reference and never gated: there the edge count itself grows as
+N^2, so a dense pass is indistinguishable from reading the edges. Everything
+runs offline with the standard library.
+
+Usage:
+    python benchmark_adjacency.py --sizes 100 1000 5000 --degree 4 16 --out bench.json
+    python benchmark_adjacency.py --sizes 1000 2000 4000 --max-exponent 1.6
+    python benchmark_adjacency.py --sizes 100 1000 --degree --density 0.01 0.05
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import gc
+import json
+import math
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+
+from build_consensus_tool_adjacency import (
+    expand_cross_modality_edges,
+    load_edges_from_csv,
+    load_subsection_maps,
+    write_matrix_csv,
+)
+from build_tool_adjacency import build_matrix, parse_tool_graph, write_csv_matrix
+
+
+SUBSECTIONS_PER_MODALITY = 8
+
+# What each stage's work is proportional to: the sparse graph (tools + edges),
+# the dense tool x tool matrix it builds, writes or reads, or the tool edges
+# the cross-modality rules expand to (plus tools).
+STAGE_SIZES = {
+    "parse_tool_graph": "graph",
+    "build_matrix": "cells",
+    "write_csv_matrix": "cells",
+    "load_edges_from_csv": "cells",
+    "consensus_merge": "cells",
+    "expand_cross_modality_edges": "crossModality",
+    "write_matrix_csv": "cells",
+}
+
+
+def generate_synthetic_edges(
+    num_tools: int,
+    mean_degree: float,
+    rng: random.Random,
+) -> Tuple[List[str], Set[Tuple[str, str]]]:
+    """Random directed graph with expected out-degree mean_degree (capped at num_tools - 1)."""
+    tools = [f"tool_{idx:05d}" for idx in range(num_tools)]
+    mean_degree = min(mean_degree, num_tools - 1)
+    edges: Set[Tuple[str, str]] = set()
+    for src_idx in range(num_tools):
+        spread = math.sqrt(mean_degree) or 1.0
+        degree = min(num_tools - 1, max(0, int(rng.gauss(mean_degree, spread))))
+        for dst_idx in rng.sample(range(num_tools), degree):
+            if dst_idx != src_idx:
+                edges.add((tools[src_idx], tools[dst_idx]))
+    if not edges and num_tools > 1:
+        edges.add((tools[0], tools[1]))
+    return tools, edges
+
+
+def write_synthetic_mermaid(graph_path: Path, tools: List[str], edges: Set[Tuple[str, str]]) -> None:
+    """Write nodes plus edges, folding runs of edges into chained and `&` fan-out statements."""
+    by_source: Dict[str, List[str]] = {}
+    for src, dst in sorted(edges):
+        by_source.setdefault(src, []).append(dst)
+
+    with graph_path.open("w", encoding="utf-8") as handle:
+        handle.write("flowchart LR\n\n  %% === Node Definitions ===\n")
+        for tool in tools:
+            handle.write(f'  {tool}["{tool}"]\n')
+        handle.write("\n  %% === Edges ===\n")
+        for src, targets in by_source.items():
+            # Alternate statement forms so every tokenizer branch is exercised.
+            if len(targets) >= 3:
+                handle.write(f"  {src} --> {' & '.join(targets[:3])}\n")
+                rest = targets[3:]
+            else:
+                rest = targets
+            for dst in rest:
+                handle.write(f"  {src} -->|feeds| {dst}\n")
+
+
+def write_synthetic_modalities(
+    connects_root: Path,
+    tools: List[str],
+    edges: Set[Tuple[str, str]],
+    num_modalities: int,
+    rng: random.Random,
+) -> Tuple[List[Path], Path]:
+    """Partition tools into modalities and write their CSVs, subsection maps and rules."""
+    tool_modality = {tool: idx % num_modalities for idx, tool in enumerate(tools)}
+    csv_paths: List[Path] = []
+
+    for mod_idx in range(num_modalities):
+        name = f"mod{mod_idx}"
+        mod_tools = sorted(tool for tool in tools if tool_modality[tool] == mod_idx)
+        mod_tool_set = set(mod_tools)
+        mod_edges = {(src, dst) for src, dst in edges if src in mod_tool_set and dst in mod_tool_set}
+
+        connects_dir = connects_root / f"{name}_tests" / "connects"
+        connects_dir.mkdir(parents=True, exist_ok=True)
+        csv_path = connects_dir / f"{name}_tool_adjacency_matrix.csv"
+        write_csv_matrix(csv_path, mod_tools, build_matrix(mod_tools, mod_edges))
+        csv_paths.append(csv_path)
+
+        by_tool = {
+            tool: {"subsectionKey": f"Lib{mod_idx} / Stage-{sub_idx % SUBSECTIONS_PER_MODALITY}"}
+            for sub_idx, tool in enumerate(mod_tools)
+        }
+        map_path = connects_dir / f"{name}_tool_to_subsection_map.json"
+        map_path.write_text(
+            json.dumps({"modality": name, "byTool": by_tool}), encoding="utf-8"
+        )
+
+    rules = []
+    for _ in range(num_modalities * SUBSECTIONS_PER_MODALITY):
+        src_mod, dst_mod = rng.randrange(num_modalities), rng.randrange(num_modalities)
+        rules.append({
+            "sourceModality": f"mod{src_mod}",
+            "sourceSubsection": f"Lib{src_mod} / Stage-{rng.randrange(SUBSECTIONS_PER_MODALITY)}",
+            "targetModality": f"mod{dst_mod}",
+            "targetSubsection": f"Lib{dst_mod} / Stage-{rng.randrange(SUBSECTIONS_PER_MODALITY)}",
+        })
+    rules_path = connects_root / "cross_modality_edges.json"
+    rules_path.write_text(json.dumps({"edges": rules}), encoding="utf-8")
+    return csv_paths, rules_path
+
+
+def _time_stage(func: Callable[[], object], repeat: int) -> Tuple[float, object]:
+    best = math.inf
+    result: object = None
+    for _ in range(repeat):
+        gc.collect()
+        # As in timeit: cyclic GC passes over the millions of edge tuples would
+        # add a superlinear term that is not the stage's own work.
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            result = func()
+            best = min(best, time.perf_counter() - started)
+        finally:
+            gc.enable()
+    return best, result
+
+
+def _peak_memory(func: Callable[[], object]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run_case(
+    work_dir: Path,
+    num_tools: int,
+    sweep: str,
+    value: float,
+    num_modalities: int,
+    repeat: int,
+    seed: int,
+) -> Dict[str, object]:
+    """Time every stage at one tool count; ``sweep`` is "degree" or "density"."""
+    mean_degree = value if sweep == "degree" else value * (num_tools - 1)
+    rng = random.Random(f"{seed}:{num_tools}:{sweep}:{value}")
+    tools, edges = generate_synthetic_edges(num_tools, mean_degree, rng)
+
+    case_dir = work_dir / f"n{num_tools}_{sweep}{value:g}"
+    case_dir.mkdir(parents=True, exist_ok=True)
+    graph_path = case_dir / "synthetic_tool_graph.mmd"
+    write_synthetic_mermaid(graph_path, tools, edges)
+    csv_paths, rules_path = write_synthetic_modalities(case_dir, tools, edges, num_modalities, rng)
+
+    tool_order = sorted(tools)
+    matrix = build_matrix(tool_order, edges)
+    subsection_maps = load_subsection_maps(case_dir)
+    xmod_edges = expand_cross_modality_edges(rules_path, subsection_maps)[0]
+
+    def consensus_merge() -> Set[Tuple[str, str]]:
+        merged: Set[Tuple[str, str]] = set()
+        for csv_path in csv_paths:
+            merged.update(load_edges_from_csv(csv_path)[1])
+        return merged
+
+    stages: Dict[str, Callable[[], object]] = {
+        "parse_tool_graph": lambda: parse_tool_graph(graph_path),
+        "build_matrix": lambda: build_matrix(tool_order, edges),
+        "write_csv_matrix": lambda: write_csv_matrix(case_dir / "out_tool.csv", tool_order, matrix),
+        "load_edges_from_csv": lambda: load_edges_from_csv(csv_paths[0]),
+        "consensus_merge": consensus_merge,
+        "expand_cross_modality_edges": lambda: expand_cross_modality_edges(rules_path, subsection_maps),
+        "write_matrix_csv": lambda: write_matrix_csv(case_dir / "out_consensus.csv", tool_order, edges),
+    }
+
+    results: Dict[str, Dict[str, float]] = {}
+    for name, func in stages.items():
+        seconds, _ = _time_stage(func, repeat)
+        results[name] = {"seconds": round(seconds, 6), "peakBytes": _peak_memory(func)}
+        print(
+            f"  n={num_tools:<6} {sweep}={value:<6g} {name:<28} {seconds * 1000:10.1f} ms",
+            file=sys.stderr,
+        )
+
+    return {
+        "tools": num_tools,
+        "sweep": sweep,
+        sweep: value,
+        "edges": len(edges),
+        "graphLines": sum(1 for _ in graph_path.open("r", encoding="utf-8")),
+        "sizes": {
+            "graph": num_tools + len(edges),
+            "cells": num_tools * num_tools,
+            "crossModality": num_tools + len(xmod_edges),
+        },
+        "stages": results,
+    }
+
+
+def scaling_exponents(cases: List[Dict[str, object]]) -> List[Dict[str, object]]:
+    """Empirical growth exponents per stage between consecutive tool counts.
+
+    Cases are compared within one sweep setting (equal mean degree, or equal
+    density), against the tool count and against each stage's STAGE_SIZES size.
+    """
+    by_setting: Dict[Tuple[str, float], List[Dict[str, object]]] = {}
+    for case in cases:
+        by_setting.setdefault((case["sweep"], case[case["sweep"]]), []).append(case)
+
+    exponents: List[Dict[str, object]] = []
+    for (sweep, value), group in sorted(by_setting.items()):
+        group.sort(key=lambda case: case["tools"])
+        for small, large in zip(group, group[1:]):
+            tools_ratio = math.log(large["tools"] / small["tools"])
+            if tools_ratio <= 0:
+                continue
+            for stage, stats in large["stages"].items():
+                before = small["stages"][stage]["seconds"]
+                after = stats["seconds"]
+                size_kind = STAGE_SIZES[stage]
+                size_ratio = math.log(large["sizes"][size_kind] / small["sizes"][size_kind])
+                if before <= 0 or after <= 0 or size_ratio <= 0:
+                    continue
+                exponents.append({
+                    "stage": stage,
+                    "sweep": sweep,
+                    sweep: value,
+                    "fromTools": small["tools"],
+                    "toTools": large["tools"],
+                    "exponent": round(math.log(after / before) / tools_ratio, 3),
+                    "size": size_kind,
+                    "sizeExponent": round(math.log(after / before) / size_ratio, 3),
+                })
+    return exponents
+
+
+def parse_args(argv: Iterable[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the tool adjacency builders on synthetic graphs and modality CSVs."
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[100, 500, 1000, 2000],
+        help="Tool counts to benchmark (e.g. 100 1000 20000).",
+    )
+    parser.add_argument(
+        "--degree",
+        type=float,
+        nargs="*",
+        default=[4.0, 16.0],
+        help="Mean out-degrees held fixed across --sizes (edges = degree * tools). "
+        "Pass with no values to skip the fixed-degree sweep.",
+    )
+    parser.add_argument(
+        "--density",
+        type=float,
+        nargs="+",
+        default=[],
+        help="Edge densities (expected out-degree as a fraction of tool count); "
+        "reported only, never gated by --max-exponent.",
+    )
+    parser.add_argument("--modalities", type=int, default=4, help="Number of synthetic modalities.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage (best is kept).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for graph generation.")
+    parser.add_argument(
+        "--work-dir",
+        type=Path,
+        default=None,
+        help="Keep generated inputs here instead of a temporary directory.",
+    )
+    parser.add_argument(
+        "--out",
+        type=Path,
+        default=None,
+        help="Write JSON results to this path (default: stdout).",
+    )
+    parser.add_argument(
+        "--max-exponent",
+        type=float,
+        default=None,
+        help="Exit non-zero if any stage's fixed-degree size exponent exceeds this value.",
+    )
+    return parser.parse_args(list(argv))
+
+
+def main(argv: Iterable[str]) -> int:
+    args = parse_args(argv)
+    if args.modalities < 1:
+        raise ValueError("--modalities must be at least 1.")
+    if min(args.sizes) < 2:
+        raise ValueError("--sizes must all be at least 2.")
+    if not args.degree and not args.density:
+        raise ValueError("Give at least one --degree or --density value.")
+    if args.max_exponent is not None and not args.degree:
+        raise ValueError("--max-exponent needs a --degree sweep; density sweeps are not gated.")
+    if any(value <= 0 for value in args.degree + args.density):
+        raise ValueError("--degree and --density values must be positive.")
+
+    cases: List[Dict[str, object]] = []
+    with tempfile.TemporaryDirectory(prefix="adjacency_bench_") as tmp:
+        work_dir = (args.work_dir or Path(tmp)).resolve()
+        settings = [("degree", value) for value in args.degree]
+        settings += [("density", value) for value in args.density]
+        for sweep, value in settings:
+            for num_tools in sorted(args.sizes):
+                cases.append(
+                    run_case(work_dir, num_tools, sweep, value, args.modalities, args.repeat, args.seed)
+                )
+
+    exponents = scaling_exponents(cases)
+    report = {
+        "generatedAt": dt.datetime.now(dt.timezone.utc).replace(microsecond=0).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {
+            "sizes": sorted(args.sizes),
+            "degree": args.degree,
+            "density": args.density,
+            "modalities": args.modalities,
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "cases": cases,
+        "scaling": exponents,
+    }
+
+    text = json.dumps(report, indent=2) + "\n"
+    if args.out is not None:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(text, encoding="utf-8")
+        print(f"  results: {args.out.resolve()}", file=sys.stderr)
+    else:
+        sys.stdout.write(text)
+
+    if args.max_exponent is not None:
+        offenders = [
+            item for item in exponents
+            if item["sweep"] == "degree" and item["sizeExponent"] > args.max_exponent
+        ]
+        for item in offenders:
+            print(
+                f"REGRESSION: {item['stage']} scales as {item['size']}^{item['sizeExponent']} "
+                f"({item['fromTools']} -> {item['toTools']} tools, mean degree {item['degree']:g})",
+                file=sys.stderr,
+            )
+        if offenders:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        raise SystemExit(main(sys.argv[1:]))
+    except Exception as exc:  # noqa: BLE001 - CLI error reporting
+        print(f"ERROR: {exc}", file=sys.stderr)
+        raise SystemExit(1)
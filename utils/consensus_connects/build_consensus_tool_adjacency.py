@@ -8,6 +8,15 @@ Consensus rule:
 Cross-modality edges (optional):
 - Reads a JSON file defining subsection-level edges between modalities.
 - Expands each edge to tool-level using per-modality tool_to_subsection_map.json files.
+
+Graph analytics (side artifact, see tool_graph_analytics.py):
+- SCCs, condensation DAG layers, in/out-degree and betweenness per tool.
+
+Weighted mode (optional, --weighted):
+- Keeps per-edge provenance instead of a plain OR: a support count plus
+  bitmasks of the contributing modality CSVs and cross-modality rules.
+- Written as a CSR typed-array artifact (.bin + .json manifest) whose rows are
+  pre-sorted by support, so ranking next-tool candidates is a single slice.
 """
 
 from __future__ import annotations
@@ -17,17 +26,29 @@ import csv
 import json
 import re
 import sys
+from array import array
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Set, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from tool_graph_analytics import compute_graph_analytics, write_analytics_json
 
 
 DEFAULT_PATTERN = "*_tests/connects/*_tool_adjacency_matrix.csv"
 DEFAULT_MAP_PATTERN = "*_tests/connects/*_tool_to_subsection_map.json"
 
+# (tool_order, {(modality, normalized_subsection_key): (tool_indices, tool_bitmask)})
+SubsectionIndex = Tuple[List[str], Dict[Tuple[str, str], Tuple[Tuple[int, ...], int]]]
+# {src_tool: [(target_tools, rule_bitmask), ...]}, one entry per rule block
+RuleRows = Dict[str, List[Tuple[Tuple[str, ...], int]]]
 
+
+@lru_cache(maxsize=None)
 def _normalize_subsection(label: str) -> str:
     """Normalize subsection labels for matching (lowercase, collapse whitespace,
-    normalize '&' to 'and', treat '-' and '/' equivalently in subsection text)."""
+    normalize '&' to 'and', treat '-' and '/' equivalently in subsection text).
+
+    Memoized: the same handful of labels recur across every map and rule."""
     raw = " ".join(label.strip().split()).replace("&", " and ")
     parts = re.split(r"\s*/\s*", raw, maxsplit=1)
     if len(parts) == 2:
@@ -69,6 +90,31 @@ def parse_args(argv: Iterable[str]) -> argparse.Namespace:
         default=script_dir / "consensus_tool_adjacency_matrix.csv",
         help="Output CSV path for the consensus adjacency matrix.",
     )
+    parser.add_argument(
+        "--analytics-out",
+        type=Path,
+        default=None,
+        help="Output JSON path for graph analytics (default: <out stem>_analytics.json).",
+    )
+    parser.add_argument(
+        "--no-analytics",
+        action="store_true",
+        help="Skip writing the graph analytics artifact.",
+    )
+    parser.add_argument(
+        "--weighted",
+        action="store_true",
+        help="Also write the weighted CSR artifact with per-edge provenance.",
+    )
+    parser.add_argument(
+        "--weighted-out",
+        type=Path,
+        default=None,
+        help=(
+            "Output path prefix for the weighted artifact; '.bin' and '.json' are "
+            "appended (default: <out stem>_weighted). Implies --weighted."
+        ),
+    )
     return parser.parse_args(list(argv))
 
 
@@ -150,12 +196,51 @@ def discover_subsection_maps(search_root: Path, pattern: str = DEFAULT_MAP_PATTE
     return sorted(path.resolve() for path in search_root.glob(pattern) if path.is_file())
 
 
+def _iter_bits(mask: int) -> Iterator[int]:
+    """Yield the indices of the set bits in ``mask``, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def index_subsection_maps(
+    modality_maps: Dict[str, Dict[str, List[str]]],
+) -> SubsectionIndex:
+    """Assign every mapped tool an index and fold each subsection into index arrays.
+
+    Returns: (tool_order, {(modality, normalized_subsection_key): (tool_indices, tool_bitmask)})
+    """
+    tool_order = sorted({
+        tool
+        for sub_map in modality_maps.values()
+        for tools in sub_map.values()
+        for tool in tools
+    })
+    tool_to_index = {tool: idx for idx, tool in enumerate(tool_order)}
+
+    subsection_index: Dict[Tuple[str, str], Tuple[Tuple[int, ...], int]] = {}
+    for modality, sub_map in modality_maps.items():
+        for subsection_key, tools in sub_map.items():
+            indices = tuple(sorted({tool_to_index[tool] for tool in tools}))
+            mask = 0
+            for idx in indices:
+                mask |= 1 << idx
+            subsection_index[(modality, subsection_key)] = (indices, mask)
+
+    return tool_order, subsection_index
+
+
 def load_subsection_maps(
     search_root: Path,
-) -> Dict[str, Dict[str, List[str]]]:
-    """Load all per-modality tool_to_subsection_map.json files.
+) -> SubsectionIndex:
+    """Load all per-modality tool_to_subsection_map.json files and index them.
 
-    Returns: { modality_name: { normalized_subsection_key: [tool1, tool2, ...] } }
+    Subsection keys are normalized (and memoized) here, once per map entry, and
+    the tool index and per-subsection bitmask table are built once, so rule
+    expansion only has to look them up.
+
+    Returns: (tool_order, {(modality, normalized_subsection_key): (tool_indices, tool_bitmask)})
     """
     map_files = discover_subsection_maps(search_root)
     modality_maps: Dict[str, Dict[str, List[str]]] = {}
@@ -182,37 +267,50 @@ def load_subsection_maps(
 
         modality_maps[modality] = subsection_to_tools
 
-    return modality_maps
+    return index_subsection_maps(modality_maps)
 
 
 def expand_cross_modality_edges(
     cross_modality_path: Path,
-    modality_maps: Dict[str, Dict[str, List[str]]],
+    subsection_maps: SubsectionIndex,
+    rule_rows: Optional[RuleRows] = None,
 ) -> Tuple[Set[Tuple[str, str]], int, int]:
     """Read cross-modality JSON and expand subsection edges to tool-level edges.
 
+    Each rule is a block outer product (source subsection tools x target
+    subsection tools). Blocks are accumulated as per-source-row bitmasks over
+    the tool index, so a rule costs one OR per source tool regardless of how
+    many target tools it fans out to, and duplicate rules only OR their bit
+    into the block's rule mask.
+
+    If ``rule_rows`` is given, it is filled per source tool with each block's
+    target tools and the bitmask of the rules (by position in the JSON
+    ``edges`` list) that produce it. Blocks are not expanded to per-edge masks
+    here; write_weighted_artifact does that once per CSR row.
+
     Returns: (tool_edges, num_subsection_edges_processed, num_subsection_edges_skipped)
     """
     data = json.loads(cross_modality_path.read_text(encoding="utf-8"))
     edges_def = data.get("edges", [])
 
-    tool_edges: Set[Tuple[str, str]] = set()
+    tool_order, subsection_index = subsection_maps
+    empty: Tuple[Tuple[int, ...], int] = ((), 0)
+
+    row_masks: Dict[int, int] = {}
+    block_rules: Dict[Tuple[Tuple[int, ...], int], int] = {}
     processed = 0
     skipped = 0
 
-    for edge in edges_def:
+    for rule_idx, edge in enumerate(edges_def):
         src_mod = edge.get("sourceModality", "")
         src_sub = _normalize_subsection(edge.get("sourceSubsection", ""))
         dst_mod = edge.get("targetModality", "")
         dst_sub = _normalize_subsection(edge.get("targetSubsection", ""))
 
-        src_map = modality_maps.get(src_mod, {})
-        dst_map = modality_maps.get(dst_mod, {})
+        src_indices, _ = subsection_index.get((src_mod, src_sub), empty)
+        _, dst_mask = subsection_index.get((dst_mod, dst_sub), empty)
 
-        src_tools = src_map.get(src_sub, [])
-        dst_tools = dst_map.get(dst_sub, [])
-
-        if not src_tools or not dst_tools:
+        if not src_indices or not dst_mask:
             skipped += 1
             rationale = edge.get("rationale", "")
             print(
@@ -223,9 +321,25 @@ def expand_cross_modality_edges(
             continue
 
         processed += 1
-        for src_tool in src_tools:
-            for dst_tool in dst_tools:
-                tool_edges.add((src_tool, dst_tool))
+        rule_bit = 1 << rule_idx
+        block = (src_indices, dst_mask)
+        if block in block_rules:
+            block_rules[block] |= rule_bit
+            continue
+        block_rules[block] = rule_bit
+        for src_idx in src_indices:
+            row_masks[src_idx] = row_masks.get(src_idx, 0) | dst_mask
+
+    tool_edges: Set[Tuple[str, str]] = set()
+    for src_idx, mask in row_masks.items():
+        src_tool = tool_order[src_idx]
+        tool_edges.update((src_tool, tool_order[dst_idx]) for dst_idx in _iter_bits(mask))
+
+    if rule_rows is not None:
+        for (src_indices, dst_mask), rules in block_rules.items():
+            targets = tuple(tool_order[dst_idx] for dst_idx in _iter_bits(dst_mask))
+            for src_idx in src_indices:
+                rule_rows.setdefault(tool_order[src_idx], []).append((targets, rules))
 
     return tool_edges, processed, skipped
 
@@ -240,6 +354,122 @@ def write_matrix_csv(out_path: Path, tool_order: List[str], edges: Set[Tuple[str
             writer.writerow([src, *row])
 
 
+def _modality_label(csv_path: Path) -> str:
+    suffix = "_tool_adjacency_matrix"
+    stem = csv_path.stem
+    return stem[: -len(suffix)] if stem.endswith(suffix) else stem
+
+
+def _smallest_unsigned_typecode(max_value: int) -> Tuple[str, str]:
+    """Pick the narrowest array typecode (and its JS typed-array dtype) for max_value."""
+    for typecode, dtype in (("B", "uint8"), ("H", "uint16"), ("I", "uint32")):
+        if max_value < 1 << (8 * array(typecode).itemsize):
+            return typecode, dtype
+    raise ValueError(f"Value {max_value} does not fit in uint32")
+
+
+def write_weighted_artifact(
+    out_prefix: Path,
+    tool_order: List[str],
+    edge_modalities: Dict[Tuple[str, str], int],
+    modality_labels: List[str],
+    rule_rows: RuleRows,
+    rule_labels: List[str],
+) -> Tuple[Path, Path]:
+    """Write the weighted consensus graph as little-endian CSR typed arrays.
+
+    Arrays (all indexed by edge position except indptr):
+        indptr         uint32[toolCount + 1]  row offsets into the edge arrays
+        indices        target tool index
+        support        number of contributing modalities + cross-modality rules
+        modalityMask   bit i set if modalities[i] contains the edge
+        ruleMask       ruleMaskWords uint32 words per edge, bit i = crossModalityRules[i]
+
+    Each row is sorted by descending support, then by target index. Rule
+    blocks from ``rule_rows`` are expanded to per-edge rule masks here, once.
+
+    Returns: (bin_path, manifest_path)
+    """
+    tool_to_index = {tool: idx for idx, tool in enumerate(tool_order)}
+    cells: List[Dict[int, List[int]]] = [{} for _ in tool_order]
+    for (src, dst), modality_mask in edge_modalities.items():
+        cells[tool_to_index[src]][tool_to_index[dst]] = [modality_mask, 0]
+    for src, blocks in rule_rows.items():
+        row_cells = cells[tool_to_index[src]]
+        for targets, rules in blocks:
+            for dst in targets:
+                row_cells.setdefault(tool_to_index[dst], [0, 0])[1] |= rules
+
+    rows: List[List[Tuple[int, int, int, int]]] = []
+    for row_cells in cells:
+        row = []
+        for dst_idx, (modality_mask, rule_mask) in row_cells.items():
+            support = bin(modality_mask).count("1") + bin(rule_mask).count("1")
+            row.append((-support, dst_idx, modality_mask, rule_mask))
+        rows.append(row)
+
+    index_code, index_dtype = _smallest_unsigned_typecode(max(len(tool_order) - 1, 0))
+    support_code, support_dtype = _smallest_unsigned_typecode(len(modality_labels) + len(rule_labels))
+    modality_code, modality_dtype = _smallest_unsigned_typecode((1 << len(modality_labels)) - 1)
+    rule_words = max(1, (len(rule_labels) + 31) // 32)
+
+    indptr = array("I", [0])
+    indices = array(index_code)
+    support = array(support_code)
+    modality_masks = array(modality_code)
+    rule_masks = array("I")
+    for row in rows:
+        row.sort()
+        for neg_support, dst_idx, modality_mask, rule_mask in row:
+            indices.append(dst_idx)
+            support.append(-neg_support)
+            modality_masks.append(modality_mask)
+            for word in range(rule_words):
+                rule_masks.append((rule_mask >> (32 * word)) & 0xFFFFFFFF)
+        indptr.append(len(indices))
+
+    bin_path = out_prefix.with_name(out_prefix.name + ".bin")
+    manifest_path = out_prefix.with_name(out_prefix.name + ".json")
+    bin_path.parent.mkdir(parents=True, exist_ok=True)
+
+    layout: Dict[str, Dict[str, object]] = {}
+    offset = 0
+    with bin_path.open("wb") as handle:
+        for name, values, dtype in (
+            ("indptr", indptr, "uint32"),
+            ("indices", indices, index_dtype),
+            ("support", support, support_dtype),
+            ("modalityMask", modality_masks, modality_dtype),
+            ("ruleMask", rule_masks, "uint32"),
+        ):
+            # Typed-array views need offsets aligned to their element size.
+            padding = -offset % 4
+            handle.write(b"\0" * padding)
+            offset += padding
+            if sys.byteorder != "little":
+                values = array(values.typecode, values)
+                values.byteswap()
+            data = values.tobytes()
+            handle.write(data)
+            layout[name] = {"dtype": dtype, "byteOffset": offset, "length": len(values)}
+            offset += len(data)
+
+    manifest = {
+        "format": "csr",
+        "byteOrder": "little",
+        "binary": bin_path.name,
+        "toolOrder": tool_order,
+        "toolCount": len(tool_order),
+        "edgeCount": len(indices),
+        "modalities": modality_labels,
+        "crossModalityRules": rule_labels,
+        "ruleMaskWords": rule_words,
+        "arrays": layout,
+    }
+    manifest_path.write_text(json.dumps(manifest, indent=2) + "\n", encoding="utf-8")
+    return bin_path, manifest_path
+
+
 def main(argv: Iterable[str]) -> int:
     args = parse_args(argv)
     search_root = args.search_root.resolve()
@@ -250,13 +480,22 @@ def main(argv: Iterable[str]) -> int:
 
     input_csvs = discover_input_csvs(search_root, args.pattern)
 
+    weighted = args.weighted or args.weighted_out is not None
+
     all_tools: Set[str] = set()
     consensus_edges: Set[Tuple[str, str]] = set()
+    edge_modalities: Dict[Tuple[str, str], int] = {}
+    rule_rows: RuleRows = {}
+    rule_labels: List[str] = []
 
-    for csv_path in input_csvs:
+    for csv_idx, csv_path in enumerate(input_csvs):
         tools, edges = load_edges_from_csv(csv_path)
         all_tools.update(tools)
         consensus_edges.update(edges)
+        if weighted:
+            modality_bit = 1 << csv_idx
+            for edge in edges:
+                edge_modalities[edge] = edge_modalities.get(edge, 0) | modality_bit
 
     if not all_tools:
         raise ValueError("No tools found across input CSV files.")
@@ -269,10 +508,17 @@ def main(argv: Iterable[str]) -> int:
                 f"Cross-modality edges file not found: {cross_modality_path}"
             )
 
-        modality_maps = load_subsection_maps(search_root)
+        subsection_maps = load_subsection_maps(search_root)
         xmod_edges, processed, skipped = expand_cross_modality_edges(
-            cross_modality_path, modality_maps
+            cross_modality_path, subsection_maps, rule_rows if weighted else None
         )
+        if weighted:
+            rules_def = json.loads(cross_modality_path.read_text(encoding="utf-8")).get("edges", [])
+            rule_labels = [
+                f"{rule.get('sourceModality', '')} / {rule.get('sourceSubsection', '')} -> "
+                f"{rule.get('targetModality', '')} / {rule.get('targetSubsection', '')}"
+                for rule in rules_def
+            ]
         cross_modality_edge_count = len(xmod_edges)
         consensus_edges.update(xmod_edges)
         # Include tools from cross-modality edges that may not be in any CSV
@@ -290,6 +536,30 @@ def main(argv: Iterable[str]) -> int:
     print(f"  tools: {len(tool_order)}")
     print(f"  directed edges (1s): {len(consensus_edges)}")
     print(f"  output: {out_path}")
+
+    if not args.no_analytics:
+        analytics_path = (
+            args.analytics_out or out_path.with_name(out_path.stem + "_analytics.json")
+        ).resolve()
+        analytics = compute_graph_analytics(tool_order, consensus_edges)
+        write_analytics_json(analytics_path, analytics, {"matrix": out_path.name})
+        print(f"  components: {analytics['componentCount']} SCCs in {len(analytics['layers'])} layers")
+        print(f"  analytics: {analytics_path}")
+
+    if weighted:
+        weighted_prefix = (
+            args.weighted_out or out_path.with_name(out_path.stem + "_weighted")
+        ).resolve()
+        bin_path, manifest_path = write_weighted_artifact(
+            weighted_prefix,
+            tool_order,
+            edge_modalities,
+            [_modality_label(path) for path in input_csvs],
+            rule_rows,
+            rule_labels,
+        )
+        print(f"  weighted: {bin_path} ({bin_path.stat().st_size} bytes)")
+        print(f"  weighted manifest: {manifest_path}")
     return 0
 
 
@@ -0,0 +1,628 @@
+#!/usr/bin/env python3
+"""Index every CWL tool's ports and infer candidate tool-to-tool edges from their types.
+
+Inputs:
+- CWL CommandLineTool definitions (default: public/cwl/**/*.cwl)
+- Adjacency CSVs to check the inferred edges against (default: every modality
+  matrix under utils/*_tests/connects plus the consensus matrix)
+
+Outputs:
+- Catalog JSON: per tool, its inputs and outputs with type, array/optional
+  flags, formats and secondaryFiles
+- Compatibility CSV: candidate src -> dst edges, one row/column per CWL tool
+- Report JSON: density of the inferred matrix and, per adjacency CSV, how
+  many curated edges the types explain (recall), how many inferred edges are
+  curated (precision), both matrices' densities over the shared tools, and
+  the curated edges with no type path
+
+Parsing:
+- Files are parsed in a process pool; each parsed tool is cached under the
+  SHA-256 of its file contents, so only changed files are parsed again.
+
+Formats:
+- An explicit CWL `format` is used as is. None of the current definitions
+  declare one, so formats are otherwise inferred as coarse families (volume,
+  surface, cifti, tractogram, transform, table, gradient, ...) from output
+  globs and secondaryFiles, then from keywords in the port id, label and doc
+  (an output globbed as '$(inputs.x)' also uses input x's). A port with no
+  recognisable format matches any format.
+- Volumes are split further into subtypes (volume/warp, mask, label,
+  diffusion_map, dwi, stat, timeseries, anat) from file names and the port id,
+  then its label and doc. A subtyped output fits inputs of its subtype and
+  plain volume inputs; a plain volume output fits only plain volume inputs.
+
+Edge inference:
+- File/Directory input ports are indexed into (class, format) buckets holding a
+  bitmask of consumer tools. Each output port ORs the masks of its buckets
+  (plus the class's any-format consumers, and the family's plain consumers for
+  a subtype), so the cost is a few lookups per output port and format rather
+  than a comparison of every port pair.
+  Array depth is ignored (a File[] can be scattered; a File can fill a
+  File[]), and log outputs are not data and produce no edges.
+
+Usage:
+    python build_cwl_catalog.py
+    python build_cwl_catalog.py --cwl-dir ../../public/cwl --workers 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from build_consensus_tool_adjacency import (
+    DEFAULT_PATTERN,
+    _iter_bits,
+    discover_input_csvs,
+    load_edges_from_csv,
+    write_matrix_csv,
+)
+
+
+PARSER_VERSION = 2
+DATA_CLASSES = ("File", "Directory")
+NON_DATA_FORMATS = {"log"}
+EXPRESSION_RE = re.compile(r"\$\([^)]*\)|\$\{[^}]*\}")
+
+# File suffix -> format family, longest suffixes first
+EXTENSION_FORMATS: List[Tuple[str, str]] = sorted(
+    [
+        (".dtseries.nii", "cifti"), (".dscalar.nii", "cifti"), (".dlabel.nii", "cifti"),
+        (".ptseries.nii", "cifti"), (".pconn.nii", "cifti"), (".dconn.nii", "cifti"),
+        (".surf.gii", "surface"), (".func.gii", "surface"), (".shape.gii", "surface"),
+        (".label.gii", "surface"), (".gii", "surface"),
+        (".nii.gz", "volume"), (".nii", "volume"), (".mgz", "volume"), (".mgh", "volume"),
+        (".mif", "volume"), (".head", "volume"), (".brik", "volume"), (".brik.gz", "volume"),
+        (".tck", "tractogram"), (".trk", "tractogram"), (".niml.tract", "tractogram"),
+        (".mat", "transform"), (".aff12.1d", "transform"), (".xfm", "transform"), (".lta", "transform"),
+        (".1d", "table"), (".txt", "table"), (".csv", "table"), (".tsv", "table"),
+        (".netcc", "table"), (".netts", "table"), (".stats", "table"), (".niml", "table"),
+        (".bval", "gradient"), (".bvec", "gradient"),
+        (".json", "table"), (".dat", "table"), (".sienax", "table"), (".siena", "table"),
+        (".mincost", "table"), (".grid", "table"),
+        (".vtk", "surface"), (".sulc", "surface"), (".white", "surface"), (".pial", "surface"),
+        (".log", "log"),
+    ],
+    key=lambda item: -len(item[0]),
+)
+
+# Port id/label/doc keywords -> format family, checked in order
+LABEL_FORMATS: List[Tuple[re.Pattern, str]] = [
+    (re.compile(r"\blicen[cs]e\b"), "license"),
+    (re.compile(r"subjects? ?dir|subjects directory|\bsubject id\b"), "freesurfer_subject"),
+    (re.compile(r"\bdicom\b"), "dicom"),
+    (re.compile(r"\bbids\b"), "bids"),
+    (re.compile(r"\bb-?vals?\b|\bb-?vecs?\b|\bbvals?\b|\bbvecs?\b|gradient (table|scheme|vector)"), "gradient"),
+    (re.compile(r"\bcifti\b"), "cifti"),
+    (re.compile(r"\bsurface|\bsurf\b|\bsphere\b|\bgifti\b|\bmetric\b|\bsulc\b|\bborder\b|\bmesh\b"
+                r"|\blabel file|\bannot(ation)?\b|\.gcs\b|\bclassifier\b|\bcortex label"), "surface"),
+    (re.compile(r"\btractogram|\btracks?\b|\bstreamlines?\b"), "tractogram"),
+    (re.compile(r"\baffine\b|\btransform(ation)?\b|\bxfm\b|\bregistration\b|\breg\b|\blta\b|\.mat\b"
+                r"|\bmatrix save\b|\bfslmat\b"), "transform"),
+    (re.compile(r"\btable|\blist\b|\b1d\b|\boned\b|\btext\b|\bcovariate|\bcontrast|\bdesign\b|\.con\b|\.fts\b"
+                r"|\bcolor|\bparameters?\b|\bacqp\b|\boptions\b|\bcensor\b|\bregressors?\b|\btime series\b"
+                r"|\bvectors?\b|\bcoordinates\b|\bids\b|\bselection\b|\bcsv\b|\bstats\b|\bdescriptor\b"
+                r"|\bacf\b|\bavgwf\b|\bsum\b|\bweights?\b"), "table"),
+    (re.compile(r"\bimage|\bvolume|\bdataset|\bmask\b|\bnifti\b|\bt1|\bdwi\b|\bbold\b|\bepi\b|\b[34]d\b"
+                r"|\bwarp\b|\bfield|\bsegmentation|\bseg\b|\baseg\b|\batlas|\bribbon\b|\bmaps?\b|\bdata\b"
+                r"|\bsample set|\btemplate|\bbrick\b|\bbrain\b"), "volume"),
+]
+
+# Volume file name/port text -> subtype, checked in order; unmatched volumes stay plain
+VOLUME_SUBTYPES: List[Tuple[re.Pattern, str]] = [
+    (re.compile(r"\bwarps?\b|warp field|\bnwarp|\bwarp\d|(?<!bias )\bfield\b|fieldmap|\bfieldcoef|\bdeformation"
+                r"|\bdisplacement field|\bvoxshift\b|_warp\b|_field\b"), "volume/warp"),
+    (re.compile(r"\bmasks?\b|mask\b|\bautomask|\bbrainmask|\brois?\b|_mask\b"), "volume/mask"),
+    (re.compile(r"\blabels?\b|\bseg\b|\bsegmentation|\baseg\b|\baparc|\bparcellation|\batlas|\bribbon\b"
+                r"|\bposteriors?\b|\bpriors?\b|\bprob(ability)?\b|\bpve\b|\bpv\b|partial volume|\btissue"
+                r"|_seg\b|_dseg\b"), "volume/label"),
+    (re.compile(r"\bfa\b|\bmd\b|\b[lv][123]\b|\btensor|\bfods?\b|\bndi\b|\bodi\b|\bfiso\b|\b(ad|rd|fa) map"
+                r"|\badc\b|\bskeleton|\banisotropy|\bdiffusivity|\bkurtosis|\bnon.?fa\b"), "volume/diffusion_map"),
+    (re.compile(r"\bdwi\b|\bdiffusion|\bdti\b|_dwi\b"), "volume/dwi"),
+    (re.compile(r"\bstats?\b|\b[tzf]-?stats?\b|\bzf?stats\b|\bf stat\b|\b(var ?)?copes?\b|\bcorrp\b|\bp-?vals?\b"
+                r"|\bbetas?\b|\bparam estimates|\bstatistical|\bcorr(elation)?\b|\bcorrmap\b|\balff\b|\bfalff\b"
+                r"|\brsfa\b|\bic maps?\b|\bmelodic ic\b|\bspatial maps|\btdof\b|\bsigmasquareds\b"), "volume/stat"),
+    (re.compile(r"\bbold\b|\bfmri\b|\b4d\b|3d\+time|\btime ?series|\bepi\b|\bresiduals?\b|\bres(idual)?4d\b"
+                r"|\bdespiked?\b|\bdetrended\b|\bvolreg|\bfunctional\b|\bfunc\b|\bresting|\bmotion.corrected"
+                r"|slice.?time|_bold\b"), "volume/timeseries"),
+    (re.compile(r"\bt[12]w?\b|\banat\b|\banatomical|\bstructural|\bskull.?strip|\bbrain.?extract|\bbias.?correct"
+                r"|\bunifi|\bn4\b|_t1w\b|_brain\b"), "volume/anat"),
+]
+
+
+# ── Parsing ──────────────────────────────────────────────────────
+
+
+def _load_yaml(text: str) -> object:
+    import yaml
+
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    return yaml.load(text, Loader=loader)
+
+
+def _type_entries(port_type: object) -> Tuple[bool, List[Tuple[str, int]]]:
+    """Flatten a CWL type into (optional, [(class or primitive, array depth)])."""
+    optional = False
+    entries: List[Tuple[str, int]] = []
+
+    def walk(node: object, depth: int) -> None:
+        nonlocal optional
+        if isinstance(node, list):
+            for item in node:
+                walk(item, depth)
+        elif isinstance(node, dict):
+            kind = node.get("type")
+            if kind == "array":
+                walk(node.get("items"), depth + 1)
+            elif kind in ("enum", "record"):
+                entries.append((kind, depth))
+            else:
+                walk(kind, depth)
+        elif isinstance(node, str):
+            name = node
+            if name.endswith("?"):
+                optional = True
+                name = name[:-1]
+            while name.endswith("[]"):
+                depth += 1
+                name = name[:-2]
+            if name == "null":
+                optional = True
+            elif name in ("stdout", "stderr"):
+                entries.append(("File", depth))
+            else:
+                entries.append((name, depth))
+
+    walk(port_type, 0)
+    return optional, entries
+
+
+def _format_type(optional: bool, entries: List[Tuple[str, int]]) -> str:
+    names = dict.fromkeys(name + "[]" * depth for name, depth in entries)
+    text = "|".join(names) or "Any"
+    return text + ("?" if optional else "")
+
+
+def _patterns(value: object) -> List[str]:
+    """secondaryFiles / glob values as plain pattern strings."""
+    if value is None:
+        return []
+    if isinstance(value, (str, dict)):
+        value = [value]
+    patterns = []
+    for item in value:
+        if isinstance(item, dict):
+            item = item.get("pattern")
+        if isinstance(item, str):
+            patterns.append(item)
+    return patterns
+
+
+def _formats_from_names(names: Iterable[str]) -> Set[str]:
+    formats = set()
+    for name in names:
+        lowered = EXPRESSION_RE.sub("", name).lower().lstrip("^")
+        if re.search(r"\+(orig|tlrc|acpc)", lowered):
+            formats.add("volume")
+            continue
+        for suffix, family in EXTENSION_FORMATS:
+            if lowered.endswith(suffix) or lowered.endswith(suffix + "*"):
+                formats.add(family)
+                break
+    return formats
+
+
+def _port_text(port_id: str, port: Dict[str, object]) -> str:
+    words = [port_id.replace("_", " ")] + [str(port.get(key) or "") for key in ("label", "doc")]
+    return " ".join(words).lower()
+
+
+def _volume_subtype(*texts: str) -> str:
+    """First subtype matching the texts, most specific text (file names, port id) first."""
+    for text in texts:
+        for pattern, subtype in VOLUME_SUBTYPES:
+            if pattern.search(text):
+                return subtype
+    return "volume"
+
+
+def _port_formats(
+    port_id: str,
+    port: Dict[str, object],
+    kind: str,
+    direction: str,
+    inputs: Dict[str, object],
+) -> List[str]:
+    """Explicit format, else the format family inferred from file names, then from text."""
+    explicit = port.get("format")
+    if explicit:
+        return sorted(set(_patterns(explicit)))
+    if kind not in DATA_CLASSES:
+        return []
+    if direction == "outputs":
+        if port.get("type") in ("stdout", "stderr"):
+            # Captured console output: a log unless the port says otherwise (e.g. 3dinfo)
+            return ["log"] if re.search(r"\blog\b", _port_text(port_id, port)) else ["table"]
+        globs = _patterns((port.get("outputBinding") or {}).get("glob"))
+        formats = _formats_from_names(globs)
+        # Outputs named after an input ('$(inputs.output)') are described by that input
+        text = _port_text(port_id, port)
+        for referenced in re.findall(r"inputs\.(\w+)", " ".join(globs)):
+            ref = inputs.get(referenced)
+            text += " " + _port_text(referenced, ref if isinstance(ref, dict) else {})
+        names = " ".join(EXPRESSION_RE.sub("", glob).lower() for glob in globs)
+    else:
+        formats = _formats_from_names(_patterns(port.get("secondaryFiles")))
+        text = _port_text(port_id, port)
+        names = ""
+    if not formats:
+        for pattern, family in LABEL_FORMATS:
+            if pattern.search(text):
+                formats = {family}
+                break
+    if "volume" in formats:
+        subtype = _volume_subtype(f"{names} {port_id.replace('_', ' ').lower()}", text)
+        formats = (formats - {"volume"}) | {subtype}
+    return sorted(formats)
+
+
+def _iter_ports(ports: object) -> Iterable[Tuple[str, object]]:
+    if isinstance(ports, dict):
+        yield from ports.items()
+    elif isinstance(ports, list):
+        for port in ports:
+            if isinstance(port, dict):
+                yield str(port.get("id", "")).lstrip("#"), port
+
+
+def parse_cwl_tool(path: str) -> Dict[str, object]:
+    """Parse one CWL file into a compact catalog entry (runs in the pool workers)."""
+    document = _load_yaml(Path(path).read_text(encoding="utf-8"))
+    if not isinstance(document, dict):
+        raise ValueError(f"{path}: not a CWL document")
+    base_command = document.get("baseCommand")
+    if isinstance(base_command, str):
+        base_command = [base_command]
+    entry: Dict[str, object] = {
+        "class": document.get("class"),
+        "baseCommand": base_command or [],
+        "dockerPull": ((document.get("hints") or {}).get("DockerRequirement") or {}).get("dockerPull")
+        if isinstance(document.get("hints"), dict) else None,
+    }
+    inputs = dict(_iter_ports(document.get("inputs")))
+    for direction in ("inputs", "outputs"):
+        records = []
+        for port_id, port in _iter_ports(document.get(direction)):
+            if not isinstance(port, dict):
+                port = {"type": port}
+            optional, entries = _type_entries(port.get("type"))
+            data_kinds = sorted({name for name, _ in entries if name in DATA_CLASSES})
+            record: Dict[str, object] = {"id": port_id, "type": _format_type(optional, entries)}
+            if data_kinds:
+                record["class"] = data_kinds
+                record["format"] = sorted({
+                    fmt for kind in data_kinds
+                    for fmt in _port_formats(port_id, port, kind, direction, inputs)
+                })
+                secondary = _patterns(port.get("secondaryFiles"))
+                if secondary:
+                    record["secondaryFiles"] = secondary
+            records.append(record)
+        entry[direction] = records
+    return entry
+
+
+def _file_digest(path: Path) -> str:
+    digest = hashlib.sha256(f"cwl-catalog:{PARSER_VERSION}\n".encode())
+    digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def default_cache() -> Path:
+    env = os.environ.get("NIBUILD_CWL_CATALOG_CACHE")
+    if env:
+        return Path(env)
+    return Path.home() / ".cache" / "nibuild" / "cwl_catalog_cache.json"
+
+
+def _load_cache(cache_path: Optional[Path]) -> Dict[str, Dict[str, object]]:
+    if cache_path is None or not cache_path.exists():
+        return {}
+    try:
+        document = json.loads(cache_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if document.get("parserVersion") != PARSER_VERSION:
+        return {}
+    return document.get("entries", {})
+
+
+def _save_cache(cache_path: Path, entries: Dict[str, Dict[str, object]]) -> None:
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_name(cache_path.name + f".{os.getpid()}.tmp")
+    tmp_path.write_text(
+        json.dumps({"parserVersion": PARSER_VERSION, "entries": entries}, separators=(",", ":")),
+        encoding="utf-8",
+    )
+    os.replace(tmp_path, cache_path)
+
+
+def build_catalog(
+    cwl_files: List[Path],
+    cwl_root: Path,
+    cache_path: Optional[Path],
+    workers: int,
+) -> Tuple[Dict[str, Dict[str, object]], Dict[str, int]]:
+    """Parse (or fetch from cache) every CWL file.
+
+    Returns: ({tool name: entry}, {"parsed": n, "cached": n})
+    """
+    cache = _load_cache(cache_path)
+    digests = {path: _file_digest(path) for path in cwl_files}
+    misses = sorted({str(path) for path in cwl_files if digests[path] not in cache})
+    if len(misses) > 1 and workers > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(misses))) as pool:
+            parsed = dict(zip(misses, pool.map(parse_cwl_tool, misses, chunksize=8)))
+    else:
+        parsed = {path: parse_cwl_tool(path) for path in misses}
+
+    catalog: Dict[str, Dict[str, object]] = {}
+    fresh: Dict[str, Dict[str, object]] = {}
+    for path in cwl_files:
+        digest = digests[path]
+        entry = parsed.get(str(path)) or cache[digest]
+        fresh[digest] = entry
+        name = path.stem
+        if name in catalog:
+            raise ValueError(f"Duplicate CWL tool name '{name}': {path}")
+        catalog[name] = {"cwl": path.relative_to(cwl_root).as_posix(), "sha256": digest, **entry}
+
+    if cache_path is not None and (parsed or set(fresh) != set(cache)):
+        _save_cache(cache_path, fresh)
+    return catalog, {"parsed": len(parsed), "cached": len(cwl_files) - len(parsed)}
+
+
+# ── Edge inference ───────────────────────────────────────────────
+
+
+def infer_edges(catalog: Dict[str, Dict[str, object]]) -> Tuple[List[str], Set[Tuple[str, str]], Dict[str, int]]:
+    """Candidate src -> dst edges: some output of src fits some input of dst.
+
+    Returns: (tool_order, edges, bucket sizes for reporting)
+    """
+    tool_order = sorted(catalog)
+    by_format: Dict[Tuple[str, str], int] = {}
+    any_format: Dict[str, int] = {}
+    by_class: Dict[str, int] = {}
+    for idx, name in enumerate(tool_order):
+        bit = 1 << idx
+        for port in catalog[name]["inputs"]:
+            for kind in port.get("class", ()):
+                by_class[kind] = by_class.get(kind, 0) | bit
+                formats = port.get("format") or ()
+                if not formats:
+                    any_format[kind] = any_format.get(kind, 0) | bit
+                for fmt in formats:
+                    by_format[(kind, fmt)] = by_format.get((kind, fmt), 0) | bit
+
+    edges: Set[Tuple[str, str]] = set()
+    for name in tool_order:
+        targets = 0
+        for port in catalog[name]["outputs"]:
+            formats = set(port.get("format") or ())
+            if formats and formats <= NON_DATA_FORMATS:
+                continue
+            for kind in port.get("class", ()):
+                if not formats:
+                    targets |= by_class.get(kind, 0)
+                    continue
+                targets |= any_format.get(kind, 0)
+                for fmt in formats - NON_DATA_FORMATS:
+                    family, _, subtype = fmt.partition("/")
+                    targets |= by_format.get((kind, fmt), 0)
+                    if subtype:
+                        targets |= by_format.get((kind, family), 0)
+        edges.update((name, tool_order[idx]) for idx in _iter_bits(targets))
+    buckets = {f"{kind}:{fmt}": bin(mask).count("1") for (kind, fmt), mask in sorted(by_format.items())}
+    buckets.update({f"{kind}:*": bin(mask).count("1") for kind, mask in sorted(any_format.items())})
+    return tool_order, edges, buckets
+
+
+def _name_key(name: str) -> str:
+    """Match adjacency names to CWL file stems ('@SSwarper' ~ 'SSwarper', 'x.sh' ~ 'x')."""
+    name = name.lstrip("@")
+    return name[:-3] if name.endswith(".sh") else name
+
+
+def compare_with_adjacency(
+    csv_path: Path,
+    catalog_tools: List[str],
+    inferred: Set[Tuple[str, str]],
+) -> Dict[str, object]:
+    tools, curated = load_edges_from_csv(csv_path)
+    by_key = {_name_key(name): name for name in catalog_tools}
+    mapping = {tool: by_key[_name_key(tool)] for tool in tools if _name_key(tool) in by_key}
+    covered = set(mapping)
+    curated_mapped = {(mapping[src], mapping[dst]) for src, dst in curated if src in covered and dst in covered}
+    covered_cwl = set(mapping.values())
+    inferred_here = {(src, dst) for src, dst in inferred if src in covered_cwl and dst in covered_cwl}
+    agreed = curated_mapped & inferred_here
+    cells = len(covered_cwl) ** 2
+    return {
+        "tools": len(tools),
+        "toolsWithCwl": len(covered),
+        "toolsWithoutCwl": sorted(set(tools) - covered),
+        "curatedEdges": len(curated_mapped),
+        "inferredEdges": len(inferred_here),
+        "agreedEdges": len(agreed),
+        "curatedDensity": round(len(curated_mapped) / cells, 4) if cells else None,
+        "inferredDensity": round(len(inferred_here) / cells, 4) if cells else None,
+        "recall": round(len(agreed) / len(curated_mapped), 4) if curated_mapped else None,
+        "precision": round(len(agreed) / len(inferred_here), 4) if inferred_here else None,
+        "unexplainedEdges": [list(edge) for edge in sorted(curated_mapped - inferred_here)],
+    }
+
+
+def _write_json(out_path: Path, payload: Dict[str, object], sources: Dict[str, object]) -> None:
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    document = {
+        "generatedAt": dt.datetime.now(dt.timezone.utc).replace(microsecond=0).isoformat(),
+        "sources": sources,
+        **payload,
+    }
+    out_path.write_text(json.dumps(document, indent=2) + "\n", encoding="utf-8")
+
+
+def parse_args(argv: Iterable[str]) -> argparse.Namespace:
+    script_dir = Path(__file__).resolve().parent
+    parser = argparse.ArgumentParser(
+        description=(
+            "Index CWL tool ports into a catalog, infer candidate tool-to-tool edges "
+            "from port types and formats, and check them against the adjacency CSVs."
+        )
+    )
+    parser.add_argument(
+        "--cwl-dir",
+        type=Path,
+        default=script_dir.parent.parent / "public" / "cwl",
+        help="Directory searched recursively for .cwl files.",
+    )
+    parser.add_argument(
+        "--search-root",
+        type=Path,
+        default=script_dir.parent,
+        help="Root folder to search for modality adjacency CSVs.",
+    )
+    parser.add_argument(
+        "--pattern",
+        default=DEFAULT_PATTERN,
+        help="Glob pattern (relative to --search-root) for modality adjacency CSVs.",
+    )
+    parser.add_argument(
+        "--adjacency",
+        type=Path,
+        action="append",
+        default=None,
+        help="Extra adjacency CSV to compare against (repeatable; default: the consensus matrix).",
+    )
+    parser.add_argument(
+        "--out",
+        type=Path,
+        default=script_dir / "cwl_tool_catalog.json",
+        help="Output JSON path for the tool catalog.",
+    )
+    parser.add_argument(
+        "--matrix-out",
+        type=Path,
+        default=script_dir / "cwl_compatibility_matrix.csv",
+        help="Output CSV path for the inferred compatibility matrix.",
+    )
+    parser.add_argument(
+        "--report-out",
+        type=Path,
+        default=script_dir / "cwl_compatibility_report.json",
+        help="Output JSON path for the comparison against the adjacency CSVs.",
+    )
+    parser.add_argument(
+        "--cache",
+        type=Path,
+        default=default_cache(),
+        help="Parse cache keyed by file hash (default: $NIBUILD_CWL_CATALOG_CACHE or "
+             "~/.cache/nibuild/cwl_catalog_cache.json).",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Parse every file without reading or writing the cache.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Parser processes (default: CPU count).",
+    )
+    args = parser.parse_args(list(argv))
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.adjacency is None:
+        args.adjacency = [script_dir / "consensus_tool_adjacency_matrix.csv"]
+    return args
+
+
+def main(argv: Iterable[str]) -> int:
+    args = parse_args(argv)
+    try:
+        import yaml  # noqa: F401
+    except ImportError:
+        print("ERROR: PyYAML required. Install with: pip3 install pyyaml")
+        return 1
+
+    cwl_root = args.cwl_dir.resolve()
+    cwl_files = sorted(path.resolve() for path in cwl_root.rglob("*.cwl") if path.is_file())
+    if not cwl_files:
+        print(f"ERROR: no .cwl files found under {cwl_root}")
+        return 1
+
+    started = time.perf_counter()
+    catalog, counts = build_catalog(cwl_files, cwl_root, None if args.no_cache else args.cache, args.workers)
+    parse_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    tool_order, edges, buckets = infer_edges(catalog)
+    infer_seconds = time.perf_counter() - started
+
+    out_path = args.out.resolve()
+    matrix_path = args.matrix_out.resolve()
+    report_path = args.report_out.resolve()
+    _write_json(
+        out_path,
+        {"toolCount": len(catalog), "tools": catalog},
+        {"cwlDir": os.path.relpath(cwl_root, out_path.parent)},
+    )
+    write_matrix_csv(matrix_path, tool_order, edges)
+    density = len(edges) / len(tool_order) ** 2
+
+    comparisons: Dict[str, object] = {}
+    csv_paths = discover_input_csvs(args.search_root.resolve(), args.pattern) + [
+        path.resolve() for path in args.adjacency if path.exists()
+    ]
+    for csv_path in csv_paths:
+        label = os.path.relpath(csv_path, args.search_root.resolve())
+        comparisons[label] = compare_with_adjacency(csv_path, tool_order, edges)
+    _write_json(
+        report_path,
+        {
+            "inferredEdgeCount": len(edges),
+            "inferredDensity": round(density, 4),
+            "bucketSizes": buckets,
+            "comparisons": comparisons,
+        },
+        {"catalog": out_path.name, "matrix": matrix_path.name, "adjacency": sorted(comparisons)},
+    )
+
+    print("Built CWL tool catalog and type-compatibility matrix.")
+    print(f"  tools: {len(catalog)} ({counts['parsed']} parsed, {counts['cached']} cached) in {parse_seconds:.2f}s")
+    print(
+        f"  inferred edges: {len(edges)} ({density:.1%} of {len(tool_order)}x{len(tool_order)} cells) "
+        f"from {len(buckets)} type/format buckets in {infer_seconds * 1000:.1f}ms"
+    )
+    for label, result in comparisons.items():
+        print(
+            f"  {label}: recall {result['recall']}, precision {result['precision']} "
+            f"({result['agreedEdges']}/{result['curatedEdges']} curated edges explained; density "
+            f"{result['inferredDensity']} inferred vs {result['curatedDensity']} curated over "
+            f"{result['toolsWithCwl']}/{result['tools']} tools with CWL)"
+        )
+    print(f"  catalog: {out_path}")
+    print(f"  matrix: {matrix_path}")
+    print(f"  report: {report_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -24,18 +24,73 @@ import datetime as dt
 import json
 import re
 import sys
+import time
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Set, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 
-NODE_RE = re.compile(r'^\s*([A-Za-z0-9_]+)\s*\["([^"]+)"\]\s*$')
-EDGE_RE = re.compile(r"^\s*([A-Za-z0-9_]+)\s*-->\s*([A-Za-z0-9_]+)\s*$")
+NODE_RE = re.compile(r'^([A-Za-z0-9_]+)\s*(?:\["([^"]+)"\])?$')
+# Directed Mermaid links: -->, ==>, -.-> (any length), optionally labeled either
+# as `-->|text|` or `-- text -->`.
+LINK_RE = re.compile(
+    r"\s*(?:"
+    r"--\s+[^\s|>-][^|]*?\s+-{2,}>"
+    r"|==\s+[^\s|>=][^|]*?\s+={2,}>"
+    r"|-\.\s+[^\s|>.][^|]*?\s+\.+->"
+    r"|-{2,}>|={2,}>|-\.+->"
+    r")(?:\|[^|]*\|)?\s*"
+)
+AMPERSAND_RE = re.compile(r"\s*&\s*")
+# Node label brackets; `;`, `&` and link arrows inside them are label text.
+LABEL_RE = re.compile(r'\["[^"]*"\]|\[[^\]"]*\]')
+PLACEHOLDER_RE = re.compile(r"\x00(\d+)\x00")
+
+
+def _mask_labels(text: str) -> Tuple[str, List[str]]:
+    """Replace node label brackets with placeholders so splitting cannot cut into them."""
+    labels: List[str] = []
+
+    def stash(match: "re.Match[str]") -> str:
+        labels.append(match.group(0))
+        return f"\x00{len(labels) - 1}\x00"
+
+    return LABEL_RE.sub(stash, text), labels
+
+
+def _unmask_labels(text: str, labels: List[str]) -> str:
+    return PLACEHOLDER_RE.sub(lambda match: labels[int(match.group(1))], text)
+
+
+def _iter_statements(handle: Iterable[str]) -> Iterator[Tuple[int, str]]:
+    """Yield (line number, statement) pairs from a Mermaid source, one line at a time.
+
+    Comments (`%%`) and blank lines are dropped; `;`-separated statements on a
+    single line are yielded individually (a `;` inside a node label is kept).
+    """
+    for lineno, line in enumerate(handle, start=1):
+        stripped = line.strip()
+        if not stripped or stripped.startswith("%%"):
+            continue
+        masked, labels = _mask_labels(stripped)
+        for statement in masked.split(";"):
+            statement = statement.strip()
+            if statement:
+                yield lineno, _unmask_labels(statement, labels)
 
 
 def parse_tool_graph(
     graph_path: Path,
+    stats: Optional[Dict[str, float]] = None,
 ) -> Tuple[Dict[str, str], Set[Tuple[str, str]]]:
-    """Parse a tool-level Mermaid graph.
+    """Parse a tool-level Mermaid graph in a single streaming pass.
+
+    Understands `A["label"]` node definitions (standalone or inline in an edge),
+    chained edges (`A --> B --> C`), `&` fan-out/fan-in (`A & B --> C & D`) and
+    labeled edges (`A -->|text| B`, `A -- text --> B`). Any other statement
+    (`flowchart LR`, `subgraph`, `classDef`, ...) is ignored.
+
+    If ``stats`` is given it is filled with ``lines``, ``bytes`` and ``seconds``
+    for the parse so callers can report throughput.
 
     Returns:
         node_id_to_label: mapping from sanitized node IDs to tool names
@@ -47,23 +102,55 @@ def parse_tool_graph(
     node_id_to_label: Dict[str, str] = {}
     directed_edges_by_id: Set[Tuple[str, str]] = set()
 
-    for lineno, line in enumerate(graph_path.read_text(encoding="utf-8").splitlines(), start=1):
-        node_match = NODE_RE.match(line)
-        if node_match:
-            node_id, label = node_match.groups()
-            existing = node_id_to_label.get(node_id)
-            if existing is not None and existing != label:
-                raise ValueError(
-                    f"Conflicting node label for ID '{node_id}' in {graph_path}:{lineno}: "
-                    f"'{existing}' vs '{label}'"
-                )
-            node_id_to_label[node_id] = label
-            continue
-
-        edge_match = EDGE_RE.match(line)
-        if edge_match:
-            src_id, dst_id = edge_match.groups()
-            directed_edges_by_id.add((src_id, dst_id))
+    def define_node(node_id: str, label: Optional[str], lineno: int) -> None:
+        if label is None:
+            return
+        existing = node_id_to_label.get(node_id)
+        if existing is not None and existing != label:
+            raise ValueError(
+                f"Conflicting node label for ID '{node_id}' in {graph_path}:{lineno}: "
+                f"'{existing}' vs '{label}'"
+            )
+        node_id_to_label[node_id] = label
+
+    started = time.perf_counter()
+    line_count = 0
+    with graph_path.open("r", encoding="utf-8") as handle:
+        for lineno, statement in _iter_statements(handle):
+            line_count = lineno
+            masked, labels = _mask_labels(statement)
+            groups = LINK_RE.split(masked)
+
+            if len(groups) == 1:
+                # Standalone node definition; bare words are Mermaid keywords.
+                node_match = NODE_RE.match(statement)
+                if node_match:
+                    define_node(node_match.group(1), node_match.group(2), lineno)
+                continue
+
+            previous_ids: List[str] = []
+            for group in groups:
+                group_ids: List[str] = []
+                for token in AMPERSAND_RE.split(group.strip()):
+                    node_match = NODE_RE.match(_unmask_labels(token, labels))
+                    if not node_match:
+                        raise ValueError(
+                            f"Malformed Mermaid edge statement in {graph_path}:{lineno}: "
+                            f"'{statement}'"
+                        )
+                    node_id, label = node_match.groups()
+                    define_node(node_id, label, lineno)
+                    group_ids.append(node_id)
+
+                for src_id in previous_ids:
+                    for dst_id in group_ids:
+                        directed_edges_by_id.add((src_id, dst_id))
+                previous_ids = group_ids
+
+    if stats is not None:
+        stats["lines"] = line_count
+        stats["bytes"] = graph_path.stat().st_size
+        stats["seconds"] = time.perf_counter() - started
 
     if not node_id_to_label:
         raise ValueError(f"No Mermaid nodes found in graph file: {graph_path}")
@@ -112,6 +199,16 @@ def write_csv_matrix(csv_path: Path, tool_order: List[str], matrix: List[List[in
             writer.writerow([tool_name, *row])
 
 
+def _format_throughput(stats: Dict[str, float]) -> str:
+    seconds = max(stats.get("seconds", 0.0), 1e-9)
+    lines = int(stats.get("lines", 0))
+    megabytes = stats.get("bytes", 0) / 1e6
+    return (
+        f"{lines} lines in {seconds * 1000:.1f} ms "
+        f"({lines / seconds:,.0f} lines/s, {megabytes / seconds:.1f} MB/s)"
+    )
+
+
 def _discover_modality_files(connects_dir: Path) -> Tuple[Path, str]:
     """Discover the tool graph file in a connects directory.
 
@@ -210,7 +307,8 @@ def main(argv: Iterable[str]) -> int:
     args = parse_args(argv)
     graph_path, out_json_path, out_csv_path = _resolve_paths(args)
 
-    node_id_to_label, tool_edges = parse_tool_graph(graph_path)
+    parse_stats: Dict[str, float] = {}
+    node_id_to_label, tool_edges = parse_tool_graph(graph_path, stats=parse_stats)
 
     tool_order = sorted(set(node_id_to_label.values()))
     if not tool_order:
@@ -247,6 +345,7 @@ def main(argv: Iterable[str]) -> int:
     print(f"  tools: {len(tool_order)}")
     print(f"  graph nodes: {len(node_id_to_label)}")
     print(f"  tool directed edges (matrix 1s): {edge_count}")
+    print(f"  parse: {_format_throughput(parse_stats)}")
     print(f"  json: {out_json_path}")
     print(f"  csv:  {out_csv_path}")
     return 0
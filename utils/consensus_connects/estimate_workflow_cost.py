@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""Estimate runtime, parallel width and memory for a workflow's tool DAG.
+
+Inputs:
+- A workflow graph: the canvas JSON used by utils/workflow_tests/fixtures
+  (nodes with data.label, edges with source/target and data.mappings), or a
+  plain {"nodes": [{"id", "tool", "scatter"?}], "edges": [[src, dst]]}.
+- The CWL tool catalog from build_cwl_catalog.py, for which inputs are arrays.
+- A per-tool profile table: JSON from `profile_tool.py query --json`, a JSON
+  list/object of {tool, wallSeconds, peakMemoryBytes}, a CSV with columns
+  tool,wall_seconds,peak_memory_mb, or the profile_tool.py SQLite database.
+
+Outputs (stdout summary, optional --out JSON):
+- critical path and its length (the makespan with unlimited nodes);
+- per topological layer: tools, parallel job count and summed peak memory;
+- peak concurrent jobs and memory in the as-soon-as-possible schedule;
+- total work (job-seconds), and which tools had no profile.
+
+Scatter follows the app (src/utils/scatterPropagation.js computeScatteredNodes):
+nodes with scatterInputs, custom workflows that scatter internally and BIDS
+nodes with selections are scattered, and scatter propagates to every node
+downstream except gather nodes, whose scattered inputs all map to array-typed
+inputs. Each scattered node runs --scatter-width jobs.
+
+Edges are also checked against the consensus adjacency matrix; tool pairs the
+consensus graph does not contain are reported as warnings.
+
+Usage:
+    python estimate_workflow_cost.py --workflow ../workflow_tests/fixtures/branching_pipeline.json \\
+        --profiles ~/.cache/nibuild/tool_profiles.sqlite --scatter-width 40
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import datetime as dt
+import json
+import math
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from tool_graph_analytics import strongly_connected_components, topological_layers
+
+
+DEFAULT_SECONDS = 60.0
+DEFAULT_MEMORY_MB = 1024.0
+MB = 1024 * 1024
+
+
+def load_array_inputs(catalog_path: Path) -> Dict[str, Set[str]]:
+    """Return {tool: names of its array-typed inputs} from the CWL tool catalog."""
+    catalog = json.loads(catalog_path.read_text(encoding="utf-8"))
+    array_inputs: Dict[str, Set[str]] = {}
+    for tool, entry in catalog.get("tools", {}).items():
+        names = {
+            port["id"] for port in entry.get("inputs", [])
+            if any(part.endswith("[]") for part in port["type"].rstrip("?").split("|"))
+        }
+        if names:
+            array_inputs[tool] = names
+    return array_inputs
+
+
+def _is_scatter_source(node: Dict[str, object], payload: Dict[str, object]) -> bool:
+    if node.get("scatter") or payload.get("scatterInputs") or payload.get("scatterEnabled"):
+        return True
+    if payload.get("isCustomWorkflow") and any(
+        inner.get("scatterInputs") for inner in payload.get("internalNodes") or [] if isinstance(inner, dict)
+    ):
+        return True
+    return bool(payload.get("isBIDS") and payload.get("bidsSelections"))
+
+
+def scattered_nodes(
+    sources: Set[str],
+    edges: List[Tuple[str, str, List[Dict[str, str]]]],
+    array_inputs: Dict[str, Set[str]],
+    bids_nodes: Set[str] = frozenset(),
+) -> Set[str]:
+    """Nodes under scatter: the sources and everything downstream that is not a gather node.
+
+    Mirrors computeScatteredNodes in src/utils/scatterPropagation.js. An edge is
+    a gather edge when all its mappings target array-typed inputs of the
+    destination (array_inputs is keyed by node id); a node reached only by
+    gather edges consumes the scatter as an array and does not propagate it.
+    bids_directory mappings from BIDS nodes carry no scatter.
+    """
+    outgoing: Dict[str, List[Tuple[str, List[Dict[str, str]]]]] = {}
+    for src, dst, mappings in edges:
+        outgoing.setdefault(src, []).append((dst, mappings))
+
+    scattered = set(sources)
+    queue = list(sources)
+    scatter_edge: Dict[str, bool] = {}
+    head = 0
+    while head < len(queue):
+        node_id = queue[head]
+        head += 1
+        for target, mappings in outgoing.get(node_id, []):
+            if target in scattered:
+                continue
+            if node_id in bids_nodes:
+                mappings = [m for m in mappings if m.get("sourceOutput") != "bids_directory"]
+                if not mappings:
+                    continue
+            targets_array = array_inputs.get(target, set())
+            gather = bool(mappings) and all(m.get("targetInput") in targets_array for m in mappings)
+            scatter_edge[target] = scatter_edge.get(target, False) or not gather
+        for target, has_scatter_edge in list(scatter_edge.items()):
+            if has_scatter_edge and target not in scattered:
+                scattered.add(target)
+                queue.append(target)
+                del scatter_edge[target]
+    return scattered
+
+
+def load_workflow(
+    workflow_path: Path,
+    array_inputs: Optional[Dict[str, Set[str]]] = None,
+) -> Tuple[List[Dict[str, object]], List[Tuple[str, str]]]:
+    """Return (nodes [{id, tool, scattered}], edges [(src_id, dst_id)]).
+
+    array_inputs ({tool: array-typed input names}) identifies gather nodes;
+    without it every edge from a scattered node propagates the scatter.
+    """
+    data = json.loads(workflow_path.read_text(encoding="utf-8"))
+    nodes: List[Dict[str, object]] = []
+    sources: Set[str] = set()
+    bids_nodes: Set[str] = set()
+    for node in data.get("nodes", []):
+        payload = node.get("data", {}) if isinstance(node.get("data"), dict) else {}
+        if payload.get("isDummy"):
+            continue
+        tool = node.get("tool") or payload.get("label")
+        if not tool:
+            raise ValueError(f"Workflow node without a tool label in {workflow_path}: {node.get('id')}")
+        node_id = str(node["id"])
+        if _is_scatter_source(node, payload):
+            sources.add(node_id)
+        if payload.get("isBIDS"):
+            bids_nodes.add(node_id)
+        nodes.append({"id": node_id, "tool": str(tool), "scattered": False})
+
+    node_ids = {node["id"] for node in nodes}
+    edges: List[Tuple[str, str]] = []
+    mapped_edges: List[Tuple[str, str, List[Dict[str, str]]]] = []
+    for edge in data.get("edges", []):
+        if isinstance(edge, dict):
+            src, dst = str(edge["source"]), str(edge["target"])
+            mappings = (edge.get("data") or {}).get("mappings") or []
+        else:
+            src, dst = (str(end) for end in edge)
+            mappings = []
+        if src in node_ids and dst in node_ids:
+            edges.append((src, dst))
+            mapped_edges.append((src, dst, mappings))
+
+    tool_of = {node["id"]: node["tool"] for node in nodes}
+    by_node = {node_id: (array_inputs or {}).get(tool, set()) for node_id, tool in tool_of.items()}
+    scattered = scattered_nodes(sources, mapped_edges, by_node, bids_nodes)
+    for node in nodes:
+        node["scattered"] = node["id"] in scattered
+    return nodes, edges
+
+
+def load_profiles(profile_path: Path) -> Dict[str, Tuple[float, float]]:
+    """Return {tool: (wall seconds, peak memory bytes)} from any supported table format."""
+    suffix = profile_path.suffix.lower()
+    profiles: Dict[str, Tuple[float, float]] = {}
+
+    if suffix in (".sqlite", ".db", ".sqlite3"):
+        conn = sqlite3.connect(str(profile_path))
+        try:
+            rows = conn.execute(
+                "SELECT tool, AVG(wall_seconds), "
+                "MAX(MAX(max_rss_bytes, COALESCE(container_peak_bytes, 0))) "
+                "FROM runs WHERE exit_code = 0 GROUP BY tool"
+            ).fetchall()
+        finally:
+            conn.close()
+        return {tool: (float(wall), float(peak)) for tool, wall, peak in rows}
+
+    if suffix == ".csv":
+        with profile_path.open("r", encoding="utf-8", newline="") as handle:
+            for row in csv.DictReader(handle):
+                profiles[row["tool"].strip()] = (
+                    float(row["wall_seconds"]),
+                    float(row["peak_memory_mb"]) * MB,
+                )
+        return profiles
+
+    data = json.loads(profile_path.read_text(encoding="utf-8"))
+    if isinstance(data, dict):
+        data = [{"tool": tool, **values} for tool, values in data.items()]
+    for record in data:
+        wall = record.get("wallSeconds", record.get("meanWallSeconds"))
+        peak = record.get("peakMemoryBytes")
+        if peak is None and "peakMemoryMB" in record:
+            peak = record["peakMemoryMB"] * MB
+        if wall is None or peak is None:
+            raise ValueError(f"Profile record for {record.get('tool')} lacks wall time or peak memory")
+        tool = record["tool"]
+        # Several records per tool (one per input shape): keep the most expensive.
+        prev_wall, prev_peak = profiles.get(tool, (0.0, 0.0))
+        profiles[tool] = (max(prev_wall, float(wall)), max(prev_peak, float(peak)))
+    return profiles
+
+
+def _consensus_warnings(
+    nodes: List[Dict[str, object]],
+    edges: List[Tuple[str, str]],
+    consensus_csv: Path,
+) -> List[str]:
+    from build_consensus_tool_adjacency import load_edges_from_csv
+
+    tools, valid = load_edges_from_csv(consensus_csv)
+    tool_of = {node["id"]: node["tool"] for node in nodes}
+    warnings = []
+    for src, dst in edges:
+        pair = (tool_of[src], tool_of[dst])
+        if pair[0] in tools and pair[1] in tools and pair not in valid:
+            warnings.append(f"{pair[0]} -> {pair[1]} is not an edge of the consensus tool graph")
+    return warnings
+
+
+def estimate_cost(
+    nodes: List[Dict[str, object]],
+    edges: List[Tuple[str, str]],
+    profiles: Dict[str, Tuple[float, float]],
+    scatter_width: int = 1,
+    slots: Optional[int] = None,
+    default_seconds: float = DEFAULT_SECONDS,
+    default_memory: float = DEFAULT_MEMORY_MB * MB,
+) -> Dict[str, object]:
+    """Critical path, per-layer width/memory and ASAP-schedule peaks for a workflow DAG."""
+    index = {node["id"]: idx for idx, node in enumerate(nodes)}
+    successors: List[List[int]] = [[] for _ in nodes]
+    predecessors: List[List[int]] = [[] for _ in nodes]
+    for src, dst in sorted(set(edges)):
+        successors[index[src]].append(index[dst])
+        predecessors[index[dst]].append(index[src])
+
+    cycles = [members for members in strongly_connected_components(successors) if len(members) > 1]
+    if cycles:
+        names = ", ".join(nodes[idx]["id"] for idx in cycles[0])
+        raise ValueError(f"Workflow graph has a cycle through: {names}")
+
+    missing = sorted({node["tool"] for node in nodes if node["tool"] not in profiles})
+    jobs, duration, memory, work = [], [], [], []
+    for node in nodes:
+        wall, peak = profiles.get(node["tool"], (default_seconds, default_memory))
+        width = scatter_width if node["scattered"] else 1
+        work.append(wall * width)
+        # A scatter runs its jobs in waves when fewer slots than jobs are available.
+        waves = math.ceil(width / slots) if slots else 1
+        jobs.append(width)
+        duration.append(wall * waves)
+        memory.append(peak * (min(width, slots) if slots else width))
+
+    # Longest path by duration; nodes in topological order via the layers.
+    layers = topological_layers(successors)
+    finish = [0.0] * len(nodes)
+    start = [0.0] * len(nodes)
+    via: List[Optional[int]] = [None] * len(nodes)
+    for layer in layers:
+        for node in layer:
+            for pred in predecessors[node]:
+                if finish[pred] > start[node]:
+                    start[node] = finish[pred]
+                    via[node] = pred
+            finish[node] = start[node] + duration[node]
+
+    end = max(range(len(nodes)), key=lambda idx: finish[idx], default=None)
+    critical: List[int] = []
+    while end is not None:
+        critical.append(end)
+        end = via[end]
+    critical.reverse()
+
+    # Sweep the as-soon-as-possible schedule for concurrent jobs and memory.
+    events = []
+    for idx in range(len(nodes)):
+        concurrent = min(jobs[idx], slots) if slots else jobs[idx]
+        events.append((start[idx], 1, concurrent, memory[idx]))
+        events.append((finish[idx], 0, -concurrent, -memory[idx]))
+    events.sort()
+    running_jobs = running_mem = peak_jobs = peak_mem = 0.0
+    peak_time = 0.0
+    for time_point, _, d_jobs, d_mem in events:
+        running_jobs += d_jobs
+        running_mem += d_mem
+        if running_mem > peak_mem:
+            peak_mem, peak_time = running_mem, time_point
+        peak_jobs = max(peak_jobs, running_jobs)
+
+    return {
+        "nodeCount": len(nodes),
+        "edgeCount": len(set(edges)),
+        "scatterWidth": scatter_width,
+        "slots": slots,
+        "criticalPath": [nodes[idx]["id"] for idx in critical],
+        "criticalPathTools": [nodes[idx]["tool"] for idx in critical],
+        "criticalPathSeconds": round(max(finish, default=0.0), 3),
+        "totalJobSeconds": round(sum(work), 3),
+        "layers": [
+            {
+                "nodes": [nodes[idx]["id"] for idx in layer],
+                "tools": [nodes[idx]["tool"] for idx in layer],
+                "parallelJobs": sum(jobs[idx] for idx in layer),
+                "peakMemoryBytes": int(sum(memory[idx] for idx in layer)),
+                "longestSeconds": round(max(duration[idx] for idx in layer), 3),
+            }
+            for layer in layers
+        ],
+        "maxLayerWidth": max((sum(jobs[idx] for idx in layer) for layer in layers), default=0),
+        "peakConcurrentJobs": int(peak_jobs),
+        "peakConcurrentMemoryBytes": int(peak_mem),
+        "peakConcurrentAtSeconds": round(peak_time, 3),
+        "nodes": {
+            node["id"]: {
+                "tool": node["tool"],
+                "jobs": jobs[idx],
+                "startSeconds": round(start[idx], 3),
+                "finishSeconds": round(finish[idx], 3),
+                "memoryBytes": int(memory[idx]),
+            }
+            for idx, node in enumerate(nodes)
+        },
+        "unprofiledTools": missing,
+    }
+
+
+def parse_args(argv: Iterable[str]) -> argparse.Namespace:
+    script_dir = Path(__file__).resolve().parent
+    parser = argparse.ArgumentParser(
+        description="Estimate critical path, parallel width and peak memory of a workflow tool DAG."
+    )
+    parser.add_argument("--workflow", type=Path, required=True, help="Workflow graph JSON.")
+    parser.add_argument(
+        "--profiles",
+        type=Path,
+        default=None,
+        help="Per-tool profile table (.json, .csv or profile_tool.py .sqlite). Without it every tool uses the defaults.",
+    )
+    parser.add_argument("--scatter-width", type=int, default=1, help="Jobs per scattered node (default: 1).")
+    parser.add_argument("--slots", type=int, default=None, help="Concurrent job slots available to one scatter (default: unlimited).")
+    parser.add_argument("--default-seconds", type=float, default=DEFAULT_SECONDS, help="Wall time for unprofiled tools.")
+    parser.add_argument("--default-memory-mb", type=float, default=DEFAULT_MEMORY_MB, help="Peak memory for unprofiled tools.")
+    parser.add_argument(
+        "--catalog",
+        type=Path,
+        default=script_dir / "cwl_tool_catalog.json",
+        help="CWL tool catalog (build_cwl_catalog.py) used to find array-typed inputs that gather a scatter.",
+    )
+    parser.add_argument(
+        "--consensus",
+        type=Path,
+        default=script_dir / "consensus_tool_adjacency_matrix.csv",
+        help="Consensus adjacency CSV used to flag unexpected tool edges.",
+    )
+    parser.add_argument("--out", type=Path, default=None, help="Optional JSON output path.")
+    args = parser.parse_args(list(argv))
+    if args.scatter_width < 1:
+        parser.error("--scatter-width must be at least 1")
+    if args.slots is not None and args.slots < 1:
+        parser.error("--slots must be at least 1")
+    return args
+
+
+def _format_bytes(n_bytes: float) -> str:
+    return f"{n_bytes / MB / 1024:.2f} GiB" if n_bytes >= 1024 * MB else f"{n_bytes / MB:.0f} MiB"
+
+
+def main(argv: Iterable[str]) -> int:
+    args = parse_args(argv)
+    workflow_path = args.workflow.resolve()
+    try:
+        array_inputs = load_array_inputs(args.catalog) if args.catalog.is_file() else None
+        nodes, edges = load_workflow(workflow_path, array_inputs)
+        profiles = load_profiles(args.profiles.resolve()) if args.profiles else {}
+        estimate = estimate_cost(
+            nodes,
+            edges,
+            profiles,
+            scatter_width=args.scatter_width,
+            slots=args.slots,
+            default_seconds=args.default_seconds,
+            default_memory=args.default_memory_mb * MB,
+        )
+    except (OSError, ValueError, KeyError, sqlite3.Error) as exc:
+        print(f"ERROR: {exc}", file=sys.stderr)
+        return 1
+
+    warnings = _consensus_warnings(nodes, edges, args.consensus) if args.consensus.is_file() else []
+
+    print(f"Workflow: {workflow_path.name} ({estimate['nodeCount']} nodes, {estimate['edgeCount']} edges)")
+    print(f"  critical path: {' -> '.join(estimate['criticalPathTools'])} "
+          f"({estimate['criticalPathSeconds']:.0f}s)")
+    print(f"  total work: {estimate['totalJobSeconds']:.0f} job-seconds")
+    for layer_idx, layer in enumerate(estimate["layers"]):
+        print(f"  layer {layer_idx}: {layer['parallelJobs']} job(s), "
+              f"{_format_bytes(layer['peakMemoryBytes'])} [{', '.join(layer['tools'])}]")
+    print(f"  peak concurrency: {estimate['peakConcurrentJobs']} job(s), "
+          f"{_format_bytes(estimate['peakConcurrentMemoryBytes'])} at t={estimate['peakConcurrentAtSeconds']:.0f}s")
+    if estimate["unprofiledTools"]:
+        print(f"  WARNING: no profile for {', '.join(estimate['unprofiledTools'])} "
+              f"(assumed {args.default_seconds:.0f}s, {args.default_memory_mb:.0f} MiB)")
+    for warning in warnings:
+        print(f"  WARNING: {warning}")
+
+    if args.out:
+        out_path = args.out.resolve()
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        sources = {"workflow": workflow_path.name}
+        if args.profiles:
+            sources["profiles"] = args.profiles.name
+        document = {
+            "generatedAt": dt.datetime.now(dt.timezone.utc).replace(microsecond=0).isoformat(),
+            "sources": sources,
+            **estimate,
+            "warnings": warnings,
+        }
+        out_path.write_text(json.dumps(document, indent=2) + "\n", encoding="utf-8")
+        print(f"  output: {out_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
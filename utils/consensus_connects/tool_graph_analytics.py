@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""Graph analytics for a directed tool adjacency graph.
+
+Computes, over the sparse edge set:
+- strongly connected components (iterative Tarjan, O(V + E))
+- the condensation DAG and its topological layers (Kahn, O(V + E))
+- in/out-degree per tool
+- betweenness centrality per tool (Brandes, O(V * E) for unweighted graphs)
+
+Used by build_consensus_tool_adjacency.py to write a side artifact that the
+frontend can load instead of recomputing ordering/layering client-side.
+
+Usage:
+    python tool_graph_analytics.py --matrix consensus_tool_adjacency_matrix.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import sys
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+
+
+def build_successors(
+    tool_order: Sequence[str],
+    edges: Iterable[Tuple[str, str]],
+) -> List[List[int]]:
+    """Convert (source, target) tool pairs into sorted successor index lists."""
+    tool_to_index = {tool: idx for idx, tool in enumerate(tool_order)}
+    successors: List[Set[int]] = [set() for _ in tool_order]
+    for src, dst in edges:
+        successors[tool_to_index[src]].add(tool_to_index[dst])
+    return [sorted(targets) for targets in successors]
+
+
+def strongly_connected_components(successors: Sequence[Sequence[int]]) -> List[List[int]]:
+    """Tarjan's algorithm without recursion.
+
+    Returns components in topological order of the condensation (every edge
+    between two components points from a lower to a higher component index).
+    """
+    num_nodes = len(successors)
+    index_of = [-1] * num_nodes
+    lowlink = [0] * num_nodes
+    on_stack = [False] * num_nodes
+    stack: List[int] = []
+    components: List[List[int]] = []
+    counter = 0
+
+    for root in range(num_nodes):
+        if index_of[root] != -1:
+            continue
+        work: List[Tuple[int, int]] = [(root, 0)]
+        while work:
+            node, child_pos = work.pop()
+            if child_pos == 0:
+                index_of[node] = lowlink[node] = counter
+                counter += 1
+                stack.append(node)
+                on_stack[node] = True
+
+            recurse = False
+            children = successors[node]
+            while child_pos < len(children):
+                child = children[child_pos]
+                child_pos += 1
+                if index_of[child] == -1:
+                    work.append((node, child_pos))
+                    work.append((child, 0))
+                    recurse = True
+                    break
+                if on_stack[child]:
+                    lowlink[node] = min(lowlink[node], index_of[child])
+            if recurse:
+                continue
+
+            if lowlink[node] == index_of[node]:
+                component: List[int] = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(sorted(component))
+
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+
+    # Tarjan emits components in reverse topological order.
+    components.reverse()
+    return components
+
+
+def condensation(
+    successors: Sequence[Sequence[int]],
+    components: Sequence[Sequence[int]],
+) -> Tuple[List[int], List[List[int]]]:
+    """Collapse each component to a single node.
+
+    Returns: (component_of[node], sorted successor lists of the condensation DAG)
+    """
+    component_of = [0] * len(successors)
+    for comp_idx, members in enumerate(components):
+        for node in members:
+            component_of[node] = comp_idx
+
+    dag: List[Set[int]] = [set() for _ in components]
+    for node, targets in enumerate(successors):
+        src_comp = component_of[node]
+        for target in targets:
+            dst_comp = component_of[target]
+            if dst_comp != src_comp:
+                dag[src_comp].add(dst_comp)
+    return component_of, [sorted(targets) for targets in dag]
+
+
+def topological_layers(dag: Sequence[Sequence[int]]) -> List[List[int]]:
+    """Kahn's algorithm, layering each node by its longest path from a source."""
+    in_degree = [0] * len(dag)
+    for targets in dag:
+        for target in targets:
+            in_degree[target] += 1
+
+    layer_of = [0] * len(dag)
+    queue = deque(node for node, degree in enumerate(in_degree) if degree == 0)
+    visited = 0
+    while queue:
+        node = queue.popleft()
+        visited += 1
+        for target in dag[node]:
+            layer_of[target] = max(layer_of[target], layer_of[node] + 1)
+            in_degree[target] -= 1
+            if in_degree[target] == 0:
+                queue.append(target)
+
+    if visited != len(dag):
+        raise ValueError("Condensation graph is not acyclic; SCC computation is inconsistent.")
+
+    layers: List[List[int]] = [[] for _ in range(max(layer_of, default=-1) + 1)]
+    for node, layer in enumerate(layer_of):
+        layers[layer].append(node)
+    return layers
+
+
+def betweenness_centrality(successors: Sequence[Sequence[int]]) -> List[float]:
+    """Brandes' algorithm for unweighted directed graphs, normalized to [0, 1]."""
+    num_nodes = len(successors)
+    centrality = [0.0] * num_nodes
+
+    for source in range(num_nodes):
+        order: List[int] = []
+        predecessors: List[List[int]] = [[] for _ in range(num_nodes)]
+        path_count = [0] * num_nodes
+        path_count[source] = 1
+        distance = [-1] * num_nodes
+        distance[source] = 0
+
+        queue = deque([source])
+        while queue:
+            node = queue.popleft()
+            order.append(node)
+            for target in successors[node]:
+                if distance[target] < 0:
+                    distance[target] = distance[node] + 1
+                    queue.append(target)
+                if distance[target] == distance[node] + 1:
+                    path_count[target] += path_count[node]
+                    predecessors[target].append(node)
+
+        dependency = [0.0] * num_nodes
+        for node in reversed(order):
+            for pred in predecessors[node]:
+                dependency[pred] += path_count[pred] / path_count[node] * (1.0 + dependency[node])
+            if node != source:
+                centrality[node] += dependency[node]
+
+    if num_nodes > 2:
+        scale = 1.0 / ((num_nodes - 1) * (num_nodes - 2))
+        centrality = [value * scale for value in centrality]
+    return centrality
+
+
+def compute_graph_analytics(
+    tool_order: Sequence[str],
+    edges: Iterable[Tuple[str, str]],
+) -> Dict[str, object]:
+    """Compute the analytics payload for a tool graph."""
+    successors = build_successors(tool_order, edges)
+    components = strongly_connected_components(successors)
+    component_of, dag = condensation(successors, components)
+    layers = topological_layers(dag)
+    centrality = betweenness_centrality(successors)
+
+    in_degree = [0] * len(tool_order)
+    for targets in successors:
+        for target in targets:
+            in_degree[target] += 1
+
+    layer_of_component = [0] * len(components)
+    for layer_idx, comps in enumerate(layers):
+        for comp in comps:
+            layer_of_component[comp] = layer_idx
+
+    tools = {
+        tool: {
+            "component": component_of[idx],
+            "layer": layer_of_component[component_of[idx]],
+            "inDegree": in_degree[idx],
+            "outDegree": len(successors[idx]),
+            "betweenness": round(centrality[idx], 6),
+        }
+        for idx, tool in enumerate(tool_order)
+    }
+
+    return {
+        "toolOrder": list(tool_order),
+        "toolCount": len(tool_order),
+        "edgeCount": sum(len(targets) for targets in successors),
+        "componentCount": len(components),
+        "components": [[tool_order[idx] for idx in members] for members in components],
+        "condensationEdges": [[src, dst] for src, targets in enumerate(dag) for dst in targets],
+        "layers": layers,
+        "tools": tools,
+    }
+
+
+def write_analytics_json(out_path: Path, payload: Dict[str, object], sources: Dict[str, str]) -> None:
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    document = {
+        "generatedAt": dt.datetime.now(dt.timezone.utc).replace(microsecond=0).isoformat(),
+        "sources": sources,
+        **payload,
+    }
+    out_path.write_text(json.dumps(document, indent=2) + "\n", encoding="utf-8")
+
+
+def parse_args(argv: Iterable[str]) -> argparse.Namespace:
+    script_dir = Path(__file__).resolve().parent
+    parser = argparse.ArgumentParser(
+        description="Compute SCCs, topological layers, degrees and betweenness for a tool adjacency CSV."
+    )
+    parser.add_argument(
+        "--matrix",
+        type=Path,
+        default=script_dir / "consensus_tool_adjacency_matrix.csv",
+        help="Input tool adjacency CSV.",
+    )
+    parser.add_argument(
+        "--out",
+        type=Path,
+        default=None,
+        help="Output JSON path (default: <matrix stem>_analytics.json next to the matrix).",
+    )
+    return parser.parse_args(list(argv))
+
+
+def main(argv: Iterable[str]) -> int:
+    from build_consensus_tool_adjacency import load_edges_from_csv
+
+    args = parse_args(argv)
+    matrix_path = args.matrix.resolve()
+    out_path = (args.out or matrix_path.with_name(matrix_path.stem + "_analytics.json")).resolve()
+
+    tools, edges = load_edges_from_csv(matrix_path)
+    payload = compute_graph_analytics(sorted(tools), edges)
+    write_analytics_json(out_path, payload, {"matrix": matrix_path.name})
+
+    print("Computed tool graph analytics.")
+    print(f"  tools: {payload['toolCount']}")
+    print(f"  strongly connected components: {payload['componentCount']}")
+    print(f"  topological layers: {len(payload['layers'])}")
+    print(f"  output: {out_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -27,11 +27,22 @@ check_prerequisites() {
     fi
 }
 
+# Route cwltool runs through the resource profiler when CWL_TEST_PROFILE=1
+if [[ "${CWL_TEST_PROFILE:-0}" == "1" ]]; then
+    cwltool() {
+        case "${1:-}" in
+            --validate|--make-template|--print-*) command cwltool "$@" ;;
+            *) python3 "$PROJECT_ROOT/utils/test_harness/profile_tool.py" run -- cwltool "$@" ;;
+        esac
+    }
+fi
+
 validate_cwl() {
     local cwl_file="$1"
     local result_file="$2"
     echo "--- CWL Validation ---" | tee -a "$result_file"
-    if (cd /tmp && cwltool --validate "$cwl_file") 2>&1 | tee -a "$result_file"; then
+    # Unchanged CWL files are skipped via the validate_cwl.py content-hash cache
+    if (cd /tmp && python3 "$PROJECT_ROOT/utils/test_harness/validate_cwl.py" "$cwl_file") 2>&1 | tee -a "$result_file"; then
         echo -e "${GREEN}PASS: CWL validation${NC}" | tee -a "$result_file"
         return 0
     else
@@ -68,19 +79,14 @@ check_file_nonempty() {
     fi
 }
 
+NIFTI_CHECK="$PROJECT_ROOT/utils/test_harness/nifti_check.py"
+
 check_nifti_header() {
     local file="$1"
     local label="$2"
     local result_file="$3"
     echo "Checking NIfTI header for $label..." | tee -a "$result_file"
-    if python3 -c "
-import nibabel as nib
-img = nib.load('$file')
-hdr = img.header
-print(f'  Shape: {img.shape}')
-print(f'  Voxel sizes: {hdr.get_zooms()}')
-print(f'  Data type: {hdr.get_data_dtype()}')
-" 2>&1 | tee -a "$result_file"; then
+    if python3 "$NIFTI_CHECK" --label "$label" "$file" 2>&1 | tee -a "$result_file"; then
         echo -e "${GREEN}PASS: $label header readable${NC}" | tee -a "$result_file"
         return 0
     else
@@ -89,6 +95,21 @@ print(f'  Data type: {hdr.get_data_dtype()}')
     fi
 }
 
+# Check many outputs (files, directories or globs) in a single process, with
+# voxel statistics: check_nifti_headers <result_file> <path>...
+check_nifti_headers() {
+    local result_file="$1"
+    shift
+    echo "Checking NIfTI headers ($# path(s))..." | tee -a "$result_file"
+    if python3 "$NIFTI_CHECK" --stats "$@" 2>&1 | tee -a "$result_file"; then
+        echo -e "${GREEN}PASS: NIfTI headers readable${NC}" | tee -a "$result_file"
+        return 0
+    else
+        echo -e "${RED}FAIL: NIfTI headers unreadable${NC}" | tee -a "$result_file"
+        return 1
+    fi
+}
+
 check_mif_header() {
     local file="$1"
     local label="$2"
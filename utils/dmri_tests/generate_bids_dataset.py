@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""Generate a synthetic multi-subject BIDS dataset for load testing.
+
+Produces a complete BIDS tree that exercises public/scripts/resolve_bids.py
+and the exported `run.sh --bids` path at scale:
+
+    dataset_description.json, participants.tsv/.json, README, task-*_bold.json
+    sub-XXX/[ses-YY/]anat/  T1w + sidecar
+    sub-XXX/[ses-YY/]func/  task BOLD runs + sidecars + events.tsv
+    sub-XXX/[ses-YY/]dwi/   DWI + bval/bvec + sidecar
+    sub-XXX/[ses-YY/]fmap/  AP/PA spin-echo EPI pair + sidecars (IntendedFor)
+
+Subjects are generated concurrently in a process pool. Each subject draws from
+its own seed derived from (--seed, subject index), so the dataset is identical
+regardless of --workers.
+
+Usage:
+    python3 generate_bids_dataset.py /tmp/bids --subjects 1000 --sessions 2 --workers 16
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+try:
+    import nibabel as nib
+except ImportError:
+    print("ERROR: nibabel required. Install with: pip3 install nibabel")
+    sys.exit(1)
+
+from generate_test_data import (
+    TENSOR_DIAG,
+    build_gradient_table,
+    make_affine,
+    make_b0_pair_volume,
+    make_sphere_mask,
+    simulate_dwi,
+)
+
+
+BIDS_VERSION = "1.9.0"
+BOLD_BASELINE = 1000.0
+BLOCK_SECONDS = 20.0
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic multi-subject BIDS dataset for load testing."
+    )
+    parser.add_argument("bids_dir", help="Output BIDS dataset root.")
+    parser.add_argument("--subjects", type=int, default=4, help="Number of subjects (default: 4).")
+    parser.add_argument(
+        "--sessions", type=int, default=1,
+        help="Sessions per subject; 0 omits the ses- level entirely (default: 1).",
+    )
+    parser.add_argument(
+        "--grid", type=int, nargs=3, default=[32, 32, 16], metavar=("NX", "NY", "NZ"),
+        help="Functional/diffusion grid; T1w uses twice the resolution (default: 32 32 16).",
+    )
+    parser.add_argument("--voxel-size", type=float, default=3.0, help="Functional voxel size in mm.")
+    parser.add_argument(
+        "--tasks", nargs="+", default=["rest", "motor"],
+        help="Task labels; 'rest' runs get no events.tsv (default: rest motor).",
+    )
+    parser.add_argument("--runs", type=int, default=1, help="Runs per task (default: 1).")
+    parser.add_argument("--bold-volumes", type=int, default=40, help="Volumes per BOLD run.")
+    parser.add_argument("--tr", type=float, default=2.0, help="BOLD repetition time in seconds.")
+    parser.add_argument(
+        "--shells", type=float, nargs="+", default=[1000.0], help="DWI b-values, one per shell.",
+    )
+    parser.add_argument("--directions", type=int, default=32, help="DWI directions per shell.")
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="Worker processes (default: CPU count).",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Dataset seed (default: 0).")
+    args = parser.parse_args(argv)
+    if args.subjects < 1:
+        parser.error("--subjects must be at least 1")
+    if args.sessions < 0 or args.runs < 1 or args.bold_volumes < 2:
+        parser.error("--sessions must be >= 0, --runs >= 1 and --bold-volumes >= 2")
+    return args
+
+
+def _write_json(path, payload):
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+        f.write("\n")
+
+
+def _save(data, affine, path, tr=None):
+    img = nib.Nifti1Image(data, affine)
+    img.header.set_xyzt_units("mm", "sec")
+    if tr is not None:
+        img.header.set_zooms(img.header.get_zooms()[:3] + (tr,))
+    nib.save(img, path)
+    return os.path.getsize(path)
+
+
+def block_events(n_volumes, tr, rng):
+    """Alternating task/rest blocks covering the run, with jittered onsets."""
+    run_seconds = n_volumes * tr
+    onsets = np.arange(BLOCK_SECONDS, run_seconds - BLOCK_SECONDS / 2, 2 * BLOCK_SECONDS)
+    onsets = onsets + rng.uniform(0.0, tr, len(onsets))
+    trial_types = np.where(np.arange(len(onsets)) % 2 == 0, "left", "right")
+    return [(float(onset), BLOCK_SECONDS, str(tt)) for onset, tt in zip(onsets, trial_types)]
+
+
+def simulate_bold(mask, n_volumes, tr, events, rng):
+    """Baseline + boxcar response in one hemisphere + Gaussian noise, shape (X, Y, Z, T)."""
+    times = np.arange(n_volumes) * tr
+    boxcar = np.zeros(n_volumes, dtype=np.float32)
+    for onset, duration, _ in events:
+        boxcar[(times >= onset) & (times < onset + duration)] = 1.0
+
+    active = np.zeros(mask.shape, dtype=np.float32)
+    active[: mask.shape[0] // 2] = 0.02 * BOLD_BASELINE
+    active *= mask
+
+    bold = rng.standard_normal((n_volumes,) + mask.shape, dtype=np.float32)
+    bold *= np.float32(10.0)
+    bold = np.moveaxis(bold, 0, -1)
+    bold += BOLD_BASELINE
+    bold += active[..., None] * boxcar
+    bold *= mask[..., None]
+    return bold
+
+
+def simulate_t1w(shape, rng):
+    """Two-tissue head: bright outer shell, darker core, light noise."""
+    mask = make_sphere_mask(shape).astype(np.float32)
+    core = make_sphere_mask(tuple(max(4, s * 2 // 3) for s in shape))
+    pad = [((s - c) // 2, s - c - (s - c) // 2) for s, c in zip(shape, core.shape)]
+    core = np.pad(core, pad).astype(np.float32)
+    t1w = mask * 600.0 + core * 300.0
+    t1w += rng.normal(0.0, 15.0, shape).astype(np.float32) * mask
+    return t1w.astype(np.float32)
+
+
+def interleaved_slice_timing(n_slices, tr):
+    """Ascending interleaved acquisition (even slices first), in seconds."""
+    order = list(range(0, n_slices, 2)) + list(range(1, n_slices, 2))
+    timing = [0.0] * n_slices
+    for position, slice_idx in enumerate(order):
+        timing[slice_idx] = round(position * tr / n_slices, 4)
+    return timing
+
+
+def subject_label(index, n_subjects):
+    return f"sub-{index + 1:0{max(3, len(str(n_subjects)))}d}"
+
+
+def generate_subject(job):
+    """Write every session of one subject. Runs in a worker process."""
+    args, index = job
+    rng = np.random.default_rng(np.random.SeedSequence([args.seed, index]))
+    sub = subject_label(index, args.subjects)
+    grid = tuple(args.grid)
+    affine = make_affine(args.voxel_size)
+    anat_affine = make_affine(args.voxel_size / 2)
+    mask = make_sphere_mask(grid)
+    bvals, bvecs = build_gradient_table(1, args.shells, args.directions)
+
+    sessions = [f"ses-{i + 1:02d}" for i in range(args.sessions)] or [None]
+    n_files = 0
+    n_bytes = 0
+    for ses in sessions:
+        rel_dir = os.path.join(sub, ses) if ses else sub
+        prefix = f"{sub}_{ses}" if ses else sub
+        for datatype in ("anat", "func", "dwi", "fmap"):
+            os.makedirs(os.path.join(args.bids_dir, rel_dir, datatype), exist_ok=True)
+
+        def path(datatype, name):
+            return os.path.join(args.bids_dir, rel_dir, datatype, f"{prefix}_{name}")
+
+        # anat
+        t1w = simulate_t1w(tuple(2 * s for s in grid), rng)
+        n_bytes += _save(t1w, anat_affine, path("anat", "T1w.nii.gz"))
+        _write_json(path("anat", "T1w.json"), {
+            "Modality": "MR", "MagneticFieldStrength": 3, "RepetitionTime": 2.3,
+            "EchoTime": 0.00298, "InversionTime": 0.9, "FlipAngle": 9,
+        })
+        n_files += 2
+
+        # func
+        bold_relpaths = []
+        for task in args.tasks:
+            for run in range(1, args.runs + 1):
+                entities = f"task-{task}_run-{run}"
+                events = [] if task == "rest" else block_events(args.bold_volumes, args.tr, rng)
+                bold = simulate_bold(mask, args.bold_volumes, args.tr, events, rng)
+                n_bytes += _save(bold, affine, path("func", f"{entities}_bold.nii.gz"), tr=args.tr)
+                _write_json(path("func", f"{entities}_bold.json"), {
+                    "TaskName": task,
+                    "RepetitionTime": args.tr,
+                    "EchoTime": 0.03,
+                    "PhaseEncodingDirection": "j-",
+                    "TotalReadoutTime": 0.05,
+                    "SliceTiming": interleaved_slice_timing(grid[2], args.tr),
+                })
+                n_files += 2
+                if events:
+                    with open(path("func", f"{entities}_events.tsv"), "w") as f:
+                        f.write("onset\tduration\ttrial_type\n")
+                        for onset, duration, trial_type in events:
+                            f.write(f"{onset:.3f}\t{duration:.1f}\t{trial_type}\n")
+                    n_files += 1
+                bold_relpaths.append(
+                    "/".join(filter(None, [ses, "func", f"{prefix}_{entities}_bold.nii.gz"]))
+                )
+
+        # dwi
+        dwi = simulate_dwi(mask, bvals, bvecs, np.diag(TENSOR_DIAG), rng)
+        n_bytes += _save(dwi, affine, path("dwi", "dwi.nii.gz"))
+        np.savetxt(path("dwi", "dwi.bval"), bvals.reshape(1, -1), fmt="%d")
+        np.savetxt(path("dwi", "dwi.bvec"), bvecs, fmt="%.6f")
+        _write_json(path("dwi", "dwi.json"), {
+            "PhaseEncodingDirection": "j-", "TotalReadoutTime": 0.05, "EchoTime": 0.089,
+        })
+        n_files += 4
+        dwi_relpath = "/".join(filter(None, [ses, "dwi", f"{prefix}_dwi.nii.gz"]))
+
+        # fmap
+        for direction, pe_dir, label in ((0, "j-", "AP"), (1, "j", "PA")):
+            vol = make_b0_pair_volume(mask, direction)[..., None]
+            n_bytes += _save(vol, affine, path("fmap", f"dir-{label}_epi.nii.gz"))
+            _write_json(path("fmap", f"dir-{label}_epi.json"), {
+                "PhaseEncodingDirection": pe_dir,
+                "TotalReadoutTime": 0.05,
+                "IntendedFor": bold_relpaths + [dwi_relpath],
+            })
+            n_files += 2
+
+    participant = {
+        "participant_id": sub,
+        "age": int(rng.integers(18, 90)),
+        "sex": str(rng.choice(["F", "M"])),
+        "group": str(rng.choice(["control", "patient"])),
+    }
+    return participant, n_files, n_bytes
+
+
+def write_dataset_files(args, participants):
+    _write_json(os.path.join(args.bids_dir, "dataset_description.json"), {
+        "Name": "niBuild synthetic load-test dataset",
+        "BIDSVersion": BIDS_VERSION,
+        "DatasetType": "raw",
+        "GeneratedBy": [{"Name": "niBuild generate_bids_dataset.py"}],
+    })
+    with open(os.path.join(args.bids_dir, "participants.tsv"), "w") as f:
+        f.write("participant_id\tage\tsex\tgroup\n")
+        for row in participants:
+            f.write(f"{row['participant_id']}\t{row['age']}\t{row['sex']}\t{row['group']}\n")
+    _write_json(os.path.join(args.bids_dir, "participants.json"), {
+        "age": {"Description": "Age of the participant", "Units": "years"},
+        "sex": {"Description": "Sex of the participant", "Levels": {"F": "female", "M": "male"}},
+        "group": {"Description": "Cohort", "Levels": {"control": "control", "patient": "patient"}},
+    })
+    for task in args.tasks:
+        _write_json(os.path.join(args.bids_dir, f"task-{task}_bold.json"), {"TaskName": task})
+    with open(os.path.join(args.bids_dir, "README"), "w") as f:
+        f.write(
+            "Synthetic BIDS dataset generated by utils/dmri_tests/generate_bids_dataset.py "
+            f"(seed {args.seed}). Image content is simulated and not suitable for analysis.\n"
+        )
+
+
+def main(argv):
+    args = parse_args(argv)
+    args.bids_dir = os.path.abspath(args.bids_dir)
+    os.makedirs(args.bids_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    jobs = [(args, index) for index in range(args.subjects)]
+    participants = []
+    n_files = 0
+    n_bytes = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        chunksize = max(1, args.subjects // (4 * (args.workers or os.cpu_count() or 1)))
+        for done, (participant, files, size) in enumerate(
+            pool.map(generate_subject, jobs, chunksize=chunksize), start=1
+        ):
+            participants.append(participant)
+            n_files += files
+            n_bytes += size
+            if done % 50 == 0 or done == args.subjects:
+                print(f"  {done}/{args.subjects} subjects written")
+
+    write_dataset_files(args, participants)
+    elapsed = time.perf_counter() - start
+    print(
+        f"\n=== BIDS dataset generated in {args.bids_dir}: {args.subjects} subjects, "
+        f"{n_files} files, {n_bytes / 1e6:.1f} MB images in {elapsed:.1f}s ==="
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""Generate a synthetic MRtrix3 tractogram (.tck) with a known connectome.
+
+Streamlines run between pairs of parcels of a labelled image, so
+tck2connectome on the output reproduces connectome_truth.csv exactly:
+
+- parcel pairs are drawn with probability proportional to
+  exp(-centroid distance / --distance-scale), as in real connectomes where
+  short connections dominate;
+- each endpoint is a random voxel of its parcel, jittered by less than half a
+  voxel so it still maps back to that voxel;
+- the path is a quadratic Bezier curve bowed towards the brain centre, sampled
+  every --step mm.
+
+The parcellation is either an existing image (--parcellation, e.g. the
+parcellation.nii.gz written by generate_test_data.py) or a Voronoi
+parcellation of the spherical mask with --parcels regions.
+
+Streamlines are generated --batch at a time with vectorized numpy and written
+straight into a memory-mapped float32 .tck file. Each batch has its own seed
+derived from (--seed, batch index): a first pass sizes the file, the second
+regenerates each batch and fills it in, so peak memory is one batch whatever
+the streamline count (10^5 - 10^7).
+
+    python3 generate_streamlines.py tracks --streamlines 1000000 --parcels 400
+    python3 generate_streamlines.py tracks --parcellation test_data/parcellation.nii.gz
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+try:
+    import nibabel as nib
+except ImportError:
+    print("ERROR: nibabel required. Install with: pip3 install nibabel")
+    sys.exit(1)
+
+from generate_test_data import make_affine, make_sphere_mask
+from phantom import parcellate
+
+
+# Endpoint jitter in voxels; below 0.5 so endpoints stay in their voxel
+ENDPOINT_JITTER = 0.45
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic MRtrix3 tractogram with a known connectome."
+    )
+    parser.add_argument("data_dir", help="Output directory for the generated data.")
+    parser.add_argument(
+        "--streamlines", type=int, default=100000,
+        help="Number of streamlines (default: 100000).",
+    )
+    parser.add_argument(
+        "--parcellation", default=None,
+        help="Existing labelled NIfTI image to connect; by default a Voronoi "
+             "parcellation of a spherical mask is generated.",
+    )
+    parser.add_argument(
+        "--parcels", type=int, default=200,
+        help="Regions of the generated parcellation (default: 200).",
+    )
+    parser.add_argument(
+        "--grid", type=int, nargs=3, default=[96, 96, 60], metavar=("NX", "NY", "NZ"),
+        help="Grid size of the generated parcellation (default: 96 96 60).",
+    )
+    parser.add_argument(
+        "--voxel-size", type=float, default=2.0,
+        help="Isotropic voxel size in mm of the generated parcellation (default: 2.0).",
+    )
+    parser.add_argument(
+        "--step", type=float, default=1.0,
+        help="Distance between streamline points in mm (default: 1.0).",
+    )
+    parser.add_argument(
+        "--distance-scale", type=float, default=40.0,
+        help="Length scale in mm of the exponential fall-off of connection "
+             "probability with parcel distance (default: 40).",
+    )
+    parser.add_argument(
+        "--curvature", type=float, default=0.5,
+        help="How far the curve midpoint is pulled towards the brain centre, "
+             "0 (straight) to 1 (default: 0.5).",
+    )
+    parser.add_argument(
+        "--batch", type=int, default=50000,
+        help="Streamlines generated and written per batch; each batch has its own "
+             "random stream, so changing it changes the draws (default: 50000).",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0,
+        help="Random seed; identical arguments and seed give identical data (default: 0).",
+    )
+    args = parser.parse_args(argv)
+    if args.streamlines < 1:
+        parser.error("--streamlines must be at least 1")
+    if args.parcellation is None:
+        if min(args.grid) < 4:
+            parser.error("--grid dimensions must be at least 4")
+        if args.parcels < 2:
+            parser.error("--parcels must be at least 2")
+    elif not os.path.isfile(args.parcellation):
+        parser.error(f"--parcellation not found: {args.parcellation}")
+    if args.step <= 0 or args.voxel_size <= 0:
+        parser.error("--step and --voxel-size must be positive")
+    if args.distance_scale <= 0:
+        parser.error("--distance-scale must be positive")
+    if not 0 <= args.curvature <= 1:
+        parser.error("--curvature must be in [0, 1]")
+    if args.batch < 1:
+        parser.error("--batch must be at least 1")
+    return args
+
+
+class StreamlineModel:
+    """Parcel geometry and pair probabilities for drawing batches of streamlines."""
+
+    def __init__(self, parcellation, affine, distance_scale, curvature):
+        self.affine = np.asarray(affine, dtype=np.float64)
+        self.curvature = curvature
+        labels = np.asarray(parcellation).astype(np.int64).reshape(-1)
+        self.shape = parcellation.shape
+        self.n_nodes = int(labels.max())
+
+        # Labelled voxels grouped by label: voxels[starts[l]:starts[l] + counts[l]]
+        labelled = np.flatnonzero(labels > 0)
+        order = np.argsort(labels[labelled], kind="stable")
+        self.voxels = labelled[order]
+        self.counts = np.bincount(labels[labelled], minlength=self.n_nodes + 1)
+        self.starts = np.concatenate([[0], np.cumsum(self.counts)[:-1]])
+        self.present = np.flatnonzero(self.counts[1:]) + 1
+        if len(self.present) < 2:
+            raise ValueError("the parcellation needs at least two labelled regions")
+
+        coords = self._world(np.stack(np.unravel_index(labelled, self.shape), axis=1))
+        centroids = np.stack([
+            np.bincount(labels[labelled], weights=coords[:, k], minlength=self.n_nodes + 1)
+            for k in range(3)
+        ], axis=1)[self.present] / self.counts[self.present, None]
+        self.centre = coords.mean(axis=0)
+
+        # Every unordered pair of distinct regions, weighted by exp(-distance / scale)
+        i, j = np.triu_indices(len(self.present), 1)
+        self.pair_a = self.present[i]
+        self.pair_b = self.present[j]
+        distance = np.linalg.norm(centroids[i] - centroids[j], axis=1)
+        cdf = np.cumsum(np.exp(-distance / distance_scale))
+        self.cdf = cdf / cdf[-1]
+
+    def _world(self, ijk):
+        return ijk @ self.affine[:3, :3].T + self.affine[:3, 3]
+
+    def _endpoints(self, nodes, rng):
+        pick = (rng.random(len(nodes)) * self.counts[nodes]).astype(np.int64)
+        flat = self.voxels[self.starts[nodes] + pick]
+        ijk = np.stack(np.unravel_index(flat, self.shape), axis=1).astype(np.float64)
+        ijk += rng.uniform(-ENDPOINT_JITTER, ENDPOINT_JITTER, ijk.shape)
+        return self._world(ijk)
+
+    def batch(self, size, step, rng):
+        """Draw ``size`` streamlines.
+
+        Returns (pair index, a, b, c, n_points): the index into the pair table,
+        the endpoints and Bezier control point in mm, and the point count.
+        """
+        pair = np.minimum(np.searchsorted(self.cdf, rng.random(size), side="right"),
+                          len(self.cdf) - 1)
+        a = self._endpoints(self.pair_a[pair], rng)
+        b = self._endpoints(self.pair_b[pair], rng)
+        chord = np.linalg.norm(b - a, axis=1)
+        mid = 0.5 * (a + b)
+        c = mid + self.curvature * (self.centre - mid)
+        c += rng.standard_normal(c.shape) * (0.1 * chord)[:, None]
+        # Arc length of a quadratic Bezier ~ (2 * chord + control polygon) / 3
+        length = (2.0 * chord + np.linalg.norm(c - a, axis=1) + np.linalg.norm(b - c, axis=1)) / 3.0
+        n_points = np.maximum(np.ceil(length / step).astype(np.int64) + 1, 2)
+        return pair, a, b, c, n_points
+
+
+def batch_points(a, b, c, n_points):
+    """Points of a batch in .tck order: each streamline followed by a NaN triplet."""
+    rows = n_points + 1
+    streamline = np.repeat(np.arange(len(rows), dtype=np.int32), rows)
+    offsets = np.concatenate([[0], np.cumsum(rows)[:-1]])
+    k = np.arange(int(rows.sum()), dtype=np.int64) - offsets[streamline]
+    n = n_points[streamline]
+    t = (k / (n - 1)).astype(np.float32)[:, None]
+    s = 1.0 - t
+    points = (s * s) * a.astype(np.float32)[streamline]
+    points += (2.0 * s * t) * c.astype(np.float32)[streamline]
+    points += (t * t) * b.astype(np.float32)[streamline]
+    points[k == n] = np.nan
+    return points
+
+
+def tck_header(count, extra=None):
+    """MRtrix3 .tck header text; ``file: . OFFSET`` points just past ``END``."""
+    lines = ["mrtrix tracks", f"count: {count}", "datatype: Float32LE"]
+    lines += [f"{key}: {value}" for key, value in (extra or {}).items()]
+    offset = 0
+    while True:
+        text = "\n".join(lines + [f"file: . {offset}", "END"]) + "\n"
+        if len(text) == offset:
+            return text.encode("latin-1")
+        offset = len(text)
+
+
+def open_tck_memmap(path, count, n_rows, extra=None):
+    """Create ``path`` with a .tck header and return a (n_rows + 1, 3) float32 memmap.
+
+    The final row is set to the Inf end-of-file triplet.
+    """
+    header = tck_header(count, extra)
+    with open(path, "wb") as f:
+        f.write(header)
+        f.truncate(len(header) + (n_rows + 1) * 3 * 4)
+    data = np.memmap(path, dtype="<f4", mode="r+", offset=len(header), shape=(n_rows + 1, 3))
+    data[-1] = np.inf
+    return data
+
+
+def main(argv):
+    args = parse_args(argv)
+    data_dir = args.data_dir
+    os.makedirs(data_dir, exist_ok=True)
+
+    if args.parcellation:
+        img = nib.load(args.parcellation)
+        parcellation = np.asanyarray(img.dataobj)
+        affine = img.affine
+        print(f"Using {args.parcellation}: {len(np.unique(parcellation)) - 1} regions")
+    else:
+        affine = make_affine(args.voxel_size)
+        mask = make_sphere_mask(tuple(args.grid))
+        parcellation = parcellate(mask, args.parcels, np.random.default_rng([args.seed, 2]))
+        nib.save(nib.Nifti1Image(parcellation, affine),
+                 os.path.join(data_dir, "parcellation.nii.gz"))
+        print(f"Created parcellation.nii.gz: {len(np.unique(parcellation)) - 1} regions")
+
+    model = StreamlineModel(parcellation, affine, args.distance_scale, args.curvature)
+    batches = [(start, min(start + args.batch, args.streamlines))
+               for start in range(0, args.streamlines, args.batch)]
+
+    def draw(index):
+        start, stop = batches[index]
+        return model.batch(stop - start, args.step, np.random.default_rng([args.seed, 3, index]))
+
+    # Pass 1: point counts, to size the file
+    started = time.time()
+    batch_rows = [int((draw(index)[4] + 1).sum()) for index in range(len(batches))]
+    n_rows = sum(batch_rows)
+
+    # Pass 2: regenerate each batch and write it in place
+    tck_path = os.path.join(data_dir, "tracks.tck")
+    data = open_tck_memmap(tck_path, args.streamlines, n_rows,
+                           {"step_size": args.step, "generator": "generate_streamlines.py"})
+    pair_counts = np.zeros(len(model.cdf), dtype=np.int64)
+    row = 0
+    for index in range(len(batches)):
+        pair, a, b, c, n_points = draw(index)
+        data[row:row + batch_rows[index]] = batch_points(a, b, c, n_points)
+        row += batch_rows[index]
+        pair_counts += np.bincount(pair, minlength=len(pair_counts))
+    data.flush()
+    del data
+    elapsed = time.time() - started
+    n_points = n_rows - args.streamlines
+    print(f"Created tracks.tck: {args.streamlines} streamlines, {n_points} points "
+          f"(mean {n_points / args.streamlines:.1f}), "
+          f"{os.path.getsize(tck_path) / 2 ** 20:.1f} MiB in {elapsed:.1f}s "
+          f"({args.streamlines / max(elapsed, 1e-9):,.0f} streamlines/s)")
+
+    # Symmetric node-by-node counts with a zero diagonal, nodes numbered by label
+    connectome = np.zeros((model.n_nodes, model.n_nodes), dtype=np.int64)
+    connectome[model.pair_a - 1, model.pair_b - 1] = pair_counts
+    connectome += connectome.T
+    np.savetxt(os.path.join(data_dir, "connectome_truth.csv"), connectome,
+               fmt="%d", delimiter=",")
+    print(f"Created connectome_truth.csv: {model.n_nodes} nodes, "
+          f"{int(np.count_nonzero(pair_counts))} connected pairs")
+
+    print(f"\n=== Synthetic tractogram generated in {data_dir} ===")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
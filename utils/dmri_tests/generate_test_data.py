@@ -1,8 +1,30 @@
 #!/usr/bin/env python3
-"""Generate synthetic dMRI test data for CWL tool testing."""
+"""Generate synthetic dMRI test data for CWL tool testing.
 
-import sys
+The defaults reproduce the small fixture used by the test scripts
+(32x32x16 grid, one b=0 and 32 directions at b=1000). Larger, multi-shell
+datasets for load testing can be requested from the command line:
+
+    python3 generate_test_data.py test_data
+    python3 generate_test_data.py test_data --grid 128 128 80 \\
+        --shells 1000 2000 3000 --directions 64 --b0 6 --subjects 20 --seed 7
+
+--model ball-sticks / multi-tensor replaces the single-tensor fill with a
+multi-compartment phantom (phantom.py): crossing fibre bundles, WM/GM/CSF
+partial-volume maps (also written as *_pve.nii.gz and an MRtrix3 5tt image),
+FA maps derived from the phantom and Rician noise. --parcels N swaps the four
+quadrants for an N-region Voronoi parcellation for tck2connectome.
+
+With --stream the 4D series are written slab by slab into memory-mapped
+uncompressed .nii files (peak memory: one slab), then gzipped in parallel
+unless --no-gzip is given. Duplicate outputs (bedpostx_input/) are hardlinked
+or symlinked to the originals instead of being written again.
+"""
+
+import argparse
 import os
+import sys
+
 import numpy as np
 
 try:
@@ -11,139 +33,348 @@ except ImportError:
     print("ERROR: nibabel required. Install with: pip3 install nibabel")
     sys.exit(1)
 
-data_dir = sys.argv[1]
-os.makedirs(data_dir, exist_ok=True)
-
-# Image parameters
-nx, ny, nz = 32, 32, 16
-n_b0 = 1
-n_dwi = 32
-n_volumes = n_b0 + n_dwi
-voxel_size = 2.0
-
-# Affine matrix
-affine = np.eye(4) * voxel_size
-affine[3, 3] = 1.0
-
-# Brain mask (sphere)
-x, y, z = np.ogrid[0:nx, 0:ny, 0:nz]
-cx, cy, cz = nx // 2, ny // 2, nz // 2
-radius = min(nx, ny, nz) // 3
-mask = ((x - cx) ** 2 + (y - cy) ** 2 + (z - cz) ** 2) <= radius ** 2
-mask = mask.astype(np.uint8)
-nib.save(nib.Nifti1Image(mask, affine), os.path.join(data_dir, "mask.nii.gz"))
-print(f"Created mask.nii.gz: shape={mask.shape}")
-
-# Gradient directions (golden angle spiral)
-golden_angle = np.pi * (3 - np.sqrt(5))
-theta = np.arange(n_dwi) * golden_angle
-phi = np.arccos(1 - 2 * (np.arange(n_dwi) + 0.5) / n_dwi)
-bvecs_x = np.sin(phi) * np.cos(theta)
-bvecs_y = np.sin(phi) * np.sin(theta)
-bvecs_z = np.cos(phi)
-
-# Simulate DWI with prolate tensor along z
-b0_signal = 1000.0
-b_value = 1000.0
-D = np.array([0.3e-3, 0.3e-3, 1.7e-3])
-
-dwi_data = np.zeros((nx, ny, nz, n_volumes), dtype=np.float32)
-dwi_data[:, :, :, 0] = b0_signal * mask
-
-for i in range(n_dwi):
-    g = np.array([bvecs_x[i], bvecs_y[i], bvecs_z[i]])
-    adc = np.sum(g ** 2 * D)
-    signal = b0_signal * np.exp(-b_value * adc)
-    noise = np.random.normal(0, 20, (nx, ny, nz)).astype(np.float32)
-    dwi_data[:, :, :, i + 1] = signal * mask + noise * mask
-
-nib.save(nib.Nifti1Image(dwi_data, affine), os.path.join(data_dir, "dwi.nii.gz"))
-print(f"Created dwi.nii.gz: shape={dwi_data.shape}")
-
-# bvals / bvecs
-bvals = np.zeros(n_volumes)
-bvals[1:] = b_value
-np.savetxt(os.path.join(data_dir, "dwi.bval"), bvals.reshape(1, -1), fmt="%d")
-print(f"Created dwi.bval: {n_volumes} values")
-
-bvecs = np.zeros((3, n_volumes))
-bvecs[0, 1:] = bvecs_x
-bvecs[1, 1:] = bvecs_y
-bvecs[2, 1:] = bvecs_z
-np.savetxt(os.path.join(data_dir, "dwi.bvec"), bvecs, fmt="%.6f")
-print(f"Created dwi.bvec: {n_volumes} directions")
-
-# Acquisition params and index for eddy/topup
-with open(os.path.join(data_dir, "acqparams.txt"), "w") as f:
-    f.write("0 -1 0 0.05\n")
-print("Created acqparams.txt")
-
-index_vals = np.ones(n_volumes, dtype=int)
-np.savetxt(os.path.join(data_dir, "index.txt"), index_vals.reshape(1, -1), fmt="%d")
-print("Created index.txt")
-
-# b0 pair for topup (AP/PA)
-b0_pair = np.zeros((nx, ny, nz, 2), dtype=np.float32)
-b0_pair[:, :, :, 0] = b0_signal * mask
-b0_pair[:, :, :, 1] = b0_signal * mask
-b0_pair[1:, :, :, 0] += 50 * mask[:-1, :, :]
-b0_pair[:-1, :, :, 1] += 50 * mask[1:, :, :]
-nib.save(nib.Nifti1Image(b0_pair, affine), os.path.join(data_dir, "b0_pair.nii.gz"))
-print(f"Created b0_pair.nii.gz: shape={b0_pair.shape}")
-
-with open(os.path.join(data_dir, "topup_acqparams.txt"), "w") as f:
-    f.write("0 -1 0 0.05\n0 1 0 0.05\n")
-print("Created topup_acqparams.txt")
-
-# FA images for TBSS
-for subj_idx in range(1, 3):
-    fa = np.random.uniform(0.1, 0.8, (nx, ny, nz)).astype(np.float32) * mask
-    nib.save(nib.Nifti1Image(fa, affine), os.path.join(data_dir, f"fa_sub{subj_idx:02d}.nii.gz"))
-    print(f"Created fa_sub{subj_idx:02d}.nii.gz")
-
-# bedpostx directory
-bpx_dir = os.path.join(data_dir, "bedpostx_input")
-os.makedirs(bpx_dir, exist_ok=True)
-nib.save(nib.Nifti1Image(dwi_data, affine), os.path.join(bpx_dir, "data.nii.gz"))
-nib.save(nib.Nifti1Image(mask, affine), os.path.join(bpx_dir, "nodif_brain_mask.nii.gz"))
-np.savetxt(os.path.join(bpx_dir, "bvals"), bvals.reshape(1, -1), fmt="%d")
-np.savetxt(os.path.join(bpx_dir, "bvecs"), bvecs, fmt="%.6f")
-print("Created bedpostx_input/ directory")
-
-# MRtrix3 response functions
-with open(os.path.join(data_dir, "wm_response.txt"), "w") as f:
-    f.write("1000 600 -200 40\n")
-print("Created wm_response.txt")
-
-with open(os.path.join(data_dir, "gm_response.txt"), "w") as f:
-    f.write("1000 200\n")
-print("Created gm_response.txt")
-
-with open(os.path.join(data_dir, "csf_response.txt"), "w") as f:
-    f.write("1000 30\n")
-print("Created csf_response.txt")
-
-# Parcellation atlas for tck2connectome
-parcellation = np.zeros((nx, ny, nz), dtype=np.int16)
-parcellation[:nx // 2, :ny // 2, :] = 1
-parcellation[nx // 2:, :ny // 2, :] = 2
-parcellation[:nx // 2, ny // 2:, :] = 3
-parcellation[nx // 2:, ny // 2:, :] = 4
-parcellation *= mask.astype(np.int16)
-nib.save(nib.Nifti1Image(parcellation, affine), os.path.join(data_dir, "parcellation.nii.gz"))
-print(f"Created parcellation.nii.gz: {len(np.unique(parcellation)) - 1} regions")
-
-# FreeSurfer minimal subjects_dir and license
-fs_dir = os.path.join(data_dir, "freesurfer_subjects")
-os.makedirs(os.path.join(fs_dir, "test_subject", "mri"), exist_ok=True)
-nib.save(nib.Nifti1Image(mask, affine), os.path.join(fs_dir, "test_subject", "mri", "brain.mgz"))
-with open(os.path.join(data_dir, "fs_license.txt"), "w") as f:
-    f.write("dummy@test.com\n00000\n *abcdefg\n 123456789\n")
-print("Created freesurfer_subjects/ and fs_license.txt")
-
-# Single b=0 volume for dmri_postreg
-b0_vol = dwi_data[:, :, :, 0]
-nib.save(nib.Nifti1Image(b0_vol, affine), os.path.join(data_dir, "b0.nii.gz"))
-print("Created b0.nii.gz")
-
-print(f"\n=== All test data generated in {data_dir} ===")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "test_harness"))
+from nifti_stream import gzip_parallel, link_or_copy, open_nifti_memmap  # noqa: E402
+from phantom import MODELS, Phantom, add_rician_noise, parcellate  # noqa: E402
+
+
+B0_SIGNAL = 1000.0
+NOISE_SIGMA = 20.0
+# Prolate tensor along z (eigenvalues in mm^2/s)
+TENSOR_DIAG = (0.3e-3, 0.3e-3, 1.7e-3)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic dMRI test data for CWL tool testing."
+    )
+    parser.add_argument("data_dir", help="Output directory for the generated data.")
+    parser.add_argument(
+        "--grid", type=int, nargs=3, default=[32, 32, 16], metavar=("NX", "NY", "NZ"),
+        help="Image grid size (default: 32 32 16).",
+    )
+    parser.add_argument(
+        "--voxel-size", type=float, default=2.0,
+        help="Isotropic voxel size in mm (default: 2.0).",
+    )
+    parser.add_argument(
+        "--shells", type=float, nargs="+", default=[1000.0],
+        help="Non-zero b-values, one per shell (default: 1000).",
+    )
+    parser.add_argument(
+        "--directions", type=int, default=32,
+        help="Gradient directions per shell (default: 32).",
+    )
+    parser.add_argument(
+        "--b0", type=int, default=1, dest="n_b0",
+        help="Number of b=0 volumes at the start of the series (default: 1).",
+    )
+    parser.add_argument(
+        "--subjects", type=int, default=2,
+        help="Number of synthetic FA maps for TBSS (default: 2, minimum 2).",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0,
+        help="Random seed; identical arguments and seed give identical data (default: 0).",
+    )
+    parser.add_argument(
+        "--model", choices=("tensor",) + MODELS, default="tensor",
+        help="Signal model: single prolate tensor (default) or a crossing-fibre "
+             "phantom with ball-and-sticks or multi-tensor compartments.",
+    )
+    parser.add_argument(
+        "--bundles", type=int, default=5,
+        help="Fibre bundles in the phantom models (default: 5; the first three cross).",
+    )
+    parser.add_argument(
+        "--snr", type=float, default=B0_SIGNAL / NOISE_SIGMA,
+        help="b=0 SNR of the Rician noise in the phantom models (default: 50).",
+    )
+    parser.add_argument(
+        "--parcels", type=int, default=0,
+        help="Voronoi parcellation with this many regions instead of four quadrants.",
+    )
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="Write 4D series slab by slab into memory-mapped .nii files (bounded memory).",
+    )
+    parser.add_argument(
+        "--slab-volumes", type=int, default=8,
+        help="Volumes simulated and written per slab in --stream mode (default: 8).",
+    )
+    parser.add_argument(
+        "--no-gzip", action="store_true",
+        help="In --stream mode, keep uncompressed .nii outputs instead of gzipping them.",
+    )
+    parser.add_argument(
+        "--gzip-workers", type=int, default=None,
+        help="Threads for parallel gzip in --stream mode (default: CPU count).",
+    )
+    args = parser.parse_args(argv)
+    if min(args.grid) < 4:
+        parser.error("--grid dimensions must be at least 4")
+    if args.directions < 6:
+        parser.error("--directions must be at least 6 for tensor fitting")
+    if args.n_b0 < 1:
+        parser.error("--b0 must be at least 1")
+    if args.subjects < 2:
+        parser.error("--subjects must be at least 2 for TBSS")
+    if args.bundles < 1:
+        parser.error("--bundles must be at least 1")
+    if args.snr <= 0:
+        parser.error("--snr must be positive")
+    if args.parcels < 0:
+        parser.error("--parcels must not be negative")
+    if args.slab_volumes < 1:
+        parser.error("--slab-volumes must be at least 1")
+    return args
+
+
+def make_affine(voxel_size):
+    affine = np.eye(4) * voxel_size
+    affine[3, 3] = 1.0
+    return affine
+
+
+def make_sphere_mask(shape):
+    """Binary brain mask: a sphere centred in the grid."""
+    nx, ny, nz = shape
+    x, y, z = np.ogrid[0:nx, 0:ny, 0:nz]
+    cx, cy, cz = nx // 2, ny // 2, nz // 2
+    radius = min(nx, ny, nz) // 3
+    mask = ((x - cx) ** 2 + (y - cy) ** 2 + (z - cz) ** 2) <= radius ** 2
+    return mask.astype(np.uint8)
+
+
+def spiral_directions(n_dirs, rotation=0.0):
+    """Unit vectors on a golden-angle spiral, shape (n_dirs, 3).
+
+    ``rotation`` offsets the azimuth so successive shells interleave.
+    """
+    golden_angle = np.pi * (3 - np.sqrt(5))
+    theta = np.arange(n_dirs) * golden_angle + rotation
+    phi = np.arccos(1 - 2 * (np.arange(n_dirs) + 0.5) / n_dirs)
+    return np.stack(
+        [np.sin(phi) * np.cos(theta), np.sin(phi) * np.sin(theta), np.cos(phi)], axis=1
+    )
+
+
+def build_gradient_table(n_b0, shells, n_dirs):
+    """Return (bvals (n_volumes,), bvecs (3, n_volumes)) with b=0 volumes first."""
+    golden_angle = np.pi * (3 - np.sqrt(5))
+    shell_dirs = [spiral_directions(n_dirs, rotation=i * golden_angle / len(shells))
+                  for i in range(len(shells))]
+    dirs = np.concatenate([np.zeros((n_b0, 3))] + shell_dirs)
+    bvals = np.concatenate([np.zeros(n_b0)] + [np.full(n_dirs, b) for b in shells])
+    return bvals, dirs.T
+
+
+def simulate_dwi(mask, bvals, bvecs, tensor, rng):
+    """Single-tensor signal for every volume at once: S0 * exp(-b * g^T D g).
+
+    Gaussian noise (sigma NOISE_SIGMA) is added to diffusion-weighted volumes
+    inside the mask; b=0 volumes are noise-free. Noise is drawn volume by
+    volume, so simulating a series in slabs gives the same data as in one go.
+    """
+    adc = np.einsum("iv,ij,jv->v", bvecs, tensor, bvecs)
+    signal = (B0_SIGNAL * np.exp(-bvals * adc)).astype(np.float32)
+
+    noise = rng.standard_normal((len(bvals),) + mask.shape, dtype=np.float32)
+    noise[bvals == 0] = 0.0
+    noise *= np.float32(NOISE_SIGMA)
+    dwi = np.moveaxis(noise, 0, -1)
+    dwi += signal
+    dwi *= mask[..., None]
+    return dwi
+
+
+def simulate_phantom_dwi(phantom, bvals, bvecs, sigma, rng):
+    """Phantom signal for the given volumes with Rician noise on every voxel."""
+    signal = phantom.signal(bvals, bvecs, B0_SIGNAL)
+    return add_rician_noise(signal, sigma, rng)
+
+
+def stream_dwi(path, shape, bvals, bvecs, simulate, affine, slab_volumes):
+    """Write ``simulate(bvals, bvecs)`` ``slab_volumes`` at a time straight into a .nii memmap."""
+    n_volumes = len(bvals)
+    img = open_nifti_memmap(path, tuple(shape) + (n_volumes,), np.float32, affine)
+    for start in range(0, n_volumes, slab_volumes):
+        stop = min(start + slab_volumes, n_volumes)
+        img[..., start:stop] = simulate(bvals[start:stop], bvecs[:, start:stop])
+    img.flush()
+    del img
+
+
+def make_b0_pair_volume(mask, direction):
+    """One volume of the reversed phase-encode b0 pair, shifted by one voxel along x."""
+    vol = (B0_SIGNAL * mask).astype(np.float32)
+    if direction == 0:
+        vol[1:, :, :] += 50 * mask[:-1, :, :]
+    else:
+        vol[:-1, :, :] += 50 * mask[1:, :, :]
+    return vol
+
+
+def main(argv):
+    args = parse_args(argv)
+    data_dir = args.data_dir
+    os.makedirs(data_dir, exist_ok=True)
+    rng = np.random.default_rng(args.seed)
+
+    # Image parameters
+    nx, ny, nz = args.grid
+    affine = make_affine(args.voxel_size)
+
+    # Brain mask (sphere)
+    mask = make_sphere_mask((nx, ny, nz))
+    nib.save(nib.Nifti1Image(mask, affine), os.path.join(data_dir, "mask.nii.gz"))
+    print(f"Created mask.nii.gz: shape={mask.shape}")
+
+    # Gradient table and DWI: a prolate tensor along z, or the fibre phantom.
+    # The phantom geometry and parcellation draw from their own streams so the
+    # default fixture is unchanged by them.
+    bvals, bvecs = build_gradient_table(args.n_b0, args.shells, args.directions)
+    n_volumes = len(bvals)
+    dwi_shape = (nx, ny, nz, n_volumes)
+    phantom = None
+    if args.model == "tensor":
+        tensor = np.diag(TENSOR_DIAG)
+
+        def simulate(b, g):
+            return simulate_dwi(mask, b, g, tensor, rng)
+    else:
+        phantom = Phantom(mask, args.bundles, args.model, np.random.default_rng([args.seed, 1]))
+        sigma = B0_SIGNAL / args.snr
+
+        def simulate(b, g):
+            return simulate_phantom_dwi(phantom, b, g, sigma, rng)
+
+        for name, pve in zip(("wm", "gm", "csf"), phantom.tissue_maps()):
+            nib.save(nib.Nifti1Image(pve, affine), os.path.join(data_dir, f"{name}_pve.nii.gz"))
+        nib.save(nib.Nifti1Image(phantom.five_tissue_type(), affine),
+                 os.path.join(data_dir, "5tt.nii.gz"))
+        print(f"Created wm/gm/csf_pve.nii.gz and 5tt.nii.gz: {args.model} phantom, "
+              f"{args.bundles} bundles, {len(phantom.index)} brain voxels")
+
+    # The first (b=0) volume is kept for b0.nii.gz, so it matches the series
+    if args.stream:
+        dwi_path = os.path.join(data_dir, "dwi.nii")
+        stream_dwi(dwi_path, mask.shape, bvals, bvecs, simulate, affine, args.slab_volumes)
+        b0_vol = np.array(nib.load(dwi_path).dataobj[..., 0], dtype=np.float32)
+    else:
+        dwi_path = os.path.join(data_dir, "dwi.nii.gz")
+        dwi = simulate(bvals, bvecs)
+        nib.save(nib.Nifti1Image(dwi, affine), dwi_path)
+        b0_vol = dwi[..., 0].copy()
+        del dwi
+    print(f"Created {os.path.basename(dwi_path)}: shape={dwi_shape}")
+
+    # bvals / bvecs
+    np.savetxt(os.path.join(data_dir, "dwi.bval"), bvals.reshape(1, -1), fmt="%d")
+    print(f"Created dwi.bval: {n_volumes} values ({len(args.shells)} shell(s))")
+
+    np.savetxt(os.path.join(data_dir, "dwi.bvec"), bvecs, fmt="%.6f")
+    print(f"Created dwi.bvec: {n_volumes} directions")
+
+    # Acquisition params and index for eddy/topup
+    with open(os.path.join(data_dir, "acqparams.txt"), "w") as f:
+        f.write("0 -1 0 0.05\n")
+    print("Created acqparams.txt")
+
+    index_vals = np.ones(n_volumes, dtype=int)
+    np.savetxt(os.path.join(data_dir, "index.txt"), index_vals.reshape(1, -1), fmt="%d")
+    print("Created index.txt")
+
+    # b0 pair for topup (AP/PA)
+    if args.stream:
+        b0_pair_path = os.path.join(data_dir, "b0_pair.nii")
+        b0_pair = open_nifti_memmap(b0_pair_path, (nx, ny, nz, 2), np.float32, affine)
+        for direction in range(2):
+            b0_pair[..., direction] = make_b0_pair_volume(mask, direction)
+        b0_pair.flush()
+        del b0_pair
+    else:
+        b0_pair_path = os.path.join(data_dir, "b0_pair.nii.gz")
+        b0_pair = np.stack([make_b0_pair_volume(mask, d) for d in range(2)], axis=-1)
+        nib.save(nib.Nifti1Image(b0_pair, affine), b0_pair_path)
+    print(f"Created {os.path.basename(b0_pair_path)}: shape={(nx, ny, nz, 2)}")
+
+    with open(os.path.join(data_dir, "topup_acqparams.txt"), "w") as f:
+        f.write("0 -1 0 0.05\n0 1 0 0.05\n")
+    print("Created topup_acqparams.txt")
+
+    if args.stream and not args.no_gzip:
+        for path in (dwi_path, b0_pair_path):
+            gzip_parallel(path, path + ".gz", workers=args.gzip_workers, remove_src=True)
+            print(f"Compressed {os.path.basename(path)}.gz")
+        dwi_path += ".gz"
+
+    # FA images for TBSS (phantom FA with per-subject variation when available)
+    phantom_fa = phantom.fa() if phantom is not None else None
+    for subj_idx in range(1, args.subjects + 1):
+        if phantom_fa is None:
+            fa = rng.uniform(0.1, 0.8, (nx, ny, nz)).astype(np.float32) * mask
+        else:
+            jitter = rng.normal(1.0, 0.05, (nx, ny, nz)).astype(np.float32)
+            fa = np.clip(phantom_fa * jitter, 0.0, 1.0) * mask
+        nib.save(nib.Nifti1Image(fa, affine), os.path.join(data_dir, f"fa_sub{subj_idx:02d}.nii.gz"))
+        print(f"Created fa_sub{subj_idx:02d}.nii.gz")
+
+    # bedpostx directory: same data as above, linked rather than rewritten
+    bpx_dir = os.path.join(data_dir, "bedpostx_input")
+    os.makedirs(bpx_dir, exist_ok=True)
+    data_name = "data.nii.gz" if dwi_path.endswith(".gz") else "data.nii"
+    for src, dst in (
+        (dwi_path, data_name),
+        (os.path.join(data_dir, "mask.nii.gz"), "nodif_brain_mask.nii.gz"),
+        (os.path.join(data_dir, "dwi.bval"), "bvals"),
+        (os.path.join(data_dir, "dwi.bvec"), "bvecs"),
+    ):
+        method = link_or_copy(src, os.path.join(bpx_dir, dst))
+    print(f"Created bedpostx_input/ directory ({method}s to the top-level files)")
+
+    # MRtrix3 response functions
+    with open(os.path.join(data_dir, "wm_response.txt"), "w") as f:
+        f.write("1000 600 -200 40\n")
+    print("Created wm_response.txt")
+
+    with open(os.path.join(data_dir, "gm_response.txt"), "w") as f:
+        f.write("1000 200\n")
+    print("Created gm_response.txt")
+
+    with open(os.path.join(data_dir, "csf_response.txt"), "w") as f:
+        f.write("1000 30\n")
+    print("Created csf_response.txt")
+
+    # Parcellation atlas for tck2connectome
+    if args.parcels:
+        parcellation = parcellate(mask, args.parcels, np.random.default_rng([args.seed, 2]))
+    else:
+        parcellation = np.zeros((nx, ny, nz), dtype=np.int16)
+        parcellation[:nx // 2, :ny // 2, :] = 1
+        parcellation[nx // 2:, :ny // 2, :] = 2
+        parcellation[:nx // 2, ny // 2:, :] = 3
+        parcellation[nx // 2:, ny // 2:, :] = 4
+        parcellation *= mask.astype(np.int16)
+    nib.save(nib.Nifti1Image(parcellation, affine), os.path.join(data_dir, "parcellation.nii.gz"))
+    print(f"Created parcellation.nii.gz: {len(np.unique(parcellation)) - 1} regions")
+
+    # FreeSurfer minimal subjects_dir and license
+    fs_dir = os.path.join(data_dir, "freesurfer_subjects")
+    os.makedirs(os.path.join(fs_dir, "test_subject", "mri"), exist_ok=True)
+    nib.save(nib.Nifti1Image(mask, affine), os.path.join(fs_dir, "test_subject", "mri", "brain.mgz"))
+    with open(os.path.join(data_dir, "fs_license.txt"), "w") as f:
+        f.write("dummy@test.com\n00000\n *abcdefg\n 123456789\n")
+    print("Created freesurfer_subjects/ and fs_license.txt")
+
+    # Single b=0 volume for dmri_postreg: the DWI series' first volume (noise-free
+    # for the tensor model, with the same Rician noise as the series for the phantoms)
+    nib.save(nib.Nifti1Image(b0_vol, affine), os.path.join(data_dir, "b0.nii.gz"))
+    print("Created b0.nii.gz")
+
+    print(f"\n=== All test data generated in {data_dir} ===")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
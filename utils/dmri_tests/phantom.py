@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""Vectorized multi-compartment diffusion phantom for generate_test_data.py.
+
+The phantom lives inside the spherical brain mask and is made of:
+
+- fibre bundles: straight tubes and circular arcs (tori) with Gaussian
+  cross-sections, placed so that several of them cross near the centre;
+- partial-volume tissue maps: WM where bundles are present, CSF in two
+  lateral ventricles and a thin rim at the brain surface, GM everywhere else
+  (including a cortical band where bundles fade out). Fractions sum to one
+  inside the mask;
+- a per-voxel signal model, evaluated in voxel batches:
+
+      S = S0 * (f_csf e^{-b D_csf} + f_gm e^{-b D_gm}
+                + sum_k f_k e^{-b (D_perp + (D_par - D_perp) (g . v_k)^2)})
+
+  with D_perp = 0 for ball-and-sticks and D_perp > 0 for multi-tensor;
+- Rician noise on every voxel and volume.
+
+Only brain voxels are stored (as flat arrays), so memory scales with the
+number of brain voxels times the number of bundles, and signal evaluation is
+done ``batch_voxels`` voxels at a time so the (voxels, bundles, volumes)
+intermediate stays bounded.
+"""
+
+import numpy as np
+
+
+MODELS = ("ball-sticks", "multi-tensor")
+
+# Diffusivities in mm^2/s
+D_CSF = 3.0e-3
+D_GM = 0.8e-3
+D_PAR = 1.7e-3
+D_PERP = {"ball-sticks": 0.0, "multi-tensor": 0.3e-3}
+
+BATCH_VOXELS = 32768
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _random_unit(rng):
+    v = rng.standard_normal(3)
+    return v / np.linalg.norm(v)
+
+
+def make_bundles(n_bundles, center, radius, rng):
+    """Bundle geometry: every third bundle is an arc, the rest are lines.
+
+    The first three bundles are forced through (or around) the centre along
+    near-orthogonal axes so that the default phantom always has a region
+    with three-way crossings.
+    """
+    bundles = []
+    axes = np.eye(3)
+    for i in range(n_bundles):
+        width = max(1.0, 0.18 * radius)
+        if i < 3:
+            jitter = 0.15 * rng.standard_normal(3)
+            direction = axes[i] + jitter
+            direction /= np.linalg.norm(direction)
+            offset = np.zeros(3)
+        else:
+            direction = _random_unit(rng)
+            offset = 0.3 * radius * rng.uniform(-1, 1, 3)
+        if i % 3 == 2:
+            bundles.append({
+                "kind": "arc", "center": center + offset, "normal": direction,
+                "radius": 0.55 * radius, "width": width,
+            })
+        else:
+            bundles.append({
+                "kind": "line", "center": center + offset, "direction": direction,
+                "width": width,
+            })
+    return bundles
+
+
+def _bundle_distance_and_orientation(coords, bundle):
+    """Distance of each voxel to the bundle core and the local fibre direction."""
+    p = coords - bundle["center"]
+    if bundle["kind"] == "line":
+        u = bundle["direction"]
+        t = p @ u
+        dist2 = np.maximum(np.einsum("ij,ij->i", p, p) - t * t, 0.0)
+        orient = np.broadcast_to(u, p.shape)
+    else:
+        n = bundle["normal"]
+        h = p @ n
+        q = p - h[:, None] * n
+        q_norm = np.linalg.norm(q, axis=1)
+        dist2 = h * h + (q_norm - bundle["radius"]) ** 2
+        orient = np.cross(n, q) / np.maximum(q_norm, 1e-6)[:, None]
+    return dist2, orient
+
+
+class Phantom:
+    """Tissue fractions and fibre orientations for the voxels of ``mask``.
+
+    Attributes (M = number of brain voxels, K = number of bundles):
+        index         flat indices of brain voxels in the grid, (M,)
+        f_csf, f_gm   isotropic compartment fractions, (M,)
+        f_fibre       per-bundle stick/tensor fractions, (M, K)
+        orient        per-bundle unit fibre directions, (M, K, 3)
+    """
+
+    def __init__(self, mask, n_bundles, model, rng):
+        if model not in MODELS:
+            raise ValueError(f"Unknown phantom model: {model}")
+        self.shape = mask.shape
+        self.model = model
+        self.d_perp = D_PERP[model]
+
+        nx, ny, nz = mask.shape
+        center = np.array([nx // 2, ny // 2, nz // 2], dtype=np.float64)
+        radius = float(min(nx, ny, nz) // 3)
+        self.index = np.flatnonzero(mask)
+        coords = np.stack(np.unravel_index(self.index, mask.shape), axis=1).astype(np.float64)
+        r = np.linalg.norm(coords - center, axis=1) / radius
+
+        # CSF: two lateral ventricles plus a surface rim; GM: cortical band.
+        edge = max(0.03, 0.5 / radius)
+        ventricles = np.zeros(len(coords))
+        semi_axes = radius * np.array([0.12, 0.3, 0.15])
+        for side in (-1.0, 1.0):
+            v_center = center + np.array([side * 0.25 * radius, 0.0, 0.1 * radius])
+            rv = np.linalg.norm((coords - v_center) / semi_axes, axis=1)
+            ventricles = np.maximum(ventricles, _sigmoid((1.0 - rv) / (edge * 2)))
+        rim = _sigmoid((r - 0.95) / edge)
+        self.f_csf = np.clip(ventricles + rim, 0.0, 1.0)
+        cortex = _sigmoid((r - 0.8) / edge)
+
+        self.bundles = make_bundles(n_bundles, center, radius, rng)
+        occupancy = np.zeros((len(coords), n_bundles))
+        orient = np.zeros((len(coords), n_bundles, 3))
+        for k, bundle in enumerate(self.bundles):
+            dist2, direction = _bundle_distance_and_orientation(coords, bundle)
+            w = np.exp(-dist2 / (2 * bundle["width"] ** 2))
+            w[dist2 > (3 * bundle["width"]) ** 2] = 0.0
+            occupancy[:, k] = w
+            orient[:, k] = direction
+        occupancy *= (1.0 - cortex)[:, None]
+
+        total = occupancy.sum(axis=1)
+        wm = np.minimum(total, 1.0) * (1.0 - self.f_csf)
+        scale = np.divide(wm, total, out=np.zeros_like(wm), where=total > 0)
+        self.f_fibre = (occupancy * scale[:, None]).astype(np.float32)
+        self.f_gm = np.clip(1.0 - self.f_csf - wm, 0.0, 1.0).astype(np.float32)
+        self.f_csf = self.f_csf.astype(np.float32)
+        self.orient = orient.astype(np.float32)
+
+    @property
+    def f_wm(self):
+        return self.f_fibre.sum(axis=1)
+
+    def _to_grid(self, values, dtype=np.float32):
+        out = np.zeros(int(np.prod(self.shape)), dtype=dtype)
+        out[self.index] = values
+        return out.reshape(self.shape)
+
+    def tissue_maps(self):
+        """Return (wm, gm, csf) partial-volume maps on the full grid."""
+        return self._to_grid(self.f_wm), self._to_grid(self.f_gm), self._to_grid(self.f_csf)
+
+    def five_tissue_type(self):
+        """MRtrix3 5TT image (cGM, sGM, WM, CSF, pathological), shape grid + (5,)."""
+        wm, gm, csf = self.tissue_maps()
+        zeros = np.zeros_like(wm)
+        return np.stack([gm, zeros, wm, csf, zeros], axis=-1)
+
+    def fa(self):
+        """FA of the fraction-weighted mixture tensor in every brain voxel."""
+        d_iso = self.f_csf * D_CSF + self.f_gm * D_GM + self.f_wm * self.d_perp
+        tensors = np.einsum("mk,mki,mkj->mij", self.f_fibre * (D_PAR - self.d_perp),
+                            self.orient, self.orient)
+        tensors += d_iso[:, None, None] * np.eye(3, dtype=np.float32)
+        evals = np.linalg.eigvalsh(tensors.astype(np.float64))
+        md = evals.mean(axis=1, keepdims=True)
+        num = np.sqrt(((evals - md) ** 2).sum(axis=1))
+        den = np.sqrt((evals ** 2).sum(axis=1))
+        fa = np.sqrt(1.5) * np.divide(num, den, out=np.zeros_like(num), where=den > 0)
+        return self._to_grid(fa)
+
+    def signal(self, bvals, bvecs, s0, batch_voxels=BATCH_VOXELS):
+        """Noise-free signal for the given volumes, shape grid + (n_volumes,)."""
+        bvals = np.asarray(bvals, dtype=np.float32)
+        bvecs = np.asarray(bvecs, dtype=np.float32)
+        n_volumes = len(bvals)
+        out = np.zeros((len(self.index), n_volumes), dtype=np.float32)
+        iso_csf = np.exp(-bvals * D_CSF)
+        iso_gm = np.exp(-bvals * D_GM)
+        for start in range(0, len(self.index), batch_voxels):
+            stop = start + batch_voxels
+            cos2 = np.einsum("mki,iv->mkv", self.orient[start:stop], bvecs) ** 2
+            aniso = np.exp(-bvals * (self.d_perp + (D_PAR - self.d_perp) * cos2))
+            s = np.einsum("mk,mkv->mv", self.f_fibre[start:stop], aniso)
+            s += self.f_csf[start:stop, None] * iso_csf
+            s += self.f_gm[start:stop, None] * iso_gm
+            out[start:stop] = s
+        out *= np.float32(s0)
+
+        grid = np.zeros((n_volumes, int(np.prod(self.shape))), dtype=np.float32)
+        grid[:, self.index] = out.T
+        return np.moveaxis(grid.reshape((n_volumes,) + self.shape), 0, -1)
+
+
+def parcellate(mask, n_parcels, rng, batch_voxels=BATCH_VOXELS):
+    """Voronoi parcellation of the mask into ``n_parcels`` labelled regions (1..N)."""
+    index = np.flatnonzero(mask)
+    n_parcels = min(n_parcels, len(index))
+    coords = np.stack(np.unravel_index(index, mask.shape), axis=1).astype(np.float32)
+    seeds = coords[rng.choice(len(index), size=n_parcels, replace=False)]
+    seed_norm = (seeds ** 2).sum(axis=1)
+    labels = np.empty(len(index), dtype=np.int32)
+    for start in range(0, len(index), batch_voxels):
+        block = coords[start:start + batch_voxels]
+        # |x - s|^2 up to the per-voxel constant |x|^2
+        dist = seed_norm - 2.0 * block @ seeds.T
+        labels[start:start + batch_voxels] = dist.argmin(axis=1) + 1
+    dtype = np.int16 if n_parcels <= np.iinfo(np.int16).max else np.int32
+    parcellation = np.zeros(int(np.prod(mask.shape)), dtype=dtype)
+    parcellation[index] = labels
+    return parcellation.reshape(mask.shape)
+
+
+def add_rician_noise(signal, sigma, rng):
+    """Magnitude of the signal plus complex Gaussian noise, drawn volume by volume.
+
+    Noise for a (..., n_volumes) block is drawn as (n_volumes, 2) + grid, so
+    simulating a series in slabs consumes the generator in the same order as
+    simulating it in one go.
+    """
+    shape = signal.shape[:-1]
+    n_volumes = signal.shape[-1]
+    noise = rng.standard_normal((n_volumes, 2) + shape, dtype=np.float32)
+    noise *= np.float32(sigma)
+    real = np.moveaxis(noise[:, 0], 0, -1)
+    real += signal
+    return np.hypot(real, np.moveaxis(noise[:, 1], 0, -1))
@@ -6,6 +6,16 @@ DATA_DIR="$SCRIPT_DIR/test_data"
 
 echo "=== Setting up dMRI test data ==="
 
+# The tests read dwi.nii.gz and b0_pair.nii.gz, so keep the generator's
+# --no-gzip (or an abbreviation argparse would accept) out of this script.
+for arg in "$@"; do
+    if [[ ${#arg} -ge 4 && "--no-gzip" == "$arg"* ]]; then
+        echo "ERROR: --no-gzip is not supported here: the tests expect .nii.gz files" >&2
+        echo "       (run generate_test_data.py directly for uncompressed output)" >&2
+        exit 1
+    fi
+done
+
 # Check Python3
 if ! command -v python3 &>/dev/null; then
     echo "ERROR: python3 not found"
@@ -18,9 +28,24 @@ if ! python3 -c "import nibabel" 2>/dev/null; then
     pip3 install nibabel
 fi
 
-# Generate synthetic data
+# Generate synthetic data (extra arguments are passed to the generator,
+# e.g. --grid 128 128 80 --shells 1000 2000 --directions 64). Output is
+# deterministic for a given generator version, argument list and seed, so it
+# is served from the fixture cache when available (FIXTURE_CACHE=0 disables;
+# FIXTURE_CACHE_VERIFY=1 checks the cached files' hashes before linking them).
 mkdir -p "$DATA_DIR"
-python3 "$SCRIPT_DIR/generate_test_data.py" "$DATA_DIR"
+if [[ "${FIXTURE_CACHE:-1}" != "0" ]]; then
+    verify_args=()
+    [[ "${FIXTURE_CACHE_VERIFY:-0}" == "1" ]] && verify_args=(--verify)
+    python3 "$SCRIPT_DIR/../test_harness/fixture_cache.py" \
+        --generator "$SCRIPT_DIR/generate_test_data.py" \
+        --dest "$DATA_DIR" ${verify_args[@]+"${verify_args[@]}"} -- "$@"
+else
+    # Drop fixtures linked by a cached run first: the generator would otherwise
+    # rewrite the store's files through the hardlinks.
+    python3 "$SCRIPT_DIR/../test_harness/fixture_cache.py" --dest "$DATA_DIR" --clear
+    python3 "$SCRIPT_DIR/generate_test_data.py" "$DATA_DIR" "$@"
+fi
 
 # Convert DWI to MIF with embedded gradients (for MRtrix3 tools)
 echo ""
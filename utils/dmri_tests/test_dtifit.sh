@@ -62,11 +62,14 @@ check_file_nonempty "$OUTPUT_DIR/dti_MD.nii.gz" "MD" "$RESULTS_FILE" || PASS=fal
 
 # Step 6: Header checks
 echo "--- Header checks ---" | tee -a "$RESULTS_FILE"
-if [[ -f "$OUTPUT_DIR/dti_FA.nii.gz" ]]; then
-    check_nifti_header "$OUTPUT_DIR/dti_FA.nii.gz" "FA" "$RESULTS_FILE" || PASS=false
-fi
-if [[ -f "$OUTPUT_DIR/dti_MD.nii.gz" ]]; then
-    check_nifti_header "$OUTPUT_DIR/dti_MD.nii.gz" "MD" "$RESULTS_FILE" || PASS=false
+HEADER_FILES=()
+for metric in FA MD; do
+    if [[ -f "$OUTPUT_DIR/dti_${metric}.nii.gz" ]]; then
+        HEADER_FILES+=("$OUTPUT_DIR/dti_${metric}.nii.gz")
+    fi
+done
+if [[ ${#HEADER_FILES[@]} -gt 0 ]]; then
+    check_nifti_headers "$RESULTS_FILE" "${HEADER_FILES[@]}" || PASS=false
 fi
 
 scan_log_for_errors "$RESULTS_FILE" "$TOOL_NAME"
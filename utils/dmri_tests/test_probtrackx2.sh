@@ -70,13 +70,17 @@ check_file_exists "$OUTPUT_DIR/probtrack_out" "output_directory" "$RESULTS_FILE"
 
 # Check for key tractography output files
 if [[ -d "$OUTPUT_DIR/probtrack_out" ]]; then
+  HEADER_FILES=()
   for expected in fdt_paths.nii.gz lookup_tractspace_fdt_matrix2.nii.gz; do
     f="$OUTPUT_DIR/probtrack_out/$expected"
     if [[ -f "$f" ]]; then
       check_file_nonempty "$f" "$expected" "$RESULTS_FILE" || PASS=false
-      check_nifti_header "$f" "$expected" "$RESULTS_FILE" || true
+      HEADER_FILES+=("$f")
     fi
   done
+  if [[ ${#HEADER_FILES[@]} -gt 0 ]]; then
+    check_nifti_headers "$RESULTS_FILE" "${HEADER_FILES[@]}" || true
+  fi
 
   # Check log for errors
   if [[ -f "$RESULTS_FILE" ]]; then
@@ -50,11 +50,15 @@ check_file_exists "$OUTPUT_DIR/FA" "FA_directory" "$RESULTS_FILE" || PASS=false
 
 # Check for preprocessed FA images
 if [[ -d "$OUTPUT_DIR/FA" ]]; then
+  HEADER_FILES=()
   for fa in "$OUTPUT_DIR/FA"/*_FA.nii*; do
     [[ -f "$fa" ]] || continue
     check_file_nonempty "$fa" "$(basename "$fa")" "$RESULTS_FILE" || PASS=false
-    check_nifti_header "$fa" "$(basename "$fa")" "$RESULTS_FILE" || true
+    HEADER_FILES+=("$fa")
   done
+  if [[ ${#HEADER_FILES[@]} -gt 0 ]]; then
+    check_nifti_headers "$RESULTS_FILE" "${HEADER_FILES[@]}" || true
+  fi
 fi
 
 # Check log for errors
@@ -14,7 +14,7 @@ OUT_DIR="${SCRIPT_DIR}/out"
 LOG_DIR="${SCRIPT_DIR}/logs"
 DATA_DIR="${SCRIPT_DIR}/data"
 DERIVED_DIR="${SCRIPT_DIR}/derived"
-SUMMARY_FILE="${SCRIPT_DIR}/summary.tsv"
+SUMMARY_FILE="${CWL_TEST_SUMMARY_FILE:-${SCRIPT_DIR}/summary.tsv}"
 
 # Docker images
 FSL_IMAGE="${FSL_DOCKER_IMAGE:-brainlife/fsl:latest}"
@@ -42,6 +42,13 @@ LICENSE_FILE="${FS_LICENSE:-}"
 
 CWLTOOL_BIN="${CWLTOOL_BIN:-cwltool}"
 CWLTOOL_ARGS=()
+
+# Route cwltool runs through the resource profiler when CWL_TEST_PROFILE=1
+CWL_PROFILE_CMD=()
+if [[ "${CWL_TEST_PROFILE:-0}" == "1" ]]; then
+  CWL_PROFILE_CMD=(python3 "${ROOT_DIR}/utils/test_harness/profile_tool.py" run --)
+fi
+
 RERUN_PASSED=0
 
 for arg in "$@"; do
@@ -564,8 +571,8 @@ run_tool() {
   # Ensure valid cwd (cwltool temp dir cleanup can invalidate it)
   cd "$ROOT_DIR"
 
-  # Validate
-  if ! "$CWLTOOL_BIN" --validate "$cwl_file" >>"$log_file" 2>&1; then
+  # Validate (unchanged CWL files are skipped via the validate_cwl.py content-hash cache)
+  if ! python3 "${ROOT_DIR}/utils/test_harness/validate_cwl.py" --cwltool "$CWLTOOL_BIN" "$cwl_file" >>"$log_file" 2>&1; then
     echo "  Result: FAIL (CWL validation failed)"
     RUN_TOOL_STATUS=1
     echo -e "${name}\tFAIL" >>"$SUMMARY_FILE"
@@ -579,7 +586,7 @@ run_tool() {
   local native_out="/tmp/cwl_out_${name}"
   rm -rf "$native_out"
   mkdir -p "$native_out"
-  if "$CWLTOOL_BIN" "${CWLTOOL_ARGS[@]}" --outdir "$native_out" "$cwl_file" "$job_file" \
+  if "${CWL_PROFILE_CMD[@]}" "$CWLTOOL_BIN" "${CWLTOOL_ARGS[@]}" --outdir "$native_out" "$cwl_file" "$job_file" \
       >"$out_json" 2>"$log_file"; then
     cp -a "$native_out"/. "$tool_out_dir"/ 2>/dev/null || true
     if verify_outputs "$out_json" >>"$log_file" 2>&1; then
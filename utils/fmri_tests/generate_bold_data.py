@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""Generate a synthetic 4D BOLD run with known ground truth for fMRI CWL tests.
+
+The run is a spherical brain with a smooth baseline image, task activation in
+Gaussian blobs, AR(1) temporal noise and small head motion:
+
+    S(x, t) = S0(x) * (1 + sum_c beta_c(x) X_c(t) / 100)
+              - grad S0(x) . d(x, t) + e(x, t)
+
+- X_c: the event/block design for condition c convolved with a canonical
+  double-gamma HRF. The boxcars are built on a fine time grid (TR/16) and
+  convolved for all conditions at once with a single FFT.
+- beta_c: percent signal change maps (written as beta_truth.nii.gz, with
+  the blobs labelled in roi.nii.gz).
+- d: rigid-body displacement from a mean-reverting random-walk motion trace
+  (written in mcflirt .par format), applied to first order through the
+  baseline image gradient.
+- e: AR(1) noise, e_t = phi e_{t-1} + sqrt(1 - phi^2) sigma z_t, with sigma
+  set by --tsnr.
+
+Volumes are simulated --chunk-volumes at a time into a memory-mapped .nii (the
+AR state is carried across chunks, and noise is drawn volume by volume, so the
+output does not depend on the chunk size), then gzipped in parallel. Peak
+memory is a few chunks, so long runs (1000+ volumes) are fine.
+
+    python3 generate_bold_data.py synthetic
+    python3 generate_bold_data.py synthetic --grid 64 64 40 --volumes 1200 --tr 0.8 \\
+        --design event --conditions 3 --seed 7
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+
+import numpy as np
+
+try:
+    import nibabel as nib
+except ImportError:
+    print("ERROR: nibabel required. Install with: pip3 install nibabel")
+    sys.exit(1)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "test_harness"))
+from nifti_stream import gzip_parallel, open_nifti_memmap  # noqa: E402
+
+
+BASELINE_SIGNAL = 1000.0
+HRF_OVERSAMPLE = 16
+HRF_LENGTH = 32.0  # seconds
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic 4D BOLD run with known ground truth."
+    )
+    parser.add_argument("data_dir", help="Output directory for the generated data.")
+    parser.add_argument(
+        "--grid", type=int, nargs=3, default=[32, 32, 16], metavar=("NX", "NY", "NZ"),
+        help="Image grid size (default: 32 32 16).",
+    )
+    parser.add_argument(
+        "--voxel-size", type=float, default=3.0,
+        help="Isotropic voxel size in mm (default: 3.0).",
+    )
+    parser.add_argument(
+        "--tr", type=float, default=2.0,
+        help="Repetition time in seconds (default: 2.0).",
+    )
+    parser.add_argument(
+        "--volumes", type=int, default=120,
+        help="Number of volumes (default: 120).",
+    )
+    parser.add_argument(
+        "--design", choices=("block", "event"), default="block",
+        help="Block design (alternating task blocks and rest) or randomized events (default: block).",
+    )
+    parser.add_argument(
+        "--conditions", type=int, default=2,
+        help="Number of task conditions (default: 2).",
+    )
+    parser.add_argument(
+        "--block-duration", type=float, default=20.0,
+        help="Task block and rest block length in seconds for --design block (default: 20).",
+    )
+    parser.add_argument(
+        "--event-duration", type=float, default=1.0,
+        help="Event length in seconds for --design event (default: 1).",
+    )
+    parser.add_argument(
+        "--isi", type=float, default=6.0,
+        help="Mean onset-to-onset interval in seconds for --design event, jittered "
+             "uniformly by +/-50%% (default: 6).",
+    )
+    parser.add_argument(
+        "--psc", type=float, default=3.0,
+        help="Peak activation in percent signal change (default: 3).",
+    )
+    parser.add_argument(
+        "--blobs", type=int, default=2,
+        help="Activation blobs per condition (default: 2).",
+    )
+    parser.add_argument(
+        "--tsnr", type=float, default=100.0,
+        help="Temporal SNR: mean baseline signal over noise sigma (default: 100).",
+    )
+    parser.add_argument(
+        "--ar", type=float, default=0.3,
+        help="AR(1) coefficient of the temporal noise (default: 0.3).",
+    )
+    parser.add_argument(
+        "--motion", type=float, default=0.05,
+        help="Per-volume step of the mean-reverting motion trace, in mm and (divided by "
+             "50 mm) radians; 0 disables motion (default: 0.05).",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0,
+        help="Random seed; identical arguments and seed give identical data (default: 0).",
+    )
+    parser.add_argument(
+        "--chunk-volumes", type=int, default=64,
+        help="Volumes simulated and written per chunk (default: 64).",
+    )
+    parser.add_argument(
+        "--no-gzip", action="store_true",
+        help="Keep an uncompressed bold.nii instead of gzipping it.",
+    )
+    parser.add_argument(
+        "--gzip-workers", type=int, default=None,
+        help="Threads for parallel gzip (default: CPU count).",
+    )
+    args = parser.parse_args(argv)
+    if min(args.grid) < 4:
+        parser.error("--grid dimensions must be at least 4")
+    if args.tr <= 0:
+        parser.error("--tr must be positive")
+    if args.volumes < 2:
+        parser.error("--volumes must be at least 2")
+    if args.conditions < 1:
+        parser.error("--conditions must be at least 1")
+    if args.block_duration <= 0 or args.event_duration <= 0 or args.isi <= 0:
+        parser.error("--block-duration, --event-duration and --isi must be positive")
+    if args.blobs < 1:
+        parser.error("--blobs must be at least 1")
+    if args.tsnr <= 0:
+        parser.error("--tsnr must be positive")
+    if not 0 <= args.ar < 1:
+        parser.error("--ar must be in [0, 1)")
+    if args.motion < 0:
+        parser.error("--motion must not be negative")
+    if args.chunk_volumes < 1:
+        parser.error("--chunk-volumes must be at least 1")
+    return args
+
+
+def make_affine(voxel_size):
+    affine = np.eye(4) * voxel_size
+    affine[3, 3] = 1.0
+    return affine
+
+
+def make_sphere_mask(shape):
+    """Binary brain mask: a sphere centred in the grid."""
+    nx, ny, nz = shape
+    x, y, z = np.ogrid[0:nx, 0:ny, 0:nz]
+    cx, cy, cz = nx // 2, ny // 2, nz // 2
+    radius = min(nx, ny, nz) // 3
+    mask = ((x - cx) ** 2 + (y - cy) ** 2 + (z - cz) ** 2) <= radius ** 2
+    return mask.astype(np.uint8)
+
+
+def make_baseline(shape):
+    """Smooth baseline image: brighter centre, rolling off over ~2 voxels at the mask edge.
+
+    The soft edge keeps the image gradient (and so the motion artefact) bounded.
+    """
+    nx, ny, nz = shape
+    x, y, z = np.ogrid[0:nx, 0:ny, 0:nz]
+    radius = max(min(nx, ny, nz) // 3, 1)
+    r2 = ((x - nx // 2) ** 2 + (y - ny // 2) ** 2 + (z - nz // 2) ** 2) / radius ** 2
+    edge = 1.0 / (1.0 + np.exp((np.sqrt(r2) - 1.0) * radius / 0.7))
+    s0 = BASELINE_SIGNAL * (0.7 + 0.5 * np.exp(-r2)) * edge
+    return s0.astype(np.float32)
+
+
+def make_events(args, rng):
+    """Event table as a list of (onset, duration, trial_type) within the run."""
+    run_length = args.volumes * args.tr
+    names = [f"cond{c + 1}" for c in range(args.conditions)]
+    events = []
+    if args.design == "block":
+        # rest, cond1, rest, cond2, ... repeated
+        t = args.block_duration
+        c = 0
+        while t < run_length:
+            events.append((t, args.block_duration, names[c % args.conditions]))
+            t += 2 * args.block_duration
+            c += 1
+    else:
+        t = args.isi * rng.uniform(0.5, 1.5)
+        onsets = []
+        while t + args.event_duration < run_length:
+            onsets.append(t)
+            t += args.isi * rng.uniform(0.5, 1.5)
+        # Balanced, shuffled condition order
+        order = np.resize(np.arange(args.conditions), len(onsets))
+        rng.shuffle(order)
+        events = [(t, args.event_duration, names[c]) for t, c in zip(onsets, order)]
+    return names, events
+
+
+def double_gamma_hrf(dt, length=HRF_LENGTH):
+    """Canonical (SPM-style) double-gamma HRF sampled every dt seconds, unit area."""
+    t = np.arange(0.0, length, dt)
+    peak = t ** 5 * np.exp(-t) / math.gamma(6)
+    undershoot = t ** 15 * np.exp(-t) / math.gamma(16)
+    hrf = peak - undershoot / 6.0
+    return hrf / hrf.sum()
+
+
+def fft_convolve(signals, kernel):
+    """Causal linear convolution of each row of ``signals`` with ``kernel`` via one FFT."""
+    n = signals.shape[-1]
+    n_fft = 1 << (n + len(kernel) - 2).bit_length()
+    spectrum = np.fft.rfft(signals, n_fft, axis=-1) * np.fft.rfft(kernel, n_fft)
+    return np.fft.irfft(spectrum, n_fft, axis=-1)[..., :n]
+
+
+def design_matrix(names, events, n_volumes, tr):
+    """HRF-convolved regressors sampled at each volume, shape (n_volumes, n_conditions)."""
+    dt = tr / HRF_OVERSAMPLE
+    n_fine = n_volumes * HRF_OVERSAMPLE
+    boxcars = np.zeros((len(names), n_fine))
+    for onset, duration, trial_type in events:
+        start = int(round(onset / dt))
+        stop = max(start + 1, int(round((onset + duration) / dt)))
+        boxcars[names.index(trial_type), start:stop] = 1.0
+    regressors = fft_convolve(boxcars, double_gamma_hrf(dt))
+    return regressors[:, ::HRF_OVERSAMPLE].T.astype(np.float32)
+
+
+def make_activation(mask, n_conditions, n_blobs, psc, rng):
+    """Per-condition activation maps (percent signal change) and blob labels.
+
+    Returns (beta grid + (n_conditions,), roi int16 grid with blobs numbered 1..N).
+    """
+    index = np.flatnonzero(mask)
+    coords = np.stack(np.unravel_index(index, mask.shape), axis=1).astype(np.float64)
+    radius = max(min(mask.shape) // 3, 1)
+    sigma = max(0.15 * radius, 1.0)
+    beta = np.zeros(mask.shape + (n_conditions,), dtype=np.float32)
+    roi = np.zeros(mask.shape, dtype=np.int16)
+    label = 0
+    for c in range(n_conditions):
+        centres = coords[rng.choice(len(coords), size=min(n_blobs, len(coords)), replace=False)]
+        for centre in centres:
+            label += 1
+            d2 = ((coords - centre) ** 2).sum(axis=1)
+            weight = np.exp(-d2 / (2 * sigma ** 2))
+            weight[d2 > (2 * sigma) ** 2] = 0.0
+            blob = np.zeros(int(np.prod(mask.shape)), dtype=np.float32)
+            blob[index] = psc * weight
+            beta[..., c] = np.maximum(beta[..., c], blob.reshape(mask.shape))
+            roi.reshape(-1)[index[d2 <= sigma ** 2]] = label
+    return beta, roi
+
+
+def motion_trace(n_volumes, step, rng, persistence=0.95):
+    """Rigid-body motion in mcflirt .par order: rx ry rz (rad) tx ty tz (mm).
+
+    A mean-reverting random walk, p_t = persistence * p_{t-1} + step * z_t,
+    so slow drifts stay bounded (stationary sd ~3 steps) over long runs.
+    """
+    steps = rng.standard_normal((n_volumes, 6))
+    steps[0] = 0.0
+    steps[:, :3] *= step / 50.0  # ~step mm of displacement at 50 mm from the centre
+    steps[:, 3:] *= step
+    trace = np.empty_like(steps)
+    trace[0] = steps[0]
+    for t in range(1, n_volumes):
+        trace[t] = persistence * trace[t - 1] + steps[t]
+    return trace
+
+
+class BoldSimulator:
+    """Simulates consecutive chunks of the BOLD series, carrying the AR(1) state."""
+
+    def __init__(self, s0, mask, beta, regressors, motion, voxel_size, sigma, phi, rng):
+        self.s0 = s0
+        self.mask = mask.astype(np.float32)
+        self.beta = beta
+        self.regressors = regressors
+        self.motion = motion
+        self.sigma = np.float32(sigma)
+        self.phi = np.float32(phi)
+        self.innovation = np.float32(math.sqrt(1.0 - phi * phi))
+        self.rng = rng
+        self.state = None
+
+        # Baseline gradient per voxel of displacement, and voxel positions (mm) from the centre
+        self.gradient = [g.astype(np.float32) for g in np.gradient(s0)]
+        nx, ny, nz = s0.shape
+        self.pos = [
+            ((np.arange(n) - n // 2) * voxel_size).astype(np.float32).reshape(shape)
+            for n, shape in ((nx, (-1, 1, 1)), (ny, (1, -1, 1)), (nz, (1, 1, -1)))
+        ]
+        self.voxel_size = np.float32(voxel_size)
+
+    def chunk(self, start, stop):
+        """Volumes start..stop-1 as an array of shape grid + (stop - start,)."""
+        n = stop - start
+        # Task signal: S0 * (1 + beta . X(t) / 100)
+        task = np.einsum("xyzc,tc->txyz", self.beta, self.regressors[start:stop])
+        data = self.s0 * (1.0 + task / np.float32(100.0))
+
+        # First-order motion: S(x - d) ~ S(x) - grad S . d, with d = t + r x p (in voxels)
+        if self.motion is not None:
+            px, py, pz = self.pos
+            gx, gy, gz = self.gradient
+            for i, (rx, ry, rz, tx, ty, tz) in enumerate(self.motion[start:stop].astype(np.float32)):
+                dx = (tx + ry * pz - rz * py) / self.voxel_size
+                dy = (ty + rz * px - rx * pz) / self.voxel_size
+                dz = (tz + rx * py - ry * px) / self.voxel_size
+                data[i] -= gx * dx + gy * dy + gz * dz
+
+        # AR(1) noise, drawn volume by volume
+        z = self.rng.standard_normal((n,) + self.s0.shape, dtype=np.float32)
+        z *= self.sigma
+        for i in range(n):
+            if self.state is None:
+                self.state = z[i]
+            else:
+                self.state = self.phi * self.state + self.innovation * z[i]
+            data[i] += self.state
+
+        data *= self.mask
+        return np.moveaxis(data, 0, -1)
+
+
+def write_events_tsv(path, events):
+    with open(path, "w") as f:
+        f.write("onset\tduration\ttrial_type\n")
+        for onset, duration, trial_type in events:
+            f.write(f"{onset:.3f}\t{duration:.3f}\t{trial_type}\n")
+
+
+def main(argv):
+    args = parse_args(argv)
+    data_dir = args.data_dir
+    os.makedirs(data_dir, exist_ok=True)
+    # Independent streams so that, e.g., changing the design leaves the noise unchanged
+    rng = np.random.default_rng(args.seed)
+    design_rng = np.random.default_rng([args.seed, 1])
+    activation_rng = np.random.default_rng([args.seed, 2])
+    motion_rng = np.random.default_rng([args.seed, 3])
+
+    nx, ny, nz = args.grid
+    affine = make_affine(args.voxel_size)
+    n_volumes = args.volumes
+
+    mask = make_sphere_mask((nx, ny, nz))
+    nib.save(nib.Nifti1Image(mask, affine), os.path.join(data_dir, "mask.nii.gz"))
+    print(f"Created mask.nii.gz: shape={mask.shape}")
+
+    s0 = make_baseline(mask.shape)
+    nib.save(nib.Nifti1Image(s0 * mask, affine), os.path.join(data_dir, "bold_mean.nii.gz"))
+    print("Created bold_mean.nii.gz (noise-free baseline)")
+
+    # Task design
+    names, events = make_events(args, design_rng)
+    write_events_tsv(os.path.join(data_dir, "events.tsv"), events)
+    print(f"Created events.tsv: {len(events)} {args.design} events, {len(names)} conditions")
+
+    regressors = design_matrix(names, events, n_volumes, args.tr)
+    np.savetxt(os.path.join(data_dir, "regressors.1D"), regressors, fmt="%.6f",
+               header=" ".join(names))
+    frame_times = np.arange(n_volumes) * args.tr
+    for c, name in enumerate(names):
+        onsets = [e[0] for e in events if e[2] == name]
+        with open(os.path.join(data_dir, f"stim_times_{name}.1D"), "w") as f:
+            f.write((" ".join(f"{t:.3f}" for t in onsets) or "*") + "\n")
+        # 0/1 per volume: condition active at the start of the volume
+        active = np.zeros(n_volumes, dtype=int)
+        for onset, duration, trial_type in events:
+            if trial_type == name:
+                active[(frame_times >= onset) & (frame_times < onset + duration)] = 1
+        np.savetxt(os.path.join(data_dir, f"stim_{name}.1D"), active, fmt="%d")
+    print(f"Created regressors.1D and stim_/stim_times_<condition>.1D for {', '.join(names)}")
+
+    beta, roi = make_activation(mask, len(names), args.blobs, args.psc, activation_rng)
+    nib.save(nib.Nifti1Image(beta, affine), os.path.join(data_dir, "beta_truth.nii.gz"))
+    nib.save(nib.Nifti1Image(roi, affine), os.path.join(data_dir, "roi.nii.gz"))
+    print(f"Created beta_truth.nii.gz and roi.nii.gz: {int(roi.max())} activation blobs")
+
+    motion = None
+    if args.motion > 0:
+        motion = motion_trace(n_volumes, args.motion, motion_rng)
+        np.savetxt(os.path.join(data_dir, "motion.par"), motion, fmt="%.6f")
+        print(f"Created motion.par: max translation "
+              f"{np.abs(motion[:, 3:]).max():.2f} mm")
+
+    # BOLD series, chunk by chunk into a memory-mapped .nii
+    sigma = float(s0[mask > 0].mean()) / args.tsnr
+    simulator = BoldSimulator(s0, mask, beta, regressors, motion, args.voxel_size,
+                              sigma, args.ar, rng)
+    bold_path = os.path.join(data_dir, "bold.nii")
+    img = open_nifti_memmap(bold_path, (nx, ny, nz, n_volumes), np.float32, affine,
+                            zooms=(args.voxel_size,) * 3 + (args.tr,))
+    for start in range(0, n_volumes, args.chunk_volumes):
+        stop = min(start + args.chunk_volumes, n_volumes)
+        img[..., start:stop] = simulator.chunk(start, stop)
+    img.flush()
+    del img
+    if not args.no_gzip:
+        gzip_parallel(bold_path, bold_path + ".gz", workers=args.gzip_workers, remove_src=True)
+        bold_path += ".gz"
+    print(f"Created {os.path.basename(bold_path)}: shape={(nx, ny, nz, n_volumes)}, "
+          f"TR={args.tr}s")
+
+    with open(os.path.join(data_dir, "bold.json"), "w") as f:
+        json.dump({
+            "RepetitionTime": args.tr,
+            "TaskName": args.design,
+            "SliceTiming": [round(k * args.tr / nz, 6) for k in range(nz)],
+            "Conditions": names,
+            "PercentSignalChange": args.psc,
+            "TemporalSNR": args.tsnr,
+            "AR1": args.ar,
+            "Seed": args.seed,
+        }, f, indent=2)
+        f.write("\n")
+    print("Created bold.json")
+
+    print(f"\n=== Synthetic BOLD data generated in {data_dir} ===")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""Content-addressed cache for synthetic test fixtures.
+
+Wraps a seeded data generator whose first positional argument is its output
+directory (e.g. dmri_tests/generate_test_data.py). The cache key is a SHA-256
+over the generator source, the local modules it imports (followed recursively
+through the generator's directory and test_harness/), any --key-file, the
+generator arguments, and the numpy/nibabel versions. On a hit, the stored
+files are hardlinked into --dest and generation is skipped entirely; on a
+miss, the generator runs once into a staging directory in the store, which is
+renamed into place unless another process published the same key first.
+
+Stored files are made read-only, which stops ordinary writes through a
+hardlinked fixture but not root (e.g. tools run in Docker containers). The
+manifest records each file's SHA-256; --verify checks them before linking
+and regenerates an entry whose files were modified.
+
+The manifest is also copied into --dest, so the files linked there can be
+removed again: before linking (dropping files from a previous argument set)
+and with --clear, before a generator writes into --dest directly, which
+would otherwise overwrite the store's copies through the hardlinks.
+
+Usage:
+    python3 fixture_cache.py --generator ../dmri_tests/generate_test_data.py \\
+        --dest ../dmri_tests/test_data -- --grid 64 64 32 --seed 3
+    python3 fixture_cache.py --dest ../dmri_tests/test_data --clear
+
+Store location: --store, else $NIBUILD_FIXTURE_CACHE, else ~/.cache/nibuild/fixtures.
+"""
+
+import argparse
+import ast
+import datetime as dt
+import hashlib
+import json
+import os
+import shutil
+import stat
+import subprocess
+import sys
+import time
+
+
+CACHE_FORMAT = 2
+MANIFEST_NAME = ".fixture_manifest.json"
+VERSIONED_PACKAGES = ("numpy", "nibabel")
+
+
+def default_store():
+    env = os.environ.get("NIBUILD_FIXTURE_CACHE")
+    if env:
+        return env
+    return os.path.join(os.path.expanduser("~"), ".cache", "nibuild", "fixtures")
+
+
+def _package_version(name):
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:  # Python < 3.8
+        return None
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return None
+
+
+def _imported_modules(path):
+    """Top-level module names imported anywhere in a Python source file."""
+    with open(path, "rb") as fh:
+        tree = ast.parse(fh.read(), filename=path)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module.split(".")[0])
+    return names
+
+
+def _key_sources(generator, key_files):
+    """Generator plus the local modules it imports (recursively), plus explicit extra files.
+
+    Imports are resolved against the generator's directory and this directory,
+    which generators put on sys.path for the shared helpers; anything else
+    (numpy, nibabel, the standard library) is covered by the package versions.
+    """
+    generator = os.path.abspath(generator)
+    search_dirs = [os.path.dirname(generator), os.path.dirname(os.path.abspath(__file__))]
+    sources = set()
+    pending = [generator]
+    while pending:
+        path = pending.pop()
+        if path in sources:
+            continue
+        sources.add(path)
+        for name in _imported_modules(path):
+            for directory in search_dirs:
+                candidate = os.path.join(directory, name + ".py")
+                if os.path.isfile(candidate):
+                    pending.append(candidate)
+                    break
+    sources.update(os.path.abspath(path) for path in key_files)
+    return sorted(sources)
+
+
+def fixture_key(generator, generator_args, key_files=()):
+    """Return (hex key, description dict) for a generator invocation."""
+    digest = hashlib.sha256()
+    sources = _key_sources(generator, key_files)
+    for path in sources:
+        digest.update(os.path.basename(path).encode())
+        with open(path, "rb") as fh:
+            digest.update(hashlib.sha256(fh.read()).digest())
+    description = {
+        "format": CACHE_FORMAT,
+        "generator": os.path.basename(generator),
+        "args": list(generator_args),
+        "packages": {name: _package_version(name) for name in VERSIONED_PACKAGES},
+        "python": "{}.{}".format(*sys.version_info[:2]),
+    }
+    digest.update(json.dumps(description, sort_keys=True).encode())
+    return digest.hexdigest()[:32], description
+
+
+def _walk_files(root):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if dirpath == root and name == MANIFEST_NAME:
+                continue
+            path = os.path.join(dirpath, name)
+            yield os.path.relpath(path, root), path
+
+
+def _sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _entry_is_valid(entry_dir, verify=False):
+    """Manifest present and every file there at its recorded size (and hash with verify)."""
+    manifest_path = os.path.join(entry_dir, MANIFEST_NAME)
+    if not os.path.isfile(manifest_path):
+        return False
+    try:
+        with open(manifest_path) as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        return False
+    hashes = manifest.get("sha256", {})
+    for rel, size in manifest.get("files", {}).items():
+        path = os.path.join(entry_dir, rel)
+        if not os.path.lexists(path):
+            return False
+        if os.path.islink(path):
+            continue
+        if os.path.getsize(path) != size:
+            return False
+        if verify and _sha256_file(path) != hashes.get(rel):
+            print(f"WARNING: cached fixture modified: {rel}", file=sys.stderr)
+            return False
+    return True
+
+
+def _retire(store, entry_dir):
+    """Rename an entry out of the way so its key can be republished, then delete it.
+
+    Files already hardlinked from it stay intact; only its directory entries go.
+    """
+    retired = os.path.join(store, f".{os.path.basename(entry_dir)}.{os.getpid()}.old")
+    try:
+        os.replace(entry_dir, retired)
+    except FileNotFoundError:
+        return
+    shutil.rmtree(retired, ignore_errors=True)
+
+
+def populate(store, key, description, generator, generator_args, replace=False):
+    """Run the generator into a private staging dir and publish it atomically.
+
+    A valid entry published by another process in the meantime is left alone
+    (and returned) unless ``replace`` is set, e.g. for --refresh or an entry
+    that failed verification.
+    """
+    os.makedirs(store, exist_ok=True)
+    entry_dir = os.path.join(store, key)
+    staging = os.path.join(store, f".{key}.{os.getpid()}.tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+
+    started = time.perf_counter()
+    cmd = [sys.executable, generator, staging] + list(generator_args)
+    subprocess.run(cmd, check=True)
+    elapsed = time.perf_counter() - started
+
+    files = {}
+    hashes = {}
+    for rel, path in _walk_files(staging):
+        if os.path.islink(path):
+            files[rel] = 0
+            continue
+        files[rel] = os.path.getsize(path)
+        hashes[rel] = _sha256_file(path)
+        mode = os.stat(path).st_mode
+        os.chmod(path, mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+
+    manifest = dict(description)
+    manifest.update({
+        "key": key,
+        "createdAt": dt.datetime.now(dt.timezone.utc).replace(microsecond=0).isoformat(),
+        "generationSeconds": round(elapsed, 3),
+        "files": files,
+        "sha256": hashes,
+    })
+    with open(os.path.join(staging, MANIFEST_NAME), "w") as fh:
+        json.dump(manifest, fh, indent=2)
+        fh.write("\n")
+
+    if os.path.isdir(entry_dir) and (replace or not _entry_is_valid(entry_dir)):
+        _retire(store, entry_dir)
+    try:
+        # Fails if another process published the same key since; keep theirs
+        os.replace(staging, entry_dir)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+        if not _entry_is_valid(entry_dir):
+            raise
+    return entry_dir
+
+
+def _store_inodes(store):
+    inodes = set()
+    for dirpath, _, filenames in os.walk(store):
+        for name in filenames:
+            try:
+                st = os.lstat(os.path.join(dirpath, name))
+            except OSError:
+                continue
+            inodes.add((st.st_dev, st.st_ino))
+    return inodes
+
+
+def clear(dest, store):
+    """Remove the fixtures materialize() placed in dest; returns how many were removed.
+
+    The files are those listed in dest's copy of the entry manifest. A dest
+    without one (linked by an older version) loses every file that is a
+    hardlink into the store. Directories left empty are removed too.
+    """
+    manifest_path = os.path.join(dest, MANIFEST_NAME)
+    dest = os.path.abspath(dest)
+    if os.path.isfile(manifest_path):
+        try:
+            with open(manifest_path) as fh:
+                listed = list(json.load(fh).get("files", {}))
+        except (OSError, ValueError):
+            listed = []
+        paths = [os.path.normpath(os.path.join(dest, rel)) for rel in listed]
+        paths = [path for path in paths if path.startswith(dest + os.sep)]
+    elif os.path.isdir(dest) and os.path.isdir(store):
+        inodes = _store_inodes(store)
+        paths = []
+        for _, path in _walk_files(dest):
+            st = os.lstat(path)
+            if st.st_nlink > 1 and (st.st_dev, st.st_ino) in inodes:
+                paths.append(path)
+    else:
+        paths = []
+
+    removed = 0
+    for path in paths:
+        if os.path.islink(path) or os.path.isfile(path):
+            os.remove(path)
+            removed += 1
+        parent = os.path.dirname(path)
+        while parent != dest and parent.startswith(dest) and not os.listdir(parent):
+            os.rmdir(parent)
+            parent = os.path.dirname(parent)
+    if os.path.isfile(manifest_path):
+        os.remove(manifest_path)
+    return removed
+
+
+def materialize(entry_dir, dest, copy=False):
+    """Hardlink (or copy) every cached file into dest, preserving relative symlinks.
+
+    The entry's manifest is copied alongside so clear() can find the files later.
+    """
+    linked = 0
+    copied = 0
+    for rel, src in _walk_files(entry_dir):
+        dst = os.path.join(dest, rel)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        if os.path.lexists(dst):
+            if os.path.isdir(dst) and not os.path.islink(dst):
+                shutil.rmtree(dst)
+            else:
+                os.remove(dst)
+        if os.path.islink(src):
+            os.symlink(os.readlink(src), dst)
+            continue
+        if not copy:
+            try:
+                os.link(src, dst)
+                linked += 1
+                continue
+            except OSError:
+                pass
+        shutil.copy2(src, dst)
+        os.chmod(dst, os.stat(dst).st_mode | stat.S_IWUSR)
+        copied += 1
+    shutil.copyfile(os.path.join(entry_dir, MANIFEST_NAME), os.path.join(dest, MANIFEST_NAME))
+    return linked, copied
+
+
+def parse_args(argv):
+    if "--" in argv:
+        split = argv.index("--")
+        own, generator_args = argv[:split], argv[split + 1:]
+    else:
+        own, generator_args = argv, []
+    parser = argparse.ArgumentParser(
+        description="Reuse synthetic fixtures keyed by a hash of the generator, its arguments and seed.",
+        usage="%(prog)s --generator SCRIPT --dest DIR [options] [-- generator args...]\n       %(prog)s --dest DIR --clear",
+    )
+    parser.add_argument("--generator", default=None, help="Generator script (output dir is its first argument).")
+    parser.add_argument("--dest", required=True, help="Directory the fixtures should appear in.")
+    parser.add_argument("--store", default=None, help="Cache store (default: $NIBUILD_FIXTURE_CACHE or ~/.cache/nibuild/fixtures).")
+    parser.add_argument(
+        "--key-file", action="append", default=[],
+        help="Extra file whose contents should invalidate the cache when changed (repeatable).",
+    )
+    parser.add_argument("--refresh", action="store_true", help="Regenerate even if a cached entry exists.")
+    parser.add_argument("--copy", action="store_true", help="Copy instead of hardlinking into --dest.")
+    parser.add_argument(
+        "--verify", action="store_true",
+        help="Check cached files against their recorded SHA-256 and regenerate a modified entry.",
+    )
+    parser.add_argument("--print-key", action="store_true", help="Print the cache key and exit.")
+    parser.add_argument(
+        "--clear", action="store_true",
+        help="Remove the fixtures previously linked into --dest and exit (run before generating into --dest directly).",
+    )
+    args = parser.parse_args(own)
+    if not args.generator and not args.clear:
+        parser.error("--generator is required unless --clear is given")
+    args.generator_args = generator_args
+    return args
+
+
+def main(argv):
+    args = parse_args(argv)
+    store = os.path.abspath(args.store or default_store())
+    if args.clear:
+        removed = clear(args.dest, store)
+        print(f"Removed {removed} cached fixture(s) from {args.dest}")
+        return 0
+
+    generator = os.path.abspath(args.generator)
+    if not os.path.isfile(generator):
+        print(f"ERROR: generator not found: {generator}", file=sys.stderr)
+        return 1
+
+    key, description = fixture_key(generator, args.generator_args, args.key_file)
+    if args.print_key:
+        print(key)
+        return 0
+
+    entry_dir = os.path.join(store, key)
+    exists = os.path.isdir(entry_dir)
+    if not args.refresh and _entry_is_valid(entry_dir, verify=args.verify):
+        print(f"Fixture cache hit: {key} ({entry_dir})")
+    else:
+        print(f"Fixture cache miss: {key}; running {os.path.basename(generator)}")
+        try:
+            entry_dir = populate(store, key, description, generator, args.generator_args,
+                                 replace=exists)
+        except subprocess.CalledProcessError as exc:
+            print(f"ERROR: generator failed with exit code {exc.returncode}", file=sys.stderr)
+            return exc.returncode or 1
+
+    os.makedirs(args.dest, exist_ok=True)
+    clear(args.dest, store)  # files from a previous argument set
+    try:
+        linked, copied = materialize(entry_dir, args.dest, copy=args.copy)
+    except FileNotFoundError:
+        # The entry was republished (--refresh elsewhere) while linking; link the new one
+        if not _entry_is_valid(entry_dir):
+            raise
+        linked, copied = materialize(entry_dir, args.dest, copy=args.copy)
+    print(f"Materialized fixtures in {args.dest}: {linked} linked, {copied} copied")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""Header-only NIfTI-1/NIfTI-2 checker for the test suites' output validation.
+
+Replaces one ``python3 -c "import nibabel; nib.load(...)"`` per checked file
+with a single process that checks every file given on the command line:
+
+    python3 nifti_check.py out/dti_FA.nii.gz out/dti_MD.nii.gz
+    python3 nifti_check.py --stats --expect-dtype float32 --expect-ndim 3 out/
+    python3 nifti_check.py --root outputs '**/*_brain.nii.gz'
+
+Only the header is decompressed: 348 bytes for NIfTI-1 (the 352-byte
+vox_offset minus the 4-byte extension flag), 540 for NIfTI-2. The header is
+parsed with ``struct``, so nibabel is not imported at all. With --stats the
+voxel data is scanned in fixed-size chunks (memory-mapped for .nii, streamed
+for .nii.gz) to report min/max/mean, the non-zero fraction and NaN count;
+that path needs numpy but still not nibabel.
+
+Arguments may be files, directories (searched recursively for .nii/.nii.gz)
+or glob patterns (relative to --root). Exit status is 1 if any file fails.
+"""
+
+import argparse
+import glob
+import gzip
+import os
+import struct
+import sys
+
+
+NIFTI1_HEADER_BYTES = 348
+NIFTI2_HEADER_BYTES = 540
+STATS_CHUNK_BYTES = 16 * 1024 * 1024
+
+# datatype code -> (name, bytes per voxel, numpy dtype string or None)
+DATATYPES = {
+    2: ("uint8", 1, "u1"),
+    4: ("int16", 2, "i2"),
+    8: ("int32", 4, "i4"),
+    16: ("float32", 4, "f4"),
+    32: ("complex64", 8, "c8"),
+    64: ("float64", 8, "f8"),
+    128: ("rgb24", 3, None),
+    256: ("int8", 1, "i1"),
+    512: ("uint16", 2, "u2"),
+    768: ("uint32", 4, "u4"),
+    1024: ("int64", 8, "i8"),
+    1280: ("uint64", 8, "u8"),
+    1536: ("float128", 16, None),
+    1792: ("complex128", 16, "c16"),
+    2304: ("rgba32", 4, None),
+}
+
+
+class NiftiHeaderError(Exception):
+    """The file is not a readable NIfTI-1/NIfTI-2 image."""
+
+
+def _open(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def _read_exact(fh, n_bytes):
+    data = fh.read(n_bytes)
+    if len(data) < n_bytes:
+        raise NiftiHeaderError(f"truncated header ({len(data)} of {n_bytes} bytes)")
+    return data
+
+
+def read_header(path):
+    """Parse the NIfTI header of ``path`` and return a plain dict."""
+    try:
+        with _open(path) as fh:
+            raw = _read_exact(fh, NIFTI1_HEADER_BYTES)
+            for endian in ("<", ">"):
+                sizeof_hdr = struct.unpack_from(endian + "i", raw, 0)[0]
+                if sizeof_hdr in (NIFTI1_HEADER_BYTES, NIFTI2_HEADER_BYTES):
+                    break
+            else:
+                raise NiftiHeaderError(f"not a NIfTI file (sizeof_hdr={sizeof_hdr})")
+            if sizeof_hdr == NIFTI2_HEADER_BYTES:
+                raw += _read_exact(fh, NIFTI2_HEADER_BYTES - NIFTI1_HEADER_BYTES)
+    except (OSError, EOFError) as exc:
+        raise NiftiHeaderError(str(exc)) from exc
+
+    if sizeof_hdr == NIFTI1_HEADER_BYTES:
+        magic = raw[344:348]
+        if magic not in (b"n+1\0", b"ni1\0"):
+            raise NiftiHeaderError(f"bad NIfTI-1 magic {magic!r}")
+        dim = struct.unpack_from(endian + "8h", raw, 40)
+        datatype, bitpix = struct.unpack_from(endian + "2h", raw, 70)
+        pixdim = struct.unpack_from(endian + "8f", raw, 76)
+        vox_offset, scl_slope, scl_inter = struct.unpack_from(endian + "3f", raw, 108)
+        version = 1
+        single_file = magic == b"n+1\0"
+    else:
+        magic = raw[4:12]
+        if magic[:3] not in (b"n+2", b"ni2"):
+            raise NiftiHeaderError(f"bad NIfTI-2 magic {magic!r}")
+        datatype, bitpix = struct.unpack_from(endian + "2h", raw, 12)
+        dim = struct.unpack_from(endian + "8q", raw, 16)
+        pixdim = struct.unpack_from(endian + "8d", raw, 104)
+        vox_offset = struct.unpack_from(endian + "q", raw, 168)[0]
+        scl_slope, scl_inter = struct.unpack_from(endian + "2d", raw, 176)
+        version = 2
+        single_file = magic[:3] == b"n+2"
+
+    ndim = dim[0]
+    if not 1 <= ndim <= 7:
+        raise NiftiHeaderError(f"invalid dim[0]={ndim}")
+    shape = tuple(int(d) for d in dim[1:ndim + 1])
+    if any(d < 1 for d in shape):
+        raise NiftiHeaderError(f"invalid dimensions {shape}")
+    if datatype not in DATATYPES:
+        raise NiftiHeaderError(f"unknown datatype code {datatype}")
+    name, itemsize, np_code = DATATYPES[datatype]
+    if bitpix != itemsize * 8:
+        raise NiftiHeaderError(f"bitpix {bitpix} does not match datatype {name}")
+
+    return {
+        "path": path,
+        "version": version,
+        "endian": endian,
+        "shape": shape,
+        "zooms": tuple(float(p) for p in pixdim[1:ndim + 1]),
+        "dtype": name,
+        "itemsize": itemsize,
+        "np_code": np_code,
+        "vox_offset": int(vox_offset) if single_file else 0,
+        "scl_slope": float(scl_slope),
+        "scl_inter": float(scl_inter),
+        "single_file": single_file,
+    }
+
+
+def _data_path(header):
+    path = header["path"]
+    if header["single_file"]:
+        return path
+    base = path[:-3] if path.endswith(".gz") else path
+    img = base[:-4] + ".img"
+    return img + ".gz" if path.endswith(".gz") and not os.path.exists(img) else img
+
+
+def _n_voxels(header):
+    n = 1
+    for d in header["shape"]:
+        n *= d
+    return n
+
+
+def check_size(header):
+    """For uncompressed files, confirm the voxel data is all there."""
+    path = _data_path(header)
+    if path.endswith(".gz"):
+        return None
+    expected = header["vox_offset"] + _n_voxels(header) * header["itemsize"]
+    actual = os.path.getsize(path)
+    if actual < expected:
+        return f"data truncated ({actual} of {expected} bytes)"
+    return None
+
+
+def voxel_stats(header, chunk_bytes=STATS_CHUNK_BYTES):
+    """Chunked min/max/mean/non-zero/NaN summary of the scaled voxel data."""
+    import numpy as np
+
+    if header["np_code"] is None:
+        return None
+    dtype = np.dtype(header["endian"] + header["np_code"])
+    n_voxels = _n_voxels(header)
+    chunk = max(1, chunk_bytes // dtype.itemsize)
+    totals = {"min": np.inf, "max": -np.inf, "sum": 0.0, "nonzero": 0, "nan": 0, "n": 0}
+
+    def update(values):
+        if values.dtype.kind == "c":
+            values = np.abs(values)
+        nan = np.isnan(values) if values.dtype.kind == "f" else None
+        if nan is not None and nan.any():
+            totals["nan"] += int(nan.sum())
+            values = values[~nan]
+        if values.size:
+            totals["min"] = min(totals["min"], float(values.min()))
+            totals["max"] = max(totals["max"], float(values.max()))
+            totals["sum"] += float(values.sum(dtype=np.float64))
+            totals["nonzero"] += int(np.count_nonzero(values))
+            totals["n"] += values.size
+
+    path = _data_path(header)
+    if path.endswith(".gz"):
+        with gzip.open(path, "rb") as fh:
+            fh.read(header["vox_offset"])
+            remaining = n_voxels
+            while remaining:
+                count = min(chunk, remaining)
+                buf = fh.read(count * dtype.itemsize)
+                if len(buf) < count * dtype.itemsize:
+                    raise NiftiHeaderError("compressed data truncated")
+                update(np.frombuffer(buf, dtype=dtype))
+                remaining -= count
+    else:
+        data = np.memmap(path, dtype=dtype, mode="r", offset=header["vox_offset"], shape=(n_voxels,))
+        for start in range(0, n_voxels, chunk):
+            update(np.asarray(data[start:start + chunk]))
+        del data
+
+    slope, inter = header["scl_slope"], header["scl_inter"]
+    if slope not in (0.0, 1.0) or inter != 0.0:
+        if slope == 0.0:
+            slope = 1.0
+        lo, hi = totals["min"] * slope + inter, totals["max"] * slope + inter
+        totals["min"], totals["max"] = min(lo, hi), max(lo, hi)
+        totals["sum"] = totals["sum"] * slope + inter * totals["n"]
+    n = totals["n"]
+    return {
+        "min": totals["min"] if n else float("nan"),
+        "max": totals["max"] if n else float("nan"),
+        "mean": totals["sum"] / n if n else float("nan"),
+        "nonzero_fraction": totals["nonzero"] / n_voxels,
+        "nan_count": totals["nan"],
+    }
+
+
+def expand_paths(items, root):
+    """Resolve files, directories and glob patterns; report patterns with no match."""
+    paths = []
+    unmatched = []
+    for item in items:
+        candidate = os.path.join(root, item) if root else item
+        if any(ch in item for ch in "*?["):
+            matches = sorted(glob.glob(candidate, recursive=True))
+            if not matches:
+                unmatched.append(item)
+            paths.extend(matches)
+        elif os.path.isdir(candidate):
+            for dirpath, dirnames, filenames in os.walk(candidate):
+                dirnames.sort()
+                paths.extend(
+                    os.path.join(dirpath, name) for name in sorted(filenames)
+                    if name.endswith((".nii", ".nii.gz"))
+                )
+        else:
+            paths.append(candidate)
+    return paths, unmatched
+
+
+def check_file(path, args):
+    """Return (ok, report lines) for one file."""
+    try:
+        header = read_header(path)
+    except NiftiHeaderError as exc:
+        return False, [f"  Error: {exc}"]
+
+    lines = [
+        f"  Shape: {header['shape']}",
+        f"  Voxel sizes: {header['zooms']}",
+        f"  Data type: {header['dtype']}",
+    ]
+    problems = []
+    if args.expect_ndim is not None and len(header["shape"]) != args.expect_ndim:
+        problems.append(f"expected {args.expect_ndim}D, got {len(header['shape'])}D")
+    if args.expect_shape and tuple(args.expect_shape) != header["shape"][:len(args.expect_shape)]:
+        problems.append(f"expected shape {tuple(args.expect_shape)}, got {header['shape']}")
+    if args.expect_dtype and header["dtype"] not in args.expect_dtype:
+        problems.append(f"expected dtype {'/'.join(args.expect_dtype)}, got {header['dtype']}")
+    size_problem = check_size(header)
+    if size_problem:
+        problems.append(size_problem)
+
+    if args.stats and not problems:
+        try:
+            stats = voxel_stats(header)
+        except ImportError:
+            lines.append("  Stats: skipped (numpy not installed)")
+        except (OSError, EOFError, NiftiHeaderError) as exc:
+            problems.append(f"cannot read voxel data: {exc}")
+        else:
+            if stats is None:
+                lines.append(f"  Stats: skipped ({header['dtype']} data)")
+            else:
+                lines.append(
+                    "  Stats: min={min:.6g} max={max:.6g} mean={mean:.6g} "
+                    "nonzero={nonzero_fraction:.1%} nan={nan_count}".format(**stats)
+                )
+                if args.require_nonzero and stats["nonzero_fraction"] == 0:
+                    problems.append("image is all zeros")
+
+    lines.extend(f"  Error: {problem}" for problem in problems)
+    return not problems, lines
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Check NIfTI headers (and optionally voxel statistics) of many files in one process."
+    )
+    parser.add_argument("paths", nargs="+", help="Files, directories or glob patterns.")
+    parser.add_argument("--root", default=None, help="Directory that relative paths and patterns are resolved against.")
+    parser.add_argument("--label", action="append", default=[], help="Display label per file, in order (default: file name).")
+    parser.add_argument("--stats", action="store_true", help="Scan voxel data for min/max/mean/non-zero/NaN (needs numpy).")
+    parser.add_argument("--require-nonzero", action="store_true", help="With --stats, fail all-zero images.")
+    parser.add_argument("--expect-ndim", type=int, default=None, help="Required number of dimensions.")
+    parser.add_argument(
+        "--expect-shape", type=int, nargs="+", default=None, metavar="N",
+        help="Required leading dimensions, e.g. --expect-shape 32 32 16.",
+    )
+    parser.add_argument(
+        "--expect-dtype", action="append", default=[],
+        help="Accepted datatype name (e.g. float32); repeat to accept several.",
+    )
+    parser.add_argument("--quiet", action="store_true", help="Only print failures.")
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    args = parse_args(argv)
+    paths, unmatched = expand_paths(args.paths, args.root)
+    for pattern in unmatched:
+        print(f"WARN: no files match {pattern}")
+
+    failures = 0
+    for i, path in enumerate(paths):
+        label = args.label[i] if i < len(args.label) else os.path.basename(path)
+        ok, lines = check_file(path, args)
+        if not ok:
+            failures += 1
+        if ok and args.quiet:
+            continue
+        print(f"{'OK' if ok else 'FAIL'}: {label}")
+        for line in lines:
+            print(line)
+
+    if len(paths) > 1:
+        print(f"Checked {len(paths)} file(s): {len(paths) - failures} ok, {failures} failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
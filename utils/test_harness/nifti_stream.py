@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Bounded-memory NIfTI output helpers for the synthetic data generators.
+
+- open_nifti_memmap: create an uncompressed .nii and return a writable
+  memory map over its voxel data, so large 4D series can be filled slab by
+  slab without ever holding the whole array in RAM.
+- gzip_parallel: compress a file with a pool of threads. Each block becomes an
+  independent gzip member; the concatenation is a valid .gz that zlib-based
+  readers (nibabel, FSL, MRtrix3, AFNI) decompress transparently.
+- link_or_copy: materialize a duplicate output as a hardlink, falling back to
+  a relative symlink and finally a copy.
+"""
+
+import os
+import shutil
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import nibabel as nib
+
+
+GZIP_BLOCK_BYTES = 16 * 1024 * 1024
+
+
+def open_nifti_memmap(path, shape, dtype, affine, xyzt_units=("mm", "sec"), zooms=None):
+    """Write a NIfTI-1 header to ``path`` and memory-map the (zero-filled) voxel data.
+
+    The returned array is in NIfTI (Fortran) order, so ``img[..., t0:t1]`` on a
+    4D image addresses a contiguous run of whole volumes. Call ``flush()`` (or
+    drop the reference) when done.
+    """
+    dtype = np.dtype(dtype)
+    header = nib.Nifti1Header()
+    header.set_data_shape(shape)
+    header.set_data_dtype(dtype)
+    header.set_qform(affine, code=1)
+    header.set_sform(affine, code=1)
+    header.set_xyzt_units(*xyzt_units)
+    if zooms is not None:
+        header.set_zooms(zooms)
+    header["vox_offset"] = 352
+
+    n_bytes = int(np.prod(shape)) * dtype.itemsize
+    with open(path, "wb") as fh:
+        header.write_to(fh)
+        fh.truncate(352 + n_bytes)
+
+    return np.memmap(path, dtype=dtype, mode="r+", offset=352, shape=tuple(shape), order="F")
+
+
+def _compress_block(block, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31 -> gzip container
+    return compressor.compress(block) + compressor.flush()
+
+
+def gzip_parallel(src, dst, workers=None, level=6, block_bytes=GZIP_BLOCK_BYTES, remove_src=False):
+    """Compress ``src`` into ``dst`` using ``workers`` threads (zlib releases the GIL).
+
+    At most ``2 * workers`` blocks are in flight, so memory stays bounded by
+    the block size rather than the file size.
+    """
+    workers = max(1, workers or os.cpu_count() or 1)
+    tmp_dst = dst + ".part"
+    with open(src, "rb") as fin, open(tmp_dst, "wb") as fout, \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        while True:
+            block = fin.read(block_bytes)
+            if block:
+                pending.append(pool.submit(_compress_block, block, level))
+            if pending and (not block or len(pending) >= 2 * workers):
+                fout.write(pending.popleft().result())
+            if not block and not pending:
+                break
+    os.replace(tmp_dst, dst)
+    if remove_src:
+        os.remove(src)
+
+
+def link_or_copy(src, dst):
+    """Expose ``src`` at ``dst`` without rewriting it: hardlink, else symlink, else copy.
+
+    Returns the method used ("hardlink", "symlink" or "copy").
+    """
+    if os.path.lexists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except OSError:
+        pass
+    try:
+        os.symlink(os.path.relpath(src, os.path.dirname(os.path.abspath(dst))), dst)
+        return "symlink"
+    except OSError:
+        shutil.copyfile(src, dst)
+        return "copy"
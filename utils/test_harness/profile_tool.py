@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""Per-tool runtime/resource profiles recorded from test runs.
+
+``run`` wraps one tool invocation (normally a ``cwltool`` command line),
+measures it and appends a row to a SQLite database keyed by tool, container
+image and input dimensions:
+
+- wall time (perf_counter around the child);
+- user/system CPU time and peak RSS of the process tree, from
+  ``resource.getrusage(RUSAGE_CHILDREN)``;
+- for cwltool + Docker, where the tool runs outside our process tree, the
+  container's own peak memory and CPU time, sampled from its cgroup while it
+  runs (cwltool is asked to record container IDs with --cidfile-dir).
+
+The tool name, image and inputs are taken from the ``.cwl`` file and job file
+on the command line (dockerPull, and every ``path:`` in the job); NIfTI inputs
+are described by their header shape, other files by size.
+
+``query`` summarises the database per tool/image/input shape and ``predict``
+fits wall time and peak memory against input voxel count (log-log least
+squares over all recorded sizes) to estimate a node before launching it.
+
+Usage:
+    python3 profile_tool.py run -- cwltool --outdir out bet.cwl job.yml
+    python3 profile_tool.py query --tool bet
+    python3 profile_tool.py predict --tool bet --input sub-01_T1w.nii.gz
+
+The database is --db, else $NIBUILD_PROFILE_DB, else
+~/.cache/nibuild/tool_profiles.sqlite. The test suites' common scripts route
+cwltool through ``run`` when CWL_TEST_PROFILE=1.
+"""
+
+import argparse
+import datetime as dt
+import json
+import math
+import os
+import platform
+import re
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from nifti_check import NiftiHeaderError, read_header  # noqa: E402
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    tool TEXT NOT NULL,
+    image TEXT NOT NULL,
+    input_shape TEXT NOT NULL,
+    input_voxels INTEGER NOT NULL,
+    input_bytes INTEGER NOT NULL,
+    wall_seconds REAL NOT NULL,
+    user_seconds REAL NOT NULL,
+    system_seconds REAL NOT NULL,
+    max_rss_bytes INTEGER NOT NULL,
+    container_peak_bytes INTEGER,
+    container_cpu_seconds REAL,
+    exit_code INTEGER NOT NULL,
+    host TEXT NOT NULL,
+    cpu_count INTEGER NOT NULL,
+    recorded_at TEXT NOT NULL,
+    command TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_key ON runs (tool, image, input_shape);
+"""
+
+PATH_RE = re.compile(r"""^\s*(?:-\s*)?(?:path|location)\s*:\s*["']?([^"'#\n]+?)["']?\s*$""")
+DOCKER_PULL_RE = re.compile(r"""dockerPull\s*:\s*["']?([^\s"']+)""")
+SAMPLE_SECONDS = 0.5
+# ru_maxrss is KiB on Linux, bytes on macOS
+RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+def default_db():
+    env = os.environ.get("NIBUILD_PROFILE_DB")
+    if env:
+        return env
+    return os.path.join(os.path.expanduser("~"), ".cache", "nibuild", "tool_profiles.sqlite")
+
+
+def connect(path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+# ── Describing an invocation ──────────────────────────────────────
+
+
+def _job_inputs(job_path):
+    """File paths listed in a CWL job file (YAML or JSON), resolved against it."""
+    base = os.path.dirname(os.path.abspath(job_path))
+    paths = []
+    with open(job_path, encoding="utf-8") as fh:
+        text = fh.read()
+    if job_path.endswith(".json"):
+        def walk(obj):
+            if isinstance(obj, dict):
+                if obj.get("class") == "File" and (obj.get("path") or obj.get("location")):
+                    paths.append(obj.get("path") or obj.get("location"))
+                for value in obj.values():
+                    walk(value)
+            elif isinstance(obj, list):
+                for value in obj:
+                    walk(value)
+        walk(json.loads(text))
+    else:
+        for line in text.splitlines():
+            match = PATH_RE.match(line)
+            if match:
+                paths.append(match.group(1))
+    resolved = []
+    for path in paths:
+        if path.startswith("file://"):
+            path = path[len("file://"):]
+        resolved.append(path if os.path.isabs(path) else os.path.join(base, path))
+    return resolved
+
+
+def describe_inputs(paths):
+    """Return (shape signature, total voxels, total bytes) for input files."""
+    shapes = []
+    voxels = 0
+    n_bytes = 0
+    for path in paths:
+        if not os.path.isfile(path):
+            continue
+        n_bytes += os.path.getsize(path)
+        if path.endswith((".nii", ".nii.gz")):
+            try:
+                shape = read_header(path)["shape"]
+            except NiftiHeaderError:
+                continue
+            shapes.append("x".join(str(d) for d in shape))
+            voxels += _prod(shape)
+    return ",".join(sorted(shapes)) or "-", voxels, n_bytes
+
+
+def _prod(values):
+    result = 1
+    for value in values:
+        result *= value
+    return result
+
+
+def describe_command(command):
+    """Infer (tool, image, input paths) from a cwltool-style command line."""
+    cwl = next((a for a in command if a.endswith(".cwl")), None)
+    job = None
+    if cwl is not None:
+        after = command[command.index(cwl) + 1:]
+        job = next((a for a in after if a.endswith((".yml", ".yaml", ".json"))), None)
+    tool = os.path.splitext(os.path.basename(cwl))[0] if cwl else os.path.basename(command[0])
+    image = "-"
+    if cwl and os.path.isfile(cwl):
+        with open(cwl, encoding="utf-8") as fh:
+            match = DOCKER_PULL_RE.search(fh.read())
+        if match:
+            image = match.group(1)
+    inputs = _job_inputs(job) if job and os.path.isfile(job) else []
+    return tool, image, inputs
+
+
+# ── Container sampling ────────────────────────────────────────────
+
+
+def _cgroup_dirs(cid):
+    return [
+        f"/sys/fs/cgroup/system.slice/docker-{cid}.scope",
+        f"/sys/fs/cgroup/docker/{cid}",
+    ]
+
+
+def _read_int(path):
+    try:
+        with open(path) as fh:
+            return int(fh.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _sample_container(cid):
+    """(peak or current memory bytes, CPU seconds) for a running container, or Nones."""
+    for cg in _cgroup_dirs(cid):
+        if not os.path.isdir(cg):
+            continue
+        memory = _read_int(os.path.join(cg, "memory.peak")) or _read_int(os.path.join(cg, "memory.current"))
+        cpu = None
+        try:
+            with open(os.path.join(cg, "cpu.stat")) as fh:
+                for line in fh:
+                    if line.startswith("usage_usec"):
+                        cpu = int(line.split()[1]) / 1e6
+        except OSError:
+            pass
+        return memory, cpu
+    # cgroup v1
+    memory = _read_int(f"/sys/fs/cgroup/memory/docker/{cid}/memory.max_usage_in_bytes")
+    cpu_ns = _read_int(f"/sys/fs/cgroup/cpuacct/docker/{cid}/cpuacct.usage")
+    return memory, (cpu_ns / 1e9 if cpu_ns is not None else None)
+
+
+class ContainerSampler(threading.Thread):
+    """Poll containers whose IDs cwltool writes into ``cid_dir``."""
+
+    def __init__(self, cid_dir):
+        super().__init__(daemon=True)
+        self.cid_dir = cid_dir
+        self.stop_event = threading.Event()
+        self.peak = {}
+        self.cpu = {}
+
+    def run(self):
+        while not self.stop_event.wait(SAMPLE_SECONDS):
+            self.sample()
+
+    def sample(self):
+        try:
+            names = os.listdir(self.cid_dir)
+        except OSError:
+            return
+        for name in names:
+            try:
+                with open(os.path.join(self.cid_dir, name)) as fh:
+                    cid = fh.read().strip()
+            except OSError:
+                continue
+            if not cid:
+                continue
+            memory, cpu = _sample_container(cid)
+            if memory is not None:
+                self.peak[cid] = max(self.peak.get(cid, 0), memory)
+            if cpu is not None:
+                self.cpu[cid] = max(self.cpu.get(cid, 0.0), cpu)
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+        self.sample()
+        # Containers run one after another (workflow steps), so report the
+        # largest single peak and the total CPU time.
+        peak = max(self.peak.values()) if self.peak else None
+        cpu = sum(self.cpu.values()) if self.cpu else None
+        return peak, cpu
+
+
+# ── Subcommands ───────────────────────────────────────────────────
+
+
+def cmd_run(args):
+    command = args.command
+    if not command:
+        print("ERROR: no command given after --", file=sys.stderr)
+        return 2
+    tool, image, inputs = describe_command(command)
+    tool = args.tool or tool
+    image = args.image or image
+    if args.input:
+        inputs = args.input
+    input_shape, input_voxels, input_bytes = describe_inputs(inputs)
+
+    sampler = None
+    cid_dir = None
+    if "cwltool" in os.path.basename(command[0]) and shutil.which("docker") and not args.no_containers:
+        cid_dir = tempfile.mkdtemp(prefix="cwl_cid_")
+        command = [command[0], "--record-container-id", "--cidfile-dir", cid_dir] + command[1:]
+        sampler = ContainerSampler(cid_dir)
+        sampler.start()
+
+    before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.perf_counter()
+    try:
+        returncode = subprocess.call(command)
+    except OSError as exc:
+        print(f"ERROR: cannot run {command[0]}: {exc}", file=sys.stderr)
+        returncode = 127
+    wall = time.perf_counter() - started
+    after = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    container_peak = container_cpu = None
+    if sampler is not None:
+        container_peak, container_cpu = sampler.stop()
+        shutil.rmtree(cid_dir, ignore_errors=True)
+
+    row = {
+        "tool": tool,
+        "image": image,
+        "input_shape": input_shape,
+        "input_voxels": input_voxels,
+        "input_bytes": input_bytes,
+        "wall_seconds": wall,
+        "user_seconds": after.ru_utime - before.ru_utime,
+        "system_seconds": after.ru_stime - before.ru_stime,
+        "max_rss_bytes": after.ru_maxrss * RSS_UNIT,
+        "container_peak_bytes": container_peak,
+        "container_cpu_seconds": container_cpu,
+        "exit_code": returncode,
+        "host": platform.node(),
+        "cpu_count": os.cpu_count() or 1,
+        "recorded_at": dt.datetime.now(dt.timezone.utc).replace(microsecond=0).isoformat(),
+        "command": " ".join(command),
+    }
+    try:
+        with connect(args.db) as conn:
+            conn.execute(
+                f"INSERT INTO runs ({', '.join(row)}) VALUES ({', '.join('?' for _ in row)})",
+                list(row.values()),
+            )
+    except sqlite3.Error as exc:
+        print(f"WARN: could not record profile in {args.db}: {exc}", file=sys.stderr)
+
+    peak = max(row["max_rss_bytes"], container_peak or 0)
+    print(
+        f"profile: {tool} [{image}] inputs={input_shape} wall={wall:.1f}s "
+        f"cpu={row['user_seconds'] + row['system_seconds'] + (container_cpu or 0):.1f}s "
+        f"peak={peak / 2 ** 20:.0f}MiB exit={returncode}",
+        file=sys.stderr,
+    )
+    return returncode
+
+
+def _peak_expr():
+    return "MAX(max_rss_bytes, COALESCE(container_peak_bytes, 0))"
+
+
+def cmd_query(args):
+    where = ["exit_code = 0"] if not args.include_failed else []
+    params = []
+    if args.tool:
+        where.append("tool = ?")
+        params.append(args.tool)
+    if args.image:
+        where.append("image = ?")
+        params.append(args.image)
+    sql = (
+        "SELECT tool, image, input_shape, COUNT(*), AVG(wall_seconds), MAX(wall_seconds), "
+        "AVG(user_seconds + system_seconds + COALESCE(container_cpu_seconds, 0)), "
+        f"MAX({_peak_expr()}) FROM runs"
+        + (" WHERE " + " AND ".join(where) if where else "")
+        + " GROUP BY tool, image, input_shape ORDER BY tool, image, input_shape"
+    )
+    with connect(args.db) as conn:
+        rows = conn.execute(sql, params).fetchall()
+    keys = ("tool", "image", "inputShape", "runs", "meanWallSeconds", "maxWallSeconds",
+            "meanCpuSeconds", "peakMemoryBytes")
+    records = [dict(zip(keys, row)) for row in rows]
+    if args.json:
+        print(json.dumps(records, indent=2))
+        return 0
+    if not records:
+        print("No matching runs.")
+        return 0
+    print(f"{'tool':<24} {'inputs':<20} {'runs':>4} {'wall(s)':>9} {'max(s)':>9} {'cpu(s)':>9} {'peak(MiB)':>10}  image")
+    for r in records:
+        print(f"{r['tool']:<24} {r['inputShape']:<20} {r['runs']:>4} {r['meanWallSeconds']:>9.1f} "
+              f"{r['maxWallSeconds']:>9.1f} {r['meanCpuSeconds']:>9.1f} "
+              f"{r['peakMemoryBytes'] / 2 ** 20:>10.0f}  {r['image']}")
+    return 0
+
+
+def _fit_power_law(points):
+    """Least squares of log(y) = a + b log(x); a single size gives b = 1 (linear scaling)."""
+    points = [(math.log(x), math.log(y)) for x, y in points if x > 0 and y > 0]
+    if not points:
+        return None
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    if var_x < 1e-12:
+        slope = 1.0
+    else:
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+    return mean_y - slope * mean_x, slope
+
+
+def predict(conn, tool, voxels, image=None):
+    """Predicted wall seconds and peak bytes for ``tool`` at ``voxels`` input voxels."""
+    sql = f"SELECT input_voxels, wall_seconds, {_peak_expr()} FROM runs WHERE tool = ? AND exit_code = 0"
+    params = [tool]
+    if image:
+        sql += " AND image = ?"
+        params.append(image)
+    rows = conn.execute(sql, params).fetchall()
+    if not rows:
+        return None
+    result = {"tool": tool, "inputVoxels": voxels, "basedOnRuns": len(rows)}
+    sized = [r for r in rows if r[0] > 0]
+    for key, column in (("wallSeconds", 1), ("peakMemoryBytes", 2)):
+        fit = _fit_power_law([(r[0], r[column]) for r in sized]) if voxels and sized else None
+        if fit is None:
+            result[key] = max(r[column] for r in rows)
+            result[key + "Basis"] = "max of recorded runs"
+        else:
+            intercept, slope = fit
+            result[key] = math.exp(intercept + slope * math.log(voxels))
+            result[key + "Basis"] = f"power law, exponent {slope:.2f}"
+    result["peakMemoryBytes"] = int(result["peakMemoryBytes"])
+    return result
+
+
+def cmd_predict(args):
+    voxels = args.voxels
+    if args.input:
+        voxels = describe_inputs(args.input)[1]
+    with connect(args.db) as conn:
+        result = predict(conn, args.tool, voxels, args.image)
+    if result is None:
+        print(f"ERROR: no successful runs recorded for {args.tool}", file=sys.stderr)
+        return 1
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+def parse_args(argv):
+    command = []
+    if "--" in argv:
+        split = argv.index("--")
+        argv, command = argv[:split], argv[split + 1:]
+    parser = argparse.ArgumentParser(description="Record and query per-tool runtime/resource profiles.")
+    parser.add_argument("--db", default=default_db(), help="SQLite database (default: $NIBUILD_PROFILE_DB or ~/.cache/nibuild/tool_profiles.sqlite).")
+    sub = parser.add_subparsers(dest="subcommand", required=True)
+
+    run = sub.add_parser("run", help="Run and profile a command given after --.")
+    run.add_argument("--tool", default=None, help="Tool name (default: the .cwl file stem).")
+    run.add_argument("--image", default=None, help="Container image (default: dockerPull from the .cwl).")
+    run.add_argument("--input", nargs="+", default=None, help="Input files (default: paths in the job file).")
+    run.add_argument("--no-containers", action="store_true", help="Do not sample Docker container cgroups.")
+
+    query = sub.add_parser("query", help="Summarise recorded runs.")
+    query.add_argument("--tool", default=None)
+    query.add_argument("--image", default=None)
+    query.add_argument("--include-failed", action="store_true", help="Include runs with a non-zero exit code.")
+    query.add_argument("--json", action="store_true", help="Print JSON instead of a table.")
+
+    pred = sub.add_parser("predict", help="Estimate wall time and peak memory for a tool.")
+    pred.add_argument("--tool", required=True)
+    pred.add_argument("--image", default=None)
+    size = pred.add_mutually_exclusive_group()
+    size.add_argument("--voxels", type=int, default=0, help="Total input voxels.")
+    size.add_argument("--input", nargs="+", default=None, help="Input files to size the prediction from.")
+
+    args = parser.parse_args(argv)
+    args.command = command
+    return args
+
+
+def main(argv):
+    args = parse_args(argv)
+    handlers = {"run": cmd_run, "query": cmd_query, "predict": cmd_predict}
+    return handlers[args.subcommand](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
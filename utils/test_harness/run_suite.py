@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""Run modality test suites in parallel, ordered by their tool graphs.
+
+Each suite's ``connects/*_tool_graph.mmd`` says which tool feeds which. A
+test script ``test_<tool>.sh`` may consume outputs staged by its producers'
+tests, so the graph is turned into a schedule:
+
+- cycles are collapsed into their strongly connected components (tests in
+  one component run serially, producers before consumers, then in
+  run_all.sh order);
+- components become ready once every upstream component has finished
+  (components without test scripts finish immediately but still carry the
+  ordering through);
+- ready components are dispatched to a worker pool, longest remaining
+  critical path first, using wall times recorded by previous runs.
+
+Scripts are matched to graph nodes by name ('antsBrainExtraction.sh' and
+'@SSwarper' match test_antsBrainExtraction.sh and test_SSwarper.sh); scripts
+with no node in the graph are independent, and graph nodes with no script are
+reported.
+
+Shared data is prepared once, serially, before any test is dispatched: each
+suite's setup script (setup_data.sh / setup_test_data.sh) if it has one, then
+every prepare_* helper from its _common.sh / common.sh that a selected test
+calls. The helpers create their files lazily (check, then copy or derive), so
+without this step concurrent tests would prepare the same files at once and
+read each other's partial outputs.
+
+For sharding across machines the units are grouped into weakly connected
+components, which never depend on each other, and the components are spread
+over K shards by greedy longest-processing-time on their recorded cost.
+``--shard I/K`` runs shard I (1-based).
+
+Per-test output goes to <suite>/logs/run_suite/<test>.log; wall time and
+status are merged into <suite>/logs/run_suite/timings.json, which later runs
+read back for prioritising and shard balancing. Status lines written by
+run_tool are collected per test (through CWL_TEST_SUMMARY_FILE) and appended
+to the suite's summary.tsv as each test finishes.
+
+Usage:
+    python3 run_suite.py ../fmri_tests ../structural_mri_tests --workers 8
+    python3 run_suite.py ../fmri_tests --shard 2/4 --dry-run
+    python3 run_suite.py ../fmri_tests -- --rerun-passed
+"""
+
+import argparse
+import datetime as dt
+import heapq
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "consensus_connects"))
+from build_tool_adjacency import parse_tool_graph  # noqa: E402
+from tool_graph_analytics import (  # noqa: E402
+    build_successors,
+    condensation,
+    strongly_connected_components,
+)
+
+
+SETUP_SCRIPTS = ("setup_data.sh", "setup_test_data.sh")
+COMMON_SCRIPTS = ("_common.sh", "common.sh")
+PREPARE_RE = re.compile(r"^(prepare_\w+)\s*\(\)", re.MULTILINE)
+DEPENDS_RE = re.compile(r"^#\s*DEPENDS:(.*)$", re.MULTILINE)
+INLINE_TEST_RE = re.compile(r"\btest_([A-Za-z0-9_.+-]+?)\.sh\b")
+LOG_SUBDIR = os.path.join("logs", "run_suite")
+DEFAULT_TEST_SECONDS = 60.0
+# Suites whose scripts always exit 0 report failure in their output instead.
+FAIL_PATTERN = r"SOME TESTS FAILED|\bResult: FAIL\b"
+STATUS_RANK = {"SKIP": 0, "PASS": 1, "FAIL": 2}
+
+
+def _normalize(name):
+    """Match graph labels to script stems ('antsBrainExtraction.sh' ~ 'antsBrainExtraction')."""
+    if name.endswith(".sh"):
+        name = name[:-3]
+    return re.sub(r"[^0-9a-z]+", "_", name.lower()).strip("_")
+
+
+def discover_tests(suite_dir):
+    """Test scripts in run_all.sh order, then alphabetically for the rest."""
+    scripts = sorted(suite_dir.glob("test_*.sh"))
+    order = {}
+    for runner in sorted(suite_dir.glob("run_all*.sh")):
+        for match in re.finditer(r"(test_[A-Za-z0-9_.+-]+?\.sh)", runner.read_text(encoding="utf-8")):
+            order.setdefault(match.group(1), len(order))
+    return sorted(scripts, key=lambda p: (order.get(p.name, len(order)), p.name))
+
+
+def script_dependencies(script):
+    """Normalized tool names a test consumes: its '# DEPENDS:' header and the tests it runs inline."""
+    text = script.read_text(encoding="utf-8", errors="replace")
+    names = set()
+    for match in DEPENDS_RE.finditer(text):
+        names.update(_normalize(word) for word in re.findall(r"[\w@.+-]+", match.group(1)))
+    names.update(_normalize(name) for name in INLINE_TEST_RE.findall(text))
+    names.discard(_normalize(script.stem[len("test_"):]))
+    return names
+
+
+def order_component(member_scripts, producers, position):
+    """Producers before consumers (DFS post-order over consumer -> producer), ties by position."""
+    ordered = []
+    seen = set()
+
+    def visit(script):
+        if script in seen:
+            return
+        seen.add(script)
+        for producer in sorted(producers.get(script, ()), key=position.get):
+            visit(producer)
+        ordered.append(script)
+
+    for script in sorted(member_scripts, key=position.get):
+        visit(script)
+    return ordered
+
+
+def load_timings(suite_dir):
+    path = suite_dir / LOG_SUBDIR / "timings.json"
+    if not path.is_file():
+        return {}
+    try:
+        return json.loads(path.read_text(encoding="utf-8")).get("tests", {})
+    except (OSError, ValueError):
+        return {}
+
+
+class Unit:
+    """A group of test scripts that must run serially (one graph component)."""
+
+    def __init__(self, uid, suite, scripts, cost):
+        self.uid = uid
+        self.suite = suite
+        self.scripts = scripts
+        self.cost = cost
+        self.preds = set()
+        self.succs = set()
+        self.priority = 0.0
+
+
+def build_units(suite_dir, timings):
+    """Turn one suite's tool graph and test scripts into schedulable units."""
+    suite = suite_dir.name
+    scripts = discover_tests(suite_dir)
+    known = [t["seconds"] for t in timings.values() if "seconds" in t]
+    default_cost = sum(known) / len(known) if known else DEFAULT_TEST_SECONDS
+
+    def cost_of(script_list):
+        return sum(timings.get(s.name, {}).get("seconds", default_cost) for s in script_list)
+
+    graphs = sorted((suite_dir / "connects").glob("*_tool_graph.mmd"))
+    tool_order = []
+    edges = set()
+    if graphs:
+        labels, edges = parse_tool_graph(graphs[0])
+        tool_order = sorted(set(labels.values()) | {t for edge in edges for t in edge})
+
+    tool_index = {_normalize(tool): idx for idx, tool in enumerate(tool_order)}
+    scripts_by_tool = {}
+    loose = []
+    for script in scripts:
+        idx = tool_index.get(_normalize(script.stem[len("test_"):]))
+        if idx is None:
+            loose.append(script)
+        else:
+            scripts_by_tool.setdefault(idx, []).append(script)
+    unmatched = [tool for idx, tool in enumerate(tool_order) if idx not in scripts_by_tool]
+    if unmatched:
+        print(f"WARN: {suite}: {len(unmatched)} graph node(s) match no test script: "
+              f"{', '.join(unmatched)}", file=sys.stderr)
+
+    successors = build_successors(tool_order, edges)
+    components = strongly_connected_components(successors)
+    component_of, dag = condensation(successors, components)
+
+    # The tool graphs link whole subsections, so edges inside a component
+    # usually run both ways; only one-way edges and the scripts' own
+    # dependencies say which test produces another's inputs.
+    position = {script: i for i, script in enumerate(scripts)}
+    units = []
+    for comp_idx, members in enumerate(components):
+        member_set = set(members)
+        tool_of = {s: node for node in members for s in scripts_by_tool.get(node, [])}
+        producers = {}
+        for script, node in tool_of.items():
+            wanted = {tool_index.get(name) for name in script_dependencies(script)}
+            wanted.update(u for u in member_set if node in successors[u] and u not in successors[node])
+            producers[script] = [s for s, n in tool_of.items() if n in wanted and n != node]
+        member_scripts = order_component(list(tool_of), producers, position)
+        units.append(Unit(f"{suite}#{comp_idx}", suite, member_scripts, cost_of(member_scripts)))
+    for comp_idx, targets in enumerate(dag):
+        for target in targets:
+            units[comp_idx].succs.add(units[target])
+            units[target].preds.add(units[comp_idx])
+    for script in loose:
+        units.append(Unit(f"{suite}:{script.name}", suite, [script], cost_of([script])))
+    return units
+
+
+def assign_priorities(units):
+    """Longest remaining path (by estimated cost) from each unit to a sink."""
+    remaining = {unit: len(unit.succs) for unit in units}
+    stack = [unit for unit in units if not unit.succs]
+    while stack:
+        unit = stack.pop()
+        unit.priority = unit.cost + max((s.priority for s in unit.succs), default=0.0)
+        for pred in unit.preds:
+            remaining[pred] -= 1
+            if remaining[pred] == 0:
+                stack.append(pred)
+
+
+def weakly_connected_groups(units):
+    """Partition units into groups with no edges between them."""
+    seen = set()
+    groups = []
+    for unit in units:
+        if unit in seen:
+            continue
+        group = []
+        stack = [unit]
+        seen.add(unit)
+        while stack:
+            current = stack.pop()
+            group.append(current)
+            for neighbour in current.preds | current.succs:
+                if neighbour not in seen:
+                    seen.add(neighbour)
+                    stack.append(neighbour)
+        groups.append(group)
+    return groups
+
+
+def select_shard(units, shard_index, shard_count):
+    """Greedy LPT of weakly connected groups over shards; return shard ``shard_index`` (1-based)."""
+    groups = [g for g in weakly_connected_groups(units) if any(u.scripts for u in g)]
+    groups.sort(key=lambda g: (-sum(u.cost for u in g), min(u.uid for u in g)))
+    loads = [(0.0, i) for i in range(shard_count)]
+    heapq.heapify(loads)
+    selected = []
+    for group in groups:
+        load, shard = heapq.heappop(loads)
+        if shard == shard_index - 1:
+            selected.extend(group)
+        heapq.heappush(loads, (load + sum(u.cost for u in group), shard))
+    return selected
+
+
+def prepare_helpers(suite_dir, scripts):
+    """(common script, [prepare_* helpers it defines that ``scripts`` call]) or (None, [])."""
+    for name in COMMON_SCRIPTS:
+        common = suite_dir / name
+        if common.is_file():
+            break
+    else:
+        return None, []
+    defined = PREPARE_RE.findall(common.read_text(encoding="utf-8"))
+    called = set()
+    for script in scripts:
+        text = script.read_text(encoding="utf-8", errors="replace")
+        called.update(helper for helper in defined if re.search(rf"\b{helper}\b", text))
+    return common, [helper for helper in defined if helper in called]
+
+
+def run_setup(suite_dir, scripts, log_path):
+    """Run the suite's setup script and the prepare_* helpers its tests need, serially."""
+    steps = []
+    for name in SETUP_SCRIPTS:
+        setup = suite_dir / name
+        if setup.is_file():
+            steps.append((name, ["bash", str(setup)]))
+    common, helpers = prepare_helpers(suite_dir, scripts)
+    for helper in helpers:
+        # One process per helper, so a helper that dies does not skip the others
+        steps.append((helper, ["bash", "-c", 'source "$0" && "$1"', str(common), helper]))
+    with open(log_path, "wb") as log:
+        for name, cmd in steps:
+            print(f"Setting up {suite_dir.name} ({name})")
+            log.write(f"=== {name} ===\n".encode())
+            log.flush()
+            if subprocess.run(cmd, cwd=str(suite_dir), stdout=log, stderr=subprocess.STDOUT).returncode != 0:
+                print(f"  WARN: {name} failed; see {log_path}")
+
+
+def run_script(script, passthrough, log_dir, fail_re):
+    """Run one test script; return a result dict (status from exit code, summary lines, log)."""
+    log_path = log_dir / (script.stem + ".log")
+    summary_path = log_dir / (script.stem + ".summary.tsv")
+    if summary_path.exists():
+        summary_path.unlink()
+    env = dict(os.environ, CWL_TEST_SUMMARY_FILE=str(summary_path))
+    started = time.perf_counter()
+    with open(log_path, "wb") as log:
+        proc = subprocess.run(
+            ["bash", str(script)] + list(passthrough),
+            cwd=str(script.parent), stdout=log, stderr=subprocess.STDOUT, env=env,
+        )
+    seconds = time.perf_counter() - started
+
+    summary_lines = []
+    if summary_path.exists():
+        summary_lines = [line for line in summary_path.read_text(encoding="utf-8").splitlines() if line.strip()]
+        summary_path.unlink()
+    statuses = [line.rsplit("\t", 1)[-1] for line in summary_lines]
+    if proc.returncode != 0:
+        status = "FAIL"
+    elif statuses:
+        status = max(statuses, key=lambda s: STATUS_RANK.get(s, 2))
+    elif fail_re.search(log_path.read_text(encoding="utf-8", errors="replace")):
+        status = "FAIL"
+    else:
+        status = "PASS"
+    return {
+        "script": script,
+        "status": status,
+        "exitCode": proc.returncode,
+        "seconds": seconds,
+        "summaryLines": summary_lines,
+        "log": log_path,
+    }
+
+
+def run_unit(unit, passthrough, log_dirs, fail_re):
+    return [run_script(script, passthrough, log_dirs[unit.suite], fail_re) for script in unit.scripts]
+
+
+def write_timings(suite_dir, previous, results):
+    path = suite_dir / LOG_SUBDIR / "timings.json"
+    tests = dict(previous)
+    for result in results:
+        tests[result["script"].name] = {
+            "seconds": round(result["seconds"], 3),
+            "status": result["status"],
+            "exitCode": result["exitCode"],
+        }
+    document = {
+        "generatedAt": dt.datetime.now(dt.timezone.utc).replace(microsecond=0).isoformat(),
+        "suite": suite_dir.name,
+        "tests": dict(sorted(tests.items())),
+    }
+    path.write_text(json.dumps(document, indent=2) + "\n", encoding="utf-8")
+
+
+def parse_args(argv):
+    if "--" in argv:
+        split = argv.index("--")
+        own, passthrough = argv[:split], argv[split + 1:]
+    else:
+        own, passthrough = argv, []
+    parser = argparse.ArgumentParser(
+        description="Run utils/*_tests test scripts concurrently in tool-graph dependency order.",
+        usage="%(prog)s SUITE_DIR [SUITE_DIR ...] [options] [-- test script args]",
+    )
+    parser.add_argument("suites", nargs="+", type=Path, help="Suite directories (e.g. utils/fmri_tests).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Concurrent tests (default: CPU count).")
+    parser.add_argument("--shard", default="1/1", help="Run shard I of K (1-based), e.g. 2/4 (default: 1/1).")
+    parser.add_argument("--no-setup", action="store_true",
+                        help="Do not run the suites' setup scripts and prepare_* helpers first.")
+    parser.add_argument("--dry-run", action="store_true", help="Print the units selected for this shard and exit.")
+    parser.add_argument("--fail-pattern", default=FAIL_PATTERN, help="Regex marking failure in logs of scripts that exit 0.")
+    args = parser.parse_args(own)
+    match = re.fullmatch(r"(\d+)/(\d+)", args.shard)
+    if not match or not 1 <= int(match.group(1)) <= int(match.group(2)):
+        parser.error("--shard must look like I/K with 1 <= I <= K")
+    args.shard_index, args.shard_count = int(match.group(1)), int(match.group(2))
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    args.passthrough = passthrough
+    return args
+
+
+def main(argv):
+    args = parse_args(argv)
+    suite_dirs = [suite.resolve() for suite in args.suites]
+    for suite_dir in suite_dirs:
+        if not suite_dir.is_dir():
+            print(f"ERROR: not a directory: {suite_dir}", file=sys.stderr)
+            return 1
+
+    timings = {suite_dir.name: load_timings(suite_dir) for suite_dir in suite_dirs}
+    units = []
+    for suite_dir in suite_dirs:
+        units.extend(build_units(suite_dir, timings[suite_dir.name]))
+    assign_priorities(units)
+    selected = set(select_shard(units, args.shard_index, args.shard_count))
+    n_tests = sum(len(u.scripts) for u in selected)
+
+    print(f"Shard {args.shard_index}/{args.shard_count}: {n_tests} test(s) in "
+          f"{sum(1 for u in selected if u.scripts)} unit(s), {args.workers} worker(s)")
+    if args.dry_run:
+        for unit in sorted(selected, key=lambda u: (-u.priority, u.uid)):
+            if unit.scripts:
+                deps = sorted(p.uid for p in unit.preds if p in selected and p.scripts)
+                names = " ".join(s.name for s in unit.scripts)
+                print(f"  {unit.uid} [~{unit.cost:.0f}s, path {unit.priority:.0f}s] {names}"
+                      + (f" (after {', '.join(deps)})" if deps else ""))
+        return 0
+
+    active_suites = [d for d in suite_dirs if any(u.suite == d.name and u.scripts for u in selected)]
+    log_dirs = {}
+    for suite_dir in active_suites:
+        log_dirs[suite_dir.name] = suite_dir / LOG_SUBDIR
+        log_dirs[suite_dir.name].mkdir(parents=True, exist_ok=True)
+        summary = suite_dir / "summary.tsv"
+        if summary.exists() or (suite_dir / "_common.sh").is_file():
+            summary.write_text("tool\tstatus\n", encoding="utf-8")
+        if not args.no_setup:
+            suite_scripts = [s for u in selected if u.suite == suite_dir.name for s in u.scripts]
+            run_setup(suite_dir, suite_scripts, log_dirs[suite_dir.name] / "setup.log")
+
+    # Units outside this shard never gate anything inside it (they are in other
+    # weakly connected groups), so only in-shard predecessors are counted.
+    waiting = {u: sum(1 for p in u.preds if p in selected) for u in selected}
+    ready = [(-u.priority, u.uid, u) for u, n in waiting.items() if n == 0]
+    heapq.heapify(ready)
+    fail_re = re.compile(args.fail_pattern)
+    results_by_suite = {d.name: [] for d in active_suites}
+    counts = {"PASS": 0, "FAIL": 0, "SKIP": 0}
+    done = 0
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        running = {}
+        while ready or running:
+            while ready and len(running) < args.workers:
+                _, _, unit = heapq.heappop(ready)
+                if not unit.scripts:
+                    # Graph-only component: releases its successors immediately.
+                    for succ in unit.succs:
+                        if succ in waiting:
+                            waiting[succ] -= 1
+                            if waiting[succ] == 0:
+                                heapq.heappush(ready, (-succ.priority, succ.uid, succ))
+                    continue
+                running[pool.submit(run_unit, unit, args.passthrough, log_dirs, fail_re)] = unit
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                unit = running.pop(future)
+                for result in future.result():
+                    done += 1
+                    counts[result["status"]] = counts.get(result["status"], 0) + 1
+                    results_by_suite[unit.suite].append(result)
+                    if result["summaryLines"]:
+                        with open(result["script"].parent / "summary.tsv", "a", encoding="utf-8") as fh:
+                            fh.write("\n".join(result["summaryLines"]) + "\n")
+                    print(f"[{done:>{len(str(n_tests))}}/{n_tests}] {result['status']:<4} "
+                          f"{unit.suite}/{result['script'].name} ({result['seconds']:.1f}s)")
+                for succ in unit.succs:
+                    if succ in waiting:
+                        waiting[succ] -= 1
+                        if waiting[succ] == 0:
+                            heapq.heappush(ready, (-succ.priority, succ.uid, succ))
+
+    for suite_dir in active_suites:
+        write_timings(suite_dir, timings[suite_dir.name], results_by_suite[suite_dir.name])
+
+    elapsed = time.perf_counter() - started
+    serial = sum(r["seconds"] for rs in results_by_suite.values() for r in rs)
+    print("")
+    print(f"PASS: {counts['PASS']}  FAIL: {counts['FAIL']}  SKIP: {counts['SKIP']}")
+    print(f"Wall time: {elapsed:.1f}s (sum of test times {serial:.1f}s)")
+    for suite_dir in active_suites:
+        print(f"  Logs and timings: {suite_dir / LOG_SUBDIR}")
+    return 1 if counts["FAIL"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
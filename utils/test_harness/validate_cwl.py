@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""Batch CWL validation with a content-hash cache.
+
+Replaces one ``cwltool --validate`` process per test with a single process
+that validates every file given on the command line:
+
+    python3 validate_cwl.py public/cwl/fsl/bet.cwl
+    python3 validate_cwl.py public/cwl                # the whole catalog
+    python3 validate_cwl.py --root public/cwl 'fsl/*.cwl' --workers 4
+
+Each file's cache key is a SHA-256 over its contents and the contents of
+everything it pulls in ($import, $include, $mixin and run: references,
+followed recursively), plus the cwltool version. Files whose key has a
+recorded successful validation are reported as cached without loading
+cwltool at all; only changed files are validated. Failures are never cached,
+so a fixed environment is picked up on the next run.
+
+When the --cwltool executable (the one the suites run tools with) belongs to
+this interpreter's environment, cwltool is imported lazily and used
+in-process: the CWL schema is loaded once and reused for every file (and once
+per worker with --workers). Otherwise (a different conda env, pipx, or no
+importable package) each file is validated with that executable's
+``cwltool --validate`` as a subprocess, still behind the cache, so files are
+always validated and cached under the cwltool that runs the tools.
+
+Arguments may be files, directories (searched recursively for .cwl) or glob
+patterns (relative to --root); with no arguments public/cwl is validated.
+Exit status is 1 if any file fails.
+
+The cache is --cache, else $NIBUILD_CWL_VALIDATE_CACHE, else
+~/.cache/nibuild/cwl_validation.sqlite.
+"""
+
+import argparse
+import datetime as dt
+import glob
+import hashlib
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import subprocess
+import sys
+import sysconfig
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+CACHE_FORMAT = 2
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS validations (
+    key TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    cwltool_version TEXT NOT NULL,
+    messages TEXT NOT NULL,
+    validated_at TEXT NOT NULL
+);
+"""
+
+REFERENCE_RE = re.compile(
+    r"""^\s*(?:-\s*)?["']?(?:\$import|\$include|\$mixin|run)["']?\s*:\s*["']?([^\s"'#{}\[\],]+)"""
+)
+
+
+def default_cache():
+    env = os.environ.get("NIBUILD_CWL_VALIDATE_CACHE")
+    if env:
+        return env
+    return os.path.join(os.path.expanduser("~"), ".cache", "nibuild", "cwl_validation.sqlite")
+
+
+def connect(path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _label(path):
+    """Path relative to the repository when inside it, else absolute."""
+    rel = os.path.relpath(path, PROJECT_ROOT)
+    return path if rel.startswith(os.pardir) else rel
+
+
+def collect_files(args):
+    """Expand file, directory and glob arguments into sorted unique .cwl paths."""
+    files = set()
+    for arg in args.paths or [os.path.join(PROJECT_ROOT, "public", "cwl")]:
+        candidate = arg if os.path.isabs(arg) or args.root is None else os.path.join(args.root, arg)
+        if os.path.isdir(candidate):
+            for dirpath, _, names in os.walk(candidate):
+                files.update(os.path.join(dirpath, name) for name in names if name.endswith(".cwl"))
+        elif os.path.isfile(candidate):
+            files.add(candidate)
+        else:
+            matches = glob.glob(candidate, recursive=True)
+            if not matches:
+                print(f"WARNING: no CWL files match {arg}", file=sys.stderr)
+            files.update(path for path in matches if os.path.isfile(path))
+    return sorted(os.path.abspath(path) for path in files)
+
+
+# ── Cache keys ──────────────────────────────────────────────────
+
+
+def _references(path, text):
+    """Local files referenced by $import/$include/$mixin/run: in ``text``."""
+    base = os.path.dirname(path)
+    for line in text.splitlines():
+        match = REFERENCE_RE.match(line)
+        if not match:
+            continue
+        target = match.group(1)
+        if target.startswith("file://"):
+            target = target[len("file://"):]
+        elif "://" in target:
+            continue
+        target = target.split("#", 1)[0]
+        if target:
+            yield os.path.normpath(os.path.join(base, target))
+
+
+def dependency_closure(path):
+    """``path`` and every local file it references, recursively: {path: bytes}."""
+    contents = {}
+    pending = [os.path.abspath(path)]
+    while pending:
+        current = pending.pop()
+        if current in contents:
+            continue
+        try:
+            with open(current, "rb") as fh:
+                data = fh.read()
+        except OSError:
+            # Missing references are reported by the validator; key on their absence
+            contents[current] = b""
+            continue
+        contents[current] = data
+        pending.extend(_references(current, data.decode("utf-8", errors="replace")))
+    return contents
+
+
+def cache_key(path, cwltool_version):
+    """SHA-256 of the file and its references (by path relative to the file), and cwltool."""
+    digest = hashlib.sha256()
+    digest.update(f"cwl-validate:{CACHE_FORMAT}:{cwltool_version}\n".encode())
+    base = os.path.dirname(os.path.abspath(path))
+    for dep, data in sorted(dependency_closure(path).items()):
+        digest.update(os.path.relpath(dep, base).encode() + b"\0")
+        digest.update(hashlib.sha256(data).digest())
+    return digest.hexdigest()
+
+
+# ── Validation ──────────────────────────────────────────────────
+
+
+_CWLTOOL = None
+
+
+def _load_cwltool():
+    """Import cwltool's loader once per process; None if it is not importable."""
+    global _CWLTOOL
+    if _CWLTOOL is None:
+        try:
+            from cwltool.context import LoadingContext
+            from cwltool.load_tool import fetch_document, make_tool, resolve_and_validate_document
+        except ImportError:
+            _CWLTOOL = False
+        else:
+            _CWLTOOL = {
+                "LoadingContext": LoadingContext,
+                "fetch_document": fetch_document,
+                "resolve_and_validate_document": resolve_and_validate_document,
+                "make_tool": make_tool,
+            }
+    return _CWLTOOL or None
+
+
+def _package_version(name):
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:  # Python < 3.8
+        return None
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return None
+
+
+def _in_this_environment(executable):
+    """Whether ``executable`` is installed in this interpreter's scripts directory."""
+    exe_dir = os.path.realpath(os.path.dirname(executable))
+    schemes = [sysconfig.get_path("scripts")]
+    try:
+        schemes.append(sysconfig.get_path("scripts", f"{os.name}_user"))
+    except KeyError:
+        pass
+    return any(path and os.path.realpath(path) == exe_dir for path in schemes)
+
+
+def select_validator(cwltool_bin):
+    """(in_process, version) for the cwltool behind ``cwltool_bin``; version None if absent.
+
+    In-process validation is used only when ``cwltool_bin`` resolves to this
+    interpreter's environment and the package is installed there; its version
+    then comes from the package metadata, so cache hits cost no cwltool
+    import. Otherwise the executable itself is asked for its version.
+    """
+    executable = shutil.which(cwltool_bin)
+    if not executable:
+        return False, None
+    if _in_this_environment(executable):
+        version = _package_version("cwltool")
+        if version:
+            return True, version
+    try:
+        proc = subprocess.run([cwltool_bin, "--version"], stdout=subprocess.PIPE,
+                              stderr=subprocess.STDOUT, universal_newlines=True, timeout=120)
+    except (OSError, subprocess.TimeoutExpired):
+        return False, None
+    return False, proc.stdout.strip() or "unknown"
+
+
+class _Capture(logging.Handler):
+    """Collect warnings and errors as cwltool's CLI prints them ('WARNING ...')."""
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(self.format(record))
+
+
+def _validate_in_process(api, path):
+    capture = _Capture()
+    loggers = [logging.getLogger("cwltool"), logging.getLogger("salad")]
+    for logger in loggers:
+        logger.addHandler(capture)
+    try:
+        loading_context = api["LoadingContext"]()
+        loading_context, document, uri = api["fetch_document"](path, loading_context)
+        loading_context, uri = api["resolve_and_validate_document"](loading_context, document, uri)
+        api["make_tool"](uri, loading_context)
+    except Exception as exc:  # cwltool raises several unrelated exception types
+        return False, "\n".join(capture.messages + [str(exc)])
+    finally:
+        for logger in loggers:
+            logger.removeHandler(capture)
+    return True, "\n".join(capture.messages)
+
+
+def _validate_subprocess(cwltool_bin, path):
+    try:
+        proc = subprocess.run([cwltool_bin, "--validate", path], stdout=subprocess.PIPE,
+                              stderr=subprocess.STDOUT, universal_newlines=True,
+                              cwd=os.path.dirname(path))
+    except OSError as exc:
+        return False, f"{cwltool_bin}: {exc}"
+    return proc.returncode == 0, proc.stdout.strip()
+
+
+def validate(job):
+    """Validate one file: (path, ok, messages). Runs in the pool workers."""
+    path, cwltool_bin, in_process = job
+    api = _load_cwltool() if in_process else None
+    if api:
+        ok, messages = _validate_in_process(api, path)
+    else:
+        ok, messages = _validate_subprocess(cwltool_bin, path)
+    return path, ok, messages
+
+
+def _init_worker(in_process):
+    # Load the schema up front so it is shared by every file this worker validates
+    if in_process:
+        _load_cwltool()
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Validate many CWL files in one process, skipping unchanged ones.")
+    parser.add_argument("paths", nargs="*", help="CWL files, directories or glob patterns (default: public/cwl).")
+    parser.add_argument("--root", default=None, help="Directory that relative arguments are resolved against.")
+    parser.add_argument("--cache", default=default_cache(), help="SQLite cache (default: $NIBUILD_CWL_VALIDATE_CACHE or ~/.cache/nibuild/cwl_validation.sqlite).")
+    parser.add_argument("--no-cache", action="store_true", help="Neither read nor record cached results.")
+    parser.add_argument("--refresh", action="store_true", help="Revalidate every file, then record the results.")
+    parser.add_argument("--workers", type=int, default=1, help="Validation processes, each loading the schema once (default: 1).")
+    parser.add_argument("--cwltool", default=os.environ.get("CWLTOOL_BIN", "cwltool"),
+                        help="cwltool executable the tools run with; validated in-process only when it belongs "
+                             "to this interpreter's environment (default: $CWLTOOL_BIN or cwltool).")
+    parser.add_argument("--quiet", action="store_true", help="Only print failures and the summary.")
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    return args
+
+
+def main(argv):
+    args = parse_args(argv)
+    files = collect_files(args)
+    if not files:
+        print("ERROR: no CWL files to validate", file=sys.stderr)
+        return 1
+    started = time.perf_counter()
+
+    in_process, version = select_validator(args.cwltool)
+    if version is None:
+        print(f"ERROR: cwltool not found ({args.cwltool})", file=sys.stderr)
+        return 2
+    keys = {}
+    cached = {}
+    conn = None
+    if not args.no_cache:
+        keys = {path: cache_key(path, version) for path in files}
+        conn = connect(args.cache)
+        if not args.refresh:
+            known = dict(conn.execute("SELECT key, messages FROM validations"))
+            cached = {path: known[key] for path, key in keys.items() if key in known}
+
+    pending = [path for path in files if path not in cached]
+    results = {path: (True, messages) for path, messages in cached.items()}
+    jobs = [(path, args.cwltool, in_process) for path in pending]
+    if len(jobs) > 1 and args.workers > 1:
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(jobs)), initializer=_init_worker,
+                                 initargs=(in_process,)) as pool:
+            for path, ok, messages in pool.map(validate, jobs):
+                results[path] = (ok, messages)
+    else:
+        for job in jobs:
+            path, ok, messages = validate(job)
+            results[path] = (ok, messages)
+
+    if conn is not None:
+        now = dt.datetime.now(dt.timezone.utc).isoformat(timespec="seconds")
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO validations VALUES (?, ?, ?, ?, ?)",
+                [(keys[path], _label(path), version, results[path][1], now)
+                 for path in pending if results[path][0]],
+            )
+        conn.close()
+
+    failed = 0
+    for path in files:
+        ok, messages = results[path]
+        label = _label(path)
+        if not ok:
+            failed += 1
+            print(f"FAIL {label}")
+        elif args.quiet:
+            continue
+        else:
+            print(f"PASS {label}{' (cached)' if path in cached else ''}")
+        # Failure output, or warnings from a successful validation
+        for line in messages.splitlines():
+            print(f"    {line}")
+    elapsed = time.perf_counter() - started
+    print(f"{len(files)} CWL files: {len(files) - failed} valid ({len(cached)} cached), "
+          f"{failed} invalid in {elapsed:.1f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -10,7 +10,7 @@ ROOT_DIR="$(cd "${SCRIPT_DIR}/../.." && pwd)"
 FIXTURES_DIR="${SCRIPT_DIR}/fixtures"
 GENERATED_DIR="${SCRIPT_DIR}/generated"
 LOG_DIR="${SCRIPT_DIR}/logs"
-SUMMARY_FILE="${SCRIPT_DIR}/summary.tsv"
+SUMMARY_FILE="${CWL_TEST_SUMMARY_FILE:-${SCRIPT_DIR}/summary.tsv}"
 
 CWLTOOL_BIN="${CWLTOOL_BIN:-cwltool}"
 
@@ -30,7 +30,8 @@ validate_workflow() {
   local cwl_file="$1" name="$2"
   local log_file="${LOG_DIR}/${name}_validate.log"
 
-  if "$CWLTOOL_BIN" --validate "$cwl_file" >"$log_file" 2>&1; then
+  # Unchanged workflows (and the tools they run) are skipped via the validate_cwl.py cache
+  if python3 "${ROOT_DIR}/utils/test_harness/validate_cwl.py" --cwltool "$CWLTOOL_BIN" "$cwl_file" >"$log_file" 2>&1; then
     local warnings
     warnings="$(grep -iE 'WARNING|WARN' "$log_file" 2>/dev/null || true)"
     if [[ -n "$warnings" ]]; then
@@ -7,4 +7,9 @@ echo "=== Workflow Generation Tests ==="
 echo "Date: $(date)"
 echo ""
 
-bash "${SCRIPT_DIR}/test_workflow_generation.sh" "$@"
+status=0
+bash "${SCRIPT_DIR}/test_cost_estimate.sh" || status=1
+echo ""
+
+bash "${SCRIPT_DIR}/test_workflow_generation.sh" "$@" || status=1
+exit "$status"
@@ -0,0 +1,72 @@
+#!/usr/bin/env bash
+# Check that estimate_workflow_cost.py scatters the same nodes the exported CWL does:
+# nodes downstream of a scatter run --scatter-width jobs, gather nodes run one.
+set -euo pipefail
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+ROOT_DIR="$(cd "${SCRIPT_DIR}/../.." && pwd)"
+FIXTURES_DIR="${SCRIPT_DIR}/fixtures"
+ESTIMATOR="${ROOT_DIR}/utils/consensus_connects/estimate_workflow_cost.py"
+WIDTH=10
+
+TMP_DIR="$(mktemp -d)"
+trap 'rm -rf "$TMP_DIR"' EXIT
+
+PASS=0
+FAIL=0
+
+# check_jobs <name> <workflow.json> <node_id=jobs>...
+check_jobs() {
+  local name="$1" workflow="$2"
+  shift 2
+  local out="${TMP_DIR}/${name}.json"
+  if ! python3 "$ESTIMATOR" --workflow "$workflow" --scatter-width "$WIDTH" --out "$out" >/dev/null; then
+    echo "  FAIL: ${name} (estimator error)"
+    FAIL=$((FAIL + 1))
+    return
+  fi
+  local mismatches
+  mismatches="$(python3 - "$out" "$@" <<'PY'
+import json, sys
+nodes = json.load(open(sys.argv[1]))["nodes"]
+for spec in sys.argv[2:]:
+    node_id, jobs = spec.split("=")
+    if nodes[node_id]["jobs"] != int(jobs):
+        print(f"{node_id} ({nodes[node_id]['tool']}): {nodes[node_id]['jobs']} jobs, expected {jobs}")
+PY
+)"
+  if [[ -z "$mismatches" ]]; then
+    echo "  PASS: ${name}"
+    PASS=$((PASS + 1))
+  else
+    echo "  FAIL: ${name}"
+    echo "$mismatches" | sed 's/^/    /'
+    FAIL=$((FAIL + 1))
+  fi
+}
+
+echo "── Scatter propagation in the cost estimator (--scatter-width ${WIDTH}) ──"
+check_jobs scatter_pipeline "${FIXTURES_DIR}/scatter_pipeline.json" node_1=$WIDTH node_2=$WIDTH
+check_jobs scatter_legacy_compat "${FIXTURES_DIR}/scatter_legacy_compat.json" node_1=$WIDTH node_2=$WIDTH
+check_jobs scatter_multi_input "${FIXTURES_DIR}/scatter_multi_input.json" node_1=$WIDTH
+check_jobs linear_pipeline "${FIXTURES_DIR}/linear_pipeline.json" node_1=1 node_2=1
+
+# Gather: bet's scattered output feeds fslmerge's File[] input, so fslmerge runs once
+# and the fslmaths after it is not scattered.
+python3 - "${FIXTURES_DIR}/scatter_pipeline.json" "${TMP_DIR}/scatter_gather.json" <<'PY'
+import json, sys
+graph = json.load(open(sys.argv[1]))
+graph["nodes"][1]["data"]["label"] = "fslmerge"
+graph["edges"][0]["data"]["mappings"] = [{"sourceOutput": "brain_extraction", "targetInput": "input_files"}]
+graph["nodes"].append({"id": "node_3", "data": {"label": "fslmaths"}})
+graph["edges"].append({
+    "id": "edge_2_3", "source": "node_2", "target": "node_3",
+    "data": {"mappings": [{"sourceOutput": "merged_image", "targetInput": "input"}]},
+})
+json.dump(graph, open(sys.argv[2], "w"))
+PY
+check_jobs scatter_gather "${TMP_DIR}/scatter_gather.json" node_1=$WIDTH node_2=1 node_3=1
+
+echo ""
+echo "  PASS: ${PASS}"
+echo "  FAIL: ${FAIL}"
+[[ "$FAIL" -eq 0 ]]